@@ -6,12 +6,17 @@ from agno.models.google import Gemini
 from agno.agent import Agent
 from agno.team import Team
 from agno.tools.duckduckgo import DuckDuckGoTools
-from knowledge_gs1 import knowledge_base
+from knowledge_gs1 import get_knowledge_base, get_hybrid_retriever
 from opik import track
+from metrics import tool_timing_hook
+from context_packing import ContextPacker
+from prefetch import PrefetchingRetriever
+import replay
 
 load_dotenv()
 
-
+# Hybrid (vector + BM25) knowledge search; False falls back to pure vector search
+HYBRID_SEARCH = True
 
 # --- 2. INSTRUCTION LOADERS ---
 
@@ -58,11 +63,15 @@ def get_gs1_agent():
     return Agent(
         name='vhuya-sme-gs1',
         role="UPSC GS-1 Subject Matter Expert",
-        model=brain,
-        knowledge=knowledge_base,
+        model=replay.wrap_model(brain),   # no-op unless VYUHA_REPLAY is set (replay.py)
+        # Hits are deduplicated, cut to the query and fitted to the mark budget (context_packing.py);
+        # a search matching the question is served from the request's prefetch (prefetch.py)
+        knowledge_retriever=ContextPacker(PrefetchingRetriever(get_hybrid_retriever())) if HYBRID_SEARCH
+        else ContextPacker.for_knowledge(get_knowledge_base()),
         search_knowledge=True,
         instructions=get_instruction('instructions_for_smegs1.md'),
         tools=[DuckDuckGoTools()],
+        tool_hooks=[tool_timing_hook, *replay.tool_hooks()],   # per-tool latency histograms (metrics.py)
         markdown=True,
         debug_mode=True        
     )
@@ -79,9 +88,10 @@ def get_supervisor_team():
     return Team(
         name='Chief-Examiner',
         role="UPSC Supervisor",
-        model=Gemini(id="gemini-3-flash-preview", thinking_level='low'),        
+        model=replay.wrap_model(Gemini(id="gemini-3-flash-preview", thinking_level='low')),
         members=[sme],        
         instructions=supervisor_instructions,
+        tool_hooks=[tool_timing_hook, *replay.tool_hooks()],
         markdown=True,
         debug_mode=True
     )
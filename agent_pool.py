@@ -0,0 +1,154 @@
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional
+
+
+# --- Configuration ---
+POOL_SIZE = int(os.getenv("VYUHA_POOL_SIZE", "2"))          # teams built and warmed at boot
+MAX_POOL_SIZE = int(os.getenv("VYUHA_MAX_POOL_SIZE", "8"))  # grown on demand up to this many
+LEASE_TIMEOUT = 120.0                                       # seconds to wait for a free team
+
+
+class PoolExhausted(TimeoutError):
+    """Every instance stayed leased for the whole lease timeout."""
+
+
+@dataclass
+class PoolStats:
+    builds: int = 0
+    build_seconds: List[float] = field(default_factory=list)
+    warm_seconds: float = 0.0
+    boot_seconds: float = 0.0
+    leases: int = 0
+    waits: int = 0              # leases that found every team busy
+    wait_seconds: float = 0.0
+
+    @property
+    def mean_build(self) -> float:
+        return sum(self.build_seconds) / len(self.build_seconds) if self.build_seconds else 0.0
+
+    def report(self) -> str:
+        return (f"teams={self.builds} boot={self.boot_seconds:.2f}s (build~{self.mean_build:.2f}s, "
+                f"warm={self.warm_seconds:.2f}s) leases={self.leases} waits={self.waits} "
+                f"wait={self.wait_seconds:.2f}s")
+
+
+class AgentPool:
+    """Process-wide pool of pre-built agno Teams/Agents.
+
+    A Team instance holds per-run state while it streams, so each request leases one
+    for the duration of its run and returns it afterwards. Conversation identity is
+    not stored on the instance - callers pass their own `session_id` to `run()`.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = POOL_SIZE, max_size: int = MAX_POOL_SIZE,
+                 warmers: Optional[List[Callable[[], Any]]] = None):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_size = max(self.size, max_size)
+        self.warmers = warmers or []
+        self.stats = PoolStats()
+        self._idle: "queue.Queue[Any]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _build(self) -> Any:
+        """Builds one instance whose slot the caller already counted in `_created`."""
+        start = time.perf_counter()
+        try:
+            instance = self.factory()
+        except BaseException:
+            # Give the slot back, or every failed build would shrink the pool for good
+            with self._lock:
+                self._created -= 1
+            raise
+        with self._lock:
+            self.stats.builds += 1
+            self.stats.build_seconds.append(time.perf_counter() - start)
+        return instance
+
+    def boot(self) -> "AgentPool":
+        """Builds `size` instances in parallel and runs the warmers (connections, indexes)."""
+        start = time.perf_counter()
+        with self._lock:
+            missing = self.size - self._created
+            self._created += max(missing, 0)
+        with ThreadPoolExecutor(max_workers=max(1, missing) + len(self.warmers)) as executor:
+            warm_futures = [executor.submit(self._run_warmer, warmer) for warmer in self.warmers]
+            for future in [executor.submit(self._build) for _ in range(max(missing, 0))]:
+                try:
+                    instance = future.result()
+                except Exception as e:
+                    print(f"⚠️ Team build failed at boot (built on demand later): {e}")
+                    continue
+                # Warmed before it is visible: a concurrent lease() never gets a half-ready team
+                warm_models(instance)
+                self._idle.put(instance)
+            self.stats.warm_seconds = max((f.result() for f in warm_futures), default=0.0)
+        self.stats.boot_seconds = time.perf_counter() - start
+        print(f"✅ Agent pool ready: {self.stats.report()}")
+        return self
+
+    @staticmethod
+    def _run_warmer(warmer: Callable[[], Any]) -> float:
+        start = time.perf_counter()
+        try:
+            warmer()
+        except Exception as e:
+            print(f"⚠️ Warm-up step {getattr(warmer, '__name__', warmer)} failed: {e}")
+        return time.perf_counter() - start
+
+    @contextmanager
+    def lease(self, timeout: float = LEASE_TIMEOUT) -> Iterator[Any]:
+        start = time.perf_counter()
+        instance = None
+        try:
+            instance = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._created < self.max_size
+                if grow:
+                    self._created += 1
+            if grow:
+                instance = self._build()
+            else:
+                with self._lock:
+                    self.stats.waits += 1
+                try:
+                    instance = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    raise PoolExhausted(f"all {self.max_size} teams busy for {timeout:.0f}s") from None
+        with self._lock:
+            self.stats.leases += 1
+            self.stats.wait_seconds += time.perf_counter() - start
+        try:
+            yield instance
+        finally:
+            self._idle.put(instance)
+
+    @property
+    def idle(self) -> int:
+        return self._idle.qsize()
+
+
+def warm_models(instance: Any) -> None:
+    """Creates the HTTP clients of a Team/Agent and its members up front.
+
+    agno builds provider clients lazily on the first request, which would otherwise
+    land inside the first user's time-to-first-token.
+    """
+    pending = [instance]
+    while pending:
+        member = pending.pop()
+        model = getattr(member, "model", None)
+        if model is not None and hasattr(model, "get_client"):
+            try:
+                model.get_client()
+            except Exception as e:
+                print(f"⚠️ Could not pre-create client for {getattr(model, 'id', model)}: {e}")
+        pending.extend(getattr(member, "members", None) or [])
@@ -0,0 +1,279 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import argparse
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from word_budget import mark_value, strip_mark_suffix
+
+
+# --- Configuration ---
+CACHE_PATH = './lance_db/answer_cache.sqlite'
+SIMILARITY_THRESHOLD = 0.92     # cosine; paraphrases of a PYQ land ~0.93-0.98, related questions < 0.9
+TTL_SECONDS = 7 * 24 * 3600     # answers older than a week are regenerated
+MAX_ENTRIES = 5000              # LRU cap across all mark variants
+MIN_QUESTION_WORDS = 4          # "elaborate more" style follow-ups depend on the conversation, never cache
+
+# Instruction files + ingestion manifest: any change invalidates every stored answer
+FINGERPRINT_FILES = [
+    'instructions_for_supervisor.md',
+    'instructions_for_smegs1.md',
+    os.path.join('instructions', 'instructions_for_supervisor.md'),
+    os.path.join('instructions', 'instructions_for_smegs1.md'),
+]
+# Ingestion manifest of the active embedding backend's table (same naming as knowledge_gs1.py)
+EMBEDDER_BACKEND = os.getenv("VYUHA_EMBEDDER", "openai")
+LOCAL_QUANTIZATION = os.getenv("VYUHA_LOCAL_EMBEDDER_QUANT", "int8")   # local_embedder.QUANTIZATION
+CORPUS_TABLE = 'GS1' if EMBEDDER_BACKEND == 'openai' else f'GS1_{EMBEDDER_BACKEND}_{LOCAL_QUANTIZATION}'
+CORPUS_MANIFEST = f'./lance_db/{CORPUS_TABLE}_manifest.json'
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+
+
+def mark_variant(question: str) -> str:
+    """'10', '15' or 'any' - answers to the same question differ by mark value."""
+    marks = mark_value(question)
+    return str(marks) if marks else 'any'
+
+
+def normalise_question(question: str) -> str:
+    """Lower-cased question text without the mark/word-limit suffix and punctuation."""
+    return " ".join(_PUNCT_RE.sub(" ", strip_mark_suffix(question.lower())).split())
+
+
+def corpus_fingerprint(paths: Iterable[str] = FINGERPRINT_FILES, manifest_path: str = CORPUS_MANIFEST) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(path.encode() + b'\0' + f.read())
+    if os.path.exists(manifest_path):
+        stat = os.stat(manifest_path)
+        digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    word_count: int
+    similarity: float
+    question: str           # the originally asked question this answer was generated for
+
+
+@dataclass
+class AnswerCacheStats:
+    hits: int = 0
+    exact_hits: int = 0     # served without an embedding call
+    misses: int = 0
+    skipped: int = 0        # too short / follow-up questions
+    stores: int = 0
+    expired: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self) -> str:
+        return (f"hits={self.hits} (exact={self.exact_hits}) misses={self.misses} hit_rate={self.hit_rate:.1%} "
+                f"stores={self.stores} expired={self.expired} evictions={self.evictions} skipped={self.skipped}")
+
+
+class AnswerCache:
+    """Semantic cache of final Team answers, keyed by (mark variant, question embedding).
+
+    Entries persist in SQLite; their unit-normalised embeddings are held per mark
+    variant in an in-memory matrix, so a lookup is one embedding call plus a single
+    matrix-vector product. `embedder` is anything with agno's `get_embedding(text)`.
+    """
+
+    def __init__(self, embedder, path: str = CACHE_PATH, threshold: float = SIMILARITY_THRESHOLD,
+                 ttl_seconds: float = TTL_SECONDS, max_entries: int = MAX_ENTRIES,
+                 fingerprint: Optional[str] = None):
+        self.embedder = embedder
+        self.path = path
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = AnswerCacheStats()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS answers (
+            id INTEGER PRIMARY KEY, variant TEXT, norm_hash TEXT, question TEXT, answer TEXT,
+            word_count INTEGER, embedding BLOB, created_at REAL, last_used REAL, hits INTEGER DEFAULT 0)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_norm ON answers (variant, norm_hash)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+
+        self.fingerprint = fingerprint or corpus_fingerprint()
+        stored = self._db.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if stored is not None and stored[0] != self.fingerprint:
+            print("♻️ Instructions or corpus changed - invalidating answer cache")
+            self.invalidate()
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (self.fingerprint,))
+        self._db.commit()
+
+        self._ids: Dict[str, List[int]] = {}
+        self._matrix: Dict[str, np.ndarray] = {}
+        self._load()
+
+    # --- In-memory index ---
+
+    def _load(self) -> None:
+        self._purge_expired()
+        self._ids, rows_by_variant = {}, {}
+        for row_id, variant, blob in self._db.execute("SELECT id, variant, embedding FROM answers"):
+            self._ids.setdefault(variant, []).append(row_id)
+            rows_by_variant.setdefault(variant, []).append(np.frombuffer(blob, dtype=np.float32))
+        self._matrix = {variant: np.vstack(rows) for variant, rows in rows_by_variant.items()}
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = self._db.execute("DELETE FROM answers WHERE created_at < ?", (cutoff,)).rowcount
+        self._db.commit()
+        self.stats.expired += max(expired, 0)
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        vector = np.asarray(self.embedder.get_embedding(text) or [], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None   # agno embedders return [] on API errors
+
+    def _touch(self, row_id: int) -> None:
+        self._db.execute("UPDATE answers SET last_used = ?, hits = hits + 1 WHERE id = ?", (time.time(), row_id))
+        self._db.commit()
+
+    def _fetch(self, row_id: int, similarity: float) -> Optional[CachedAnswer]:
+        row = self._db.execute("SELECT answer, word_count, question, created_at FROM answers WHERE id = ?",
+                               (row_id,)).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[3] > self.ttl_seconds:
+            self._purge_expired()
+            self._load()
+            return None
+        self._touch(row_id)
+        return CachedAnswer(answer=row[0], word_count=row[1], similarity=similarity, question=row[2])
+
+    # --- Public API ---
+
+    def lookup(self, question: str) -> Optional[CachedAnswer]:
+        """Returns the stored answer for this question or a close paraphrase of it."""
+        normalised = normalise_question(question)
+        if len(normalised.split()) < MIN_QUESTION_WORDS:
+            self.stats.skipped += 1
+            return None
+        variant = mark_variant(question)
+        norm_hash = hashlib.md5(normalised.encode("utf-8")).hexdigest()
+
+        with self._lock:
+            row = self._db.execute("SELECT id FROM answers WHERE variant = ? AND norm_hash = ?",
+                                   (variant, norm_hash)).fetchone()
+            if row is not None:
+                cached = self._fetch(row[0], 1.0)
+                if cached is not None:
+                    self.stats.hits += 1
+                    self.stats.exact_hits += 1
+                    return cached
+            matrix = self._matrix.get(variant)
+
+        if matrix is None or not len(matrix):
+            self.stats.misses += 1
+            return None
+        query = self._embed(normalised)
+        if query is None or query.shape[0] != matrix.shape[1]:
+            self.stats.misses += 1
+            return None
+
+        with self._lock:
+            matrix = self._matrix.get(variant)
+            if matrix is None or not len(matrix):
+                self.stats.misses += 1
+                return None
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            cached = None
+            if similarities[best] >= self.threshold:
+                cached = self._fetch(self._ids[variant][best], float(similarities[best]))
+            if cached is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            return cached
+
+    def store(self, question: str, answer: str, word_count: int) -> bool:
+        normalised = normalise_question(question)
+        if len(normalised.split()) < MIN_QUESTION_WORDS or not answer.strip():
+            return False
+        vector = self._embed(normalised)
+        if vector is None:
+            return False
+        variant = mark_variant(question)
+        norm_hash = hashlib.md5(normalised.encode("utf-8")).hexdigest()
+
+        with self._lock:
+            if variant in self._matrix and self._matrix[variant].shape[1] != vector.shape[0]:
+                return False
+            now = time.time()
+            self._db.execute("DELETE FROM answers WHERE variant = ? AND norm_hash = ?", (variant, norm_hash))
+            self._db.execute(
+                "INSERT INTO answers (variant, norm_hash, question, answer, word_count, embedding, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (variant, norm_hash, question, answer, int(word_count), vector.tobytes(), now, now))
+            overflow = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._db.execute("DELETE FROM answers WHERE id IN "
+                                 "(SELECT id FROM answers ORDER BY last_used ASC LIMIT ?)", (overflow,))
+                self.stats.evictions += overflow
+            self._db.commit()
+            self.stats.stores += 1
+            self._load()
+        return True
+
+    def invalidate(self, variant: Optional[str] = None) -> int:
+        """Admin path: drops every answer (or one mark variant) after instruction/corpus edits."""
+        with self._lock:
+            if variant is None:
+                removed = self._db.execute("DELETE FROM answers").rowcount
+            else:
+                removed = self._db.execute("DELETE FROM answers WHERE variant = ?", (variant,)).rowcount
+            self._db.commit()
+            self.stats.invalidations += 1
+            if hasattr(self, '_matrix'):
+                self._load()
+        return max(removed, 0)
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the semantic answer cache")
+    parser.add_argument("--invalidate", action="store_true", help="drop all cached answers")
+    parser.add_argument("--variant", choices=['10', '15', 'any'], help="only invalidate one mark variant")
+    parser.add_argument("--path", default=CACHE_PATH)
+    args = parser.parse_args()
+
+    # Same schema (and fingerprint check) as the app; no embedder needed to inspect or invalidate
+    cache = AnswerCache(embedder=None, path=args.path)
+    if args.invalidate:
+        print(f"🗑️ Removed {cache.invalidate(args.variant)} cached answers")
+    rows = cache._db.execute("SELECT variant, COUNT(*), SUM(hits) FROM answers GROUP BY variant").fetchall()
+    for variant, count, hits in rows:
+        print(f"{variant:>4} marks: {count} answers, served {hits or 0} times from cache")
+    cache.close()
@@ -1,49 +1,51 @@
 import streamlit as st
 import os
-import re
 import base64
 import time
+import uuid
+from contextlib import ExitStack
 from dotenv import load_dotenv
 from agent import get_gs1_agent, get_supervisor_team
+from agent_pool import AgentPool
+from knowledge_gs1 import get_hybrid_retriever
+from answer_cache import AnswerCache
+from streaming import StreamStats, ThrottledRenderer, iter_answer_deltas
+from word_budget import WordBudget, BudgetEnforcer, count_words
+from context_packing import packing_budget
+from prefetch import choose_runner, prefetch
+from conversation_memory import ConversationMemory, trim_messages
+from serving import SERVICE_URL, ServiceBusy, iter_service_deltas
+from agno.knowledge.embedder.openai import OpenAIEmbedder
 from opentelemetry import trace as trace_api
-from openinference.instrumentation.agno import AgnoInstrumentor
+from opentelemetry.trace import Status, StatusCode
 
 # --- OPIK & TELEMETRY SETUP ---
 from opik import track, opik_context
-from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from telemetry import setup_telemetry
+from metrics import registry, record_run_usage, start_metrics_server
 
 @st.cache_resource
 def setup_opik_telemetry():
-    # 1. Check if we already set up (prevent double-init)
-    if not trace_api.get_tracer_provider():
-        
-        # 2. Point to Opik Cloud (Not Localhost!)
-        endpoint = "https://www.opik.ai/api/v1/otlp/v1/traces" 
-        
-        headers = {
-            "opik-api-key": os.getenv("OPIK_API_KEY"),
-            "opik-workspace": os.getenv("OPIK_WORKSPACE")
-        }
-
-        # 3. Create the Exporter
-        exporter = OTLPSpanExporter(endpoint=endpoint, headers=headers)
-        
-        tracer_provider = TracerProvider()
-        tracer_provider.add_span_processor(SimpleSpanProcessor(exporter))
-        trace_api.set_tracer_provider(tracer_provider)
-        
-        # 4. Instrument Agno
-        AgnoInstrumentor().instrument()
-        print("✅ Opik Deep Tracing Enabled (Cloud Mode)")
+    # Batched background export (Opik cloud, an OTLP collector or ./traces/spans.jsonl),
+    # with tail sampling that keeps every error and slow trace; see telemetry.py
+    telemetry = setup_telemetry()
+    print(f"✅ Deep Tracing Enabled ({telemetry.exporter})")
+    return telemetry
 
 # Run the setup ONCE
 try:
-    setup_opik_telemetry()
+    telemetry = setup_opik_telemetry()
 except Exception as e:
+    telemetry = None
     print(f"⚠️ Telemetry skipped: {e}")
 
+# Local per-stage latency / token metrics (works without Opik Cloud)
+@st.cache_resource
+def setup_metrics_endpoint():
+    return start_metrics_server(port=int(os.getenv("VYUHA_METRICS_PORT", "9464")))
+
+setup_metrics_endpoint()
+
 # FIX 1: Removed the duplicate 'setup_opik_telemetry()' call that was here
 
 st.set_page_config(page_title="Vyuha-AI", 
@@ -91,6 +93,14 @@ def apply_custom_style():
 
 apply_custom_style()
 
+# --- SEMANTIC ANSWER CACHE (shared by all sessions) ---
+@st.cache_resource
+def get_answer_cache():
+    # Small embedder: the cache only compares questions with each other
+    return AnswerCache(embedder=OpenAIEmbedder(id='text-embedding-3-small', dimensions=512))
+
+answer_cache = get_answer_cache()
+
 # --- SIDEBAR ---
 with st.sidebar:
     try:
@@ -111,22 +121,49 @@ with st.sidebar:
     with c2:
         if st.button("Clear Conversation", use_container_width=True):
             st.session_state.messages = []
+            st.session_state.pop("memory", None)
             st.rerun()
     
     st.markdown("---")
     st.caption("System Status: Agent Active ✅")
+    st.caption(f"Answer cache: {answer_cache.stats.hits} hits · {answer_cache.stats.hit_rate:.0%} hit rate")
+
+    # Admin only: drop cached answers after editing instructions or re-ingesting
+    if os.getenv("VYUHA_ADMIN"):
+        if st.button("Invalidate Answer Cache", use_container_width=True):
+            removed = answer_cache.invalidate()
+            st.toast(f"Removed {removed} cached answers")
 
 # --- STATE MANAGEMENT (CRITICAL FIX) ---
 
-# FIX 2: Removed the logic that deleted the agent. 
-# We WANT the agent to persist so it remembers the conversation and loads faster.
-if "agent" not in st.session_state: 
+# Teams are built and warmed once per process and leased per request; a session
+# only owns its id and messages, so new users no longer wait for a Team build.
+@st.cache_resource
+def get_agent_pool():
+    return AgentPool(get_supervisor_team, warmers=[lambda: get_hybrid_retriever().warm()]).boot()
+
+if SERVICE_URL:
+    agent_pool = None       # Teams live in the answer service (serving.py)
+    st.session_state.setdefault("session_id", str(uuid.uuid4()))
+elif "session_id" not in st.session_state:
+    session_start = time.perf_counter()
     with st.spinner("Initializing Supervisor Team..."):
-        st.session_state.agent = get_supervisor_team()
-        print("✅ Supervisor Team Loaded Successfully") 
+        agent_pool = get_agent_pool()
+    st.session_state.session_id = str(uuid.uuid4())
+    print(f"✅ Session ready in {time.perf_counter() - session_start:.3f}s ({agent_pool.stats.report()})")
+else:
+    agent_pool = get_agent_pool()
 
 if "messages" not in st.session_state: 
     st.session_state.messages = []
+# Bounded history sent with each question: recent turns + rolling summary (conversation_memory.py)
+if "memory" not in st.session_state:
+    st.session_state.memory = ConversationMemory()
+memory = st.session_state.memory
+
+if st.session_state.get("trimmed_messages"):
+    st.caption(f"🗂️ {st.session_state.trimmed_messages} earlier messages are no longer shown; "
+               f"Vyuha still remembers them in summary.")
 
 # Message Display
 for msg in st.session_state.messages:
@@ -145,40 +182,136 @@ if prompt := st.chat_input("Enter your UPSC GS-1 query..."):
     # 2. Assistant Logic
     with st.chat_message("assistant"):
         placeholder = st.empty()
+        counter = st.empty()
         full_res = ""
-        
+        cached = None
+        packing = None
+        scope = None
+        busy_error = None
+        stats = StreamStats()
+        # 10M -> 150 words, 15M -> 250 words; generation is stopped once the budget is spent
+        budget = WordBudget.for_question(prompt)
+        enforcer = BudgetEnforcer(budget)
+
+        def render(text, final=False):
+            # FIX 3: Enable HTML here so images render during streaming if needed
+            placeholder.markdown(text if final else text + "▌", unsafe_allow_html=True)
+            counter.markdown(f'<p class="word-count">Words: {count_words(text)} / {budget.limit}</p>', unsafe_allow_html=True)
+
         with trace_api.get_tracer(__name__).start_as_current_span("Vyuha-Query") as span:
             
-            # 1. GET FINAL ANSWER
+            # 1. STREAM THE FINAL ANSWER
             # While this runs, Streamlit will now correctly LOCK the input box
-            with st.spinner("Writing the answer..."):
-                try:
-                    response = st.session_state.agent.run(prompt, stream=False)
-                    final_text = response.content
-                except Exception as e:
-                    final_text = f"Error: {str(e)}"
-
-            # 2. TYPEWRITER EFFECT
-            for word in final_text.split(" "):
-                full_res += word + " "
-                # FIX 3: Enable HTML here so images render during typing if needed
-                placeholder.markdown(full_res + "▌", unsafe_allow_html=True)
-                time.sleep(0.02) 
-            
+            renderer = ThrottledRenderer(render, stats=stats)
+            try:
+                # Same or paraphrased question answered before -> skip the whole Team run. Only
+                # for a session without history: with it the answer may build on earlier turns
+                cacheable = memory.empty
+                cached = None
+                if cacheable:
+                    with registry.timer("answer_cache.lookup"):
+                        cached = answer_cache.lookup(prompt)
+                if cached is not None:
+                    renderer.feed(cached.answer)
+                    stats.first_token = stats.finished = time.perf_counter()
+                else:
+                    placeholder.markdown("✍️ Writing the answer...")
+                    # The question (with its word budget) first, then the session's bounded history
+                    message = memory.prompt(prompt + budget.instruction())
+                    with ExitStack() as run_scope:
+                        if SERVICE_URL:
+                            # Thin client: the answer service queues, limits and runs the Team
+                            deltas = iter_service_deltas(message, marks=budget.marks,
+                                                         user=st.session_state.session_id,
+                                                         session_id=st.session_state.session_id, stats=stats,
+                                                         question=prompt)
+                        else:
+                            # Knowledge search for the raw question starts now, alongside the supervisor call
+                            scope = run_scope.enter_context(prefetch(prompt))
+                            team = run_scope.enter_context(agent_pool.lease())
+                            # Knowledge hits are packed into the 10M/15M context budget for this request
+                            packing = run_scope.enter_context(packing_budget(budget.marks))
+                            runner, fast_path = choose_runner(team, prompt, scope)
+                            deltas = iter_answer_deltas(runner, message, stats=stats,
+                                                        session_id=st.session_state.session_id)
+                        for delta in deltas:
+                            visible = enforcer.feed(delta)
+                            if visible:
+                                renderer.feed(visible)
+                            if enforcer.exhausted:
+                                # Budget spent: show the trimmed answer and close the model stream
+                                renderer.replace(enforcer.text)
+                                deltas.close()
+                                stats.finished = time.perf_counter()
+                                break
+            except ServiceBusy as busy:
+                busy_error = busy
+                renderer.feed(f"⏳ Vyuha is busy right now ({busy.reason}). Please try again in {busy.retry_after}s.")
+            except Exception as e:
+                renderer.feed(f"\n\nError: {str(e)}")
+                span.record_exception(e)
+                span.set_status(Status(StatusCode.ERROR, str(e)))
+
             # Remove cursor and Final Render
-            placeholder.markdown(full_res, unsafe_allow_html=True)
+            renderer.flush(final=True)
+            full_res = renderer.text
+            final_text = full_res
 
-            # 3. WORD COUNT LOGIC
-            clean_text = re.sub(r'[*#|_`]', '', full_res).strip()
-            # Remove image links from word count to be accurate
-            clean_text = re.sub(r'!\[.*?\]\(.*?\)', '', clean_text)
-            w_count = len(clean_text.split())
+            # 2. WORD COUNT LOGIC
+            w_count = cached.word_count if cached is not None else count_words(full_res)
 
-            if w_count > 260:
-                st.markdown(f'<p class="word-count" style="color: #ff4b4b;">Words: {w_count} (Limit Exceeded)</p>', unsafe_allow_html=True)
+            if not budget.within(w_count):
+                counter.markdown(f'<p class="word-count" style="color: #ff4b4b;">Words: {w_count} (Limit Exceeded)</p>', unsafe_allow_html=True)
             else:
-                st.markdown(f'<p class="word-count" style="color: #00c04b;">Words: {w_count} (Perfect)</p>', unsafe_allow_html=True)
+                counter.markdown(f'<p class="word-count" style="color: #00c04b;">Words: {w_count} (Perfect)</p>', unsafe_allow_html=True)
+
+            if cached is not None:
+                st.caption(f"⚡ Served from answer cache (similarity {cached.similarity:.2f})")
+            elif cacheable and busy_error is None and "Error:" not in final_text and final_text.strip():
+                answer_cache.store(prompt, final_text, w_count)
+            print(f"⏱️ {stats.report()}")
+            if cached is None:
+                # ttft ~ supervisor planning + SME delegation; streaming ~ final synthesis
+                if stats.ttft is not None:
+                    registry.observe("answer.ttft", stats.ttft)
+                    if scope is not None:
+                        # Fast path vs supervisor TTFT, to see what skipping the planning turn saves
+                        registry.observe("answer.ttft.fast_path" if scope.fast_path else "answer.ttft.team", stats.ttft)
+                    if stats.finished is not None:
+                        registry.observe("answer.streaming", stats.finished - stats.first_token)
+                if stats.total is not None:
+                    registry.observe("answer.total", stats.total)
+                if stats.run_output is not None:
+                    record_run_usage(stats.run_output)
+            if cached is None:
+                budget_result = enforcer.finish()
+                print(f"📏 {budget_result.report()}")
+                if packing is not None:
+                    print(f"📦 {packing.report()}")
+                    span.set_attribute("context_tokens_saved", packing.tokens_saved)
+                if scope is not None:
+                    print(f"🔮 {scope.report()}")
+                    span.set_attribute("prefetch", scope.outcome)
+                    span.set_attribute("prefetch_saved_ms", round(scope.saved_seconds * 1000, 1))
+                    span.set_attribute("fast_path", scope.fast_path)
+                span.set_attribute("word_budget", budget.limit)
+                span.set_attribute("budget_stopped_early", budget_result.stopped_early)
+                span.set_attribute("tokens_saved", budget_result.tokens_saved)
 
             span.set_attribute("final_answer", full_res)
+            span.set_attribute("answer_cache_hit", cached is not None)
+            if busy_error is not None:
+                span.set_attribute("shed_reason", busy_error.reason)
+            if stats.ttft is not None:
+                span.set_attribute("ttft_ms", round(stats.ttft * 1000, 1))
+            if stats.total is not None:
+                span.set_attribute("total_ms", round(stats.total * 1000, 1))
     
-    st.session_state.messages.append({"role": "assistant", "content": full_res, "word_count": w_count})
\ No newline at end of file
+    st.session_state.messages.append({"role": "assistant", "content": full_res, "word_count": w_count})
+    if busy_error is None and "Error:" not in full_res and full_res.strip():
+        memory.add(prompt, full_res)
+    print(f"🧠 {memory.stats.report()}")
+    # Per-session state stays bounded however long the practice session runs
+    dropped = trim_messages(st.session_state.messages)
+    if dropped:
+        st.session_state.trimmed_messages = st.session_state.get("trimmed_messages", 0) + dropped
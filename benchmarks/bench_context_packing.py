@@ -0,0 +1,61 @@
+"""Knowledge tokens sent to the SME with and without context packing, per mark value.
+
+Each llm_as_judge_ds.csv question is searched (BM25 only, offline) and the hits are
+packed with its own mark budget. `coverage` is the share of the reference answer's
+terms that appear in the context, so a drop shows what the packing cut away.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_context_packing
+    VYUHA_CONTEXT_TOKENS_15M=800 python -m benchmarks.bench_context_packing --limit 20
+"""
+import time
+import argparse
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from context_packing import MARK_CONTEXT_TOKENS, ContextPacker, packing_budget
+from hybrid_retrieval import HybridRetriever, tokenize
+from word_budget import mark_value, strip_mark_suffix
+from benchmarks.bench_hybrid_retrieval import JUDGE_DATASET, NCERT_PATH
+
+
+def coverage(reference_terms: set, texts) -> float:
+    context = set(tokenize(" ".join(texts)))
+    return len(reference_terms & context) / len(reference_terms) if reference_terms else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=10, help="hits per search (agno's default max_results)")
+    args = parser.parse_args()
+
+    retriever = HybridRetriever(vector_db=None, base_path=NCERT_PATH, weights={"vector": 0.0, "lexical": 1.0})
+    retriever.warm()
+    packer = ContextPacker(retriever)
+    df = pd.read_csv(JUDGE_DATASET, encoding="latin1").fillna("")
+
+    rows = defaultdict(list)
+    for _, item in df.iterrows():
+        question = str(item["input"])
+        query, reference_terms = strip_mark_suffix(question), set(tokenize(str(item["reference"])))
+        raw = [doc["content"] for doc in retriever(query, num_documents=args.limit)]
+        with packing_budget(mark_value(question)) as result:
+            start = time.perf_counter()
+            packed = [doc["content"] for doc in packer(query, num_documents=args.limit)]
+            elapsed = (time.perf_counter() - start) * 1000
+        rows[result.marks].append((result.tokens_in, result.tokens_out, elapsed,
+                                   coverage(reference_terms, raw), coverage(reference_terms, packed)))
+
+    print(f"{'marks':>5} {'n':>4} {'budget':>7} {'tokens in':>10} {'tokens out':>11} {'saved':>7} "
+          f"{'coverage in':>12} {'coverage out':>13} {'ms/search':>10}")
+    for marks, values in sorted(rows.items()):
+        tokens_in, tokens_out, ms, cov_in, cov_out = np.mean(values, axis=0)
+        print(f"{marks:>4}M {len(values):>4} {MARK_CONTEXT_TOKENS[marks]:>7} "
+              f"{tokens_in:>10.0f} {tokens_out:>11.0f} {1 - tokens_out / tokens_in:>7.1%} "
+              f"{cov_in:>12.3f} {cov_out:>13.3f} {ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
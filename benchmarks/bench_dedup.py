@@ -0,0 +1,125 @@
+"""Corpus shrinkage and retrieval recall across near-duplicate thresholds (dedup.py).
+
+For every --thresholds value (and `off`, the raw corpus) a snapshot is built under
+bench_results/, then graded with BM25 on labels taken from the raw corpus:
+  * judge  - llm_as_judge_ds.csv questions; relevant rows are the top rows for the reference answer
+  * ncert  - NCERT Q&A rows queried by their own question; relevant = that row
+A retrieved merged row counts as a hit for every raw row it absorbed, so recall measures
+whether the fact is still found. `distinct@k` is how many different facts (raw-corpus
+clusters at the configured threshold) the top k hold: the redundancy dedup removes.
+
+Usage (from the repo root, offline):
+    python -m benchmarks.bench_dedup
+    python -m benchmarks.bench_dedup --thresholds 0.3 0.4 0.5 --max-cluster 6 --k 5 10
+"""
+import os
+import time
+import argparse
+from typing import Dict, List
+
+import numpy as np
+import pyarrow as pa
+
+from dataset_preprocessor import build_snapshot
+from dedup import DedupConfig, body, cluster_near_duplicates, group_keys
+from hybrid_retrieval import HybridRetriever
+from benchmarks.bench_hybrid_retrieval import NCERT_PATH, judge_queries, ncert_queries, row_hash
+
+RESULTS_DIR = './bench_results'
+
+
+def read_table(path: str) -> pa.Table:
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def lexical_retriever(snapshot_path: str) -> HybridRetriever:
+    retriever = HybridRetriever(vector_db=None, snapshot_path=snapshot_path, weights={"vector": 0.0, "lexical": 1.0})
+    retriever.warm()
+    return retriever
+
+
+def representatives(raw: pa.Table, config: DedupConfig) -> Dict[str, str]:
+    """Raw row hash -> hash of the row that holds it after collapsing with `config`."""
+    raw_hashes = raw['content_hash'].to_pylist()
+    snapshot_path = os.path.join(RESULTS_DIR, f"dedup_{config.threshold}.arrow")
+    build_snapshot(NCERT_PATH, snapshot_path, dedup=config)
+    table = read_table(snapshot_path)
+    by_key = dict(zip(table['key'].to_pylist(), table['content_hash'].to_pylist()))
+    clusters = cluster_near_duplicates([body(c) for c in raw['content'].to_pylist()], group_keys(raw, config.group_by),
+                                      config)
+    mapping = {}
+    for members in clusters:
+        target = by_key[raw['key'][members[0]].as_py()]
+        mapping.update({raw_hashes[i]: target for i in members})
+    return mapping
+
+
+def grade(retriever: HybridRetriever, labels, mapping: Dict[str, str], fact_of: Dict[str, int], ks: List[int]):
+    limit = max(ks)
+    rows, latencies = [], []
+    for query, relevant in labels:
+        targets = {mapping.get(h, h) for h in relevant}
+        start = time.perf_counter()
+        docs = retriever.search(query, limit=limit)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ranked = [row_hash(doc.content) for doc in docs]
+        first = next((i for i, h in enumerate(ranked) if h in targets), None)
+        scores = {"mrr": 0.0 if first is None else 1.0 / (first + 1)}
+        for k in ks:
+            scores[f"recall@{k}"] = len(targets & set(ranked[:k])) / len(targets)
+            scores[f"distinct@{k}"] = len({fact_of.get(h, h) for h in ranked[:k]})
+        rows.append(scores)
+    result = {name: float(np.mean([r[name] for r in rows])) for name in rows[0]}
+    result["p50_ms"] = float(np.percentile(latencies, 50))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.3, 0.4, 0.5, 0.6])
+    parser.add_argument("--max-cluster", type=int, default=DedupConfig().max_cluster_size)
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--ncert-samples", type=int, default=300)
+    args = parser.parse_args()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    raw_path = os.path.join(RESULTS_DIR, "dedup_off.arrow")
+    build_snapshot(NCERT_PATH, raw_path, dedup=None)
+    raw = read_table(raw_path)
+    raw_retriever = lexical_retriever(raw_path)
+    label_sets = {
+        "judge": judge_queries(raw_retriever, use_vector=False),
+        "ncert": ncert_queries(raw, args.ncert_samples),
+    }
+
+    # Facts for distinct@k: raw rows grouped at the default threshold, fixed across configurations
+    raw_hashes = raw['content_hash'].to_pylist()
+    default_mapping = representatives(raw, DedupConfig(max_cluster_size=args.max_cluster))
+    fact_of = {h: idx for idx, h in enumerate(sorted(set(default_mapping.values())))}
+    fact_of.update({h: fact_of[default_mapping[h]] for h in raw_hashes})
+
+    configs = [("off", raw_path, {})]
+    for threshold in args.thresholds:
+        config = DedupConfig(threshold=threshold, max_cluster_size=args.max_cluster)
+        start = time.perf_counter()
+        mapping = representatives(raw, config)
+        print(f"   threshold {threshold}: clustered in {time.perf_counter() - start:.1f}s")
+        configs.append((str(threshold), os.path.join(RESULTS_DIR, f"dedup_{threshold}.arrow"), mapping))
+
+    columns = [f"recall@{k}" for k in args.k] + ["mrr"] + [f"distinct@{k}" for k in args.k]
+    print(f"\n{'threshold':<10} {'rows':>6} {'shrink':>7} {'chars':>7} {'set':>6} "
+          + " ".join(f"{c:>11}" for c in columns) + f" {'p50 ms':>7}")
+    for name, path, mapping in configs:
+        table = read_table(path)
+        chars = sum(len(c) for c in table['content'].to_pylist())
+        retriever = lexical_retriever(path)
+        for set_name, labels in label_sets.items():
+            result = grade(retriever, labels, mapping, fact_of, args.k)
+            cells = " ".join(f"{result[c]:>11.3f}" for c in columns)
+            print(f"{name:<10} {table.num_rows:>6} {1 - table.num_rows / raw.num_rows:>7.1%} {chars / 1e6:>6.1f}M "
+                  f"{set_name:>6} {cells} {result['p50_ms']:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Peak RSS and rows/s of the legacy list-based document build vs. the streaming pipeline.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_document_pipeline --scale 1 4 16
+
+The NCERT CSVs are replicated `scale` times into a temp folder to simulate a growing
+corpus. Each mode runs in its own subprocess so peak RSS is not shared between runs.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import resource
+import tempfile
+import subprocess
+
+NCERT_PATH = './NCERT'
+BATCH_SIZE = 50
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def legacy(path: str) -> int:
+    """The pre-streaming path: whole CSVs -> one list of dicts -> slices -> += batch strings."""
+    import pandas as pd
+
+    all_doc_data = []
+    for filename in os.listdir(path):
+        ds = pd.read_csv(os.path.join(path, filename)).fillna("")
+        subject = 'History' if 'history' in filename.lower() else 'Geography'
+        for row in ds.to_dict('records'):
+            all_doc_data.append({
+                "content": (f"SUBJECT: {subject} | TOPIC: {row.get('Topic', 'General')}\n"
+                            f"Q: {row.get('Question', '')}\nA: {row.get('Answer', '')}\n"
+                            f"EXP: {row.get('Explanation', '')}"),
+                "metadata": {"source": filename.replace('.csv', ''), "subject": subject,
+                             "topic": str(row.get('Topic', 'General')), "type": "Q&A"},
+            })
+
+    rows = 0
+    for i in range(0, len(all_doc_data), BATCH_SIZE):
+        batch_content_str = ""
+        for item in all_doc_data[i:i + BATCH_SIZE]:
+            batch_content_str += item['content']
+            rows += 1
+        hashlib.md5(batch_content_str.encode("utf-8")).hexdigest()
+    return rows
+
+
+def streaming(path: str) -> int:
+    from dataset_preprocessor import iter_documents, iter_batches
+
+    rows = 0
+    for batch in iter_batches(iter_documents(path), BATCH_SIZE):
+        hashlib.md5("".join(item['content'] for item in batch).encode("utf-8")).hexdigest()
+        rows += len(batch)
+    return rows
+
+
+def worker(mode: str, path: str) -> None:
+    import pandas  # noqa: F401  (import cost is excluded from the measured growth)
+    import dataset_preprocessor  # noqa: F401
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    rows = legacy(path) if mode == 'legacy' else streaming(path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"rows": rows, "seconds": elapsed, "peak_mb": peak_rss_mb(), "growth_mb": peak_rss_mb() - baseline}))
+
+
+def make_corpus(scale: int, target: str) -> None:
+    for filename in sorted(os.listdir(NCERT_PATH)):
+        if filename.lower().endswith('.csv'):
+            stem = filename[:-4]
+            for copy in range(scale):
+                shutil.copy(os.path.join(NCERT_PATH, filename), os.path.join(target, f"{stem}_{copy}.csv"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--worker", choices=["legacy", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.path)
+        return
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{'scale':>5} {'mode':>9} {'rows':>8} {'rows/s':>9} {'peak RSS':>9} {'growth':>8}")
+    for scale in args.scale:
+        with tempfile.TemporaryDirectory() as tmp:
+            make_corpus(scale, tmp)
+            for mode in ("legacy", "streaming"):
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_document_pipeline", "--worker", mode, "--path", tmp],
+                    cwd=repo_root, capture_output=True, text=True, check=True,
+                ).stdout.strip().splitlines()[-1]
+                r = json.loads(out)
+                print(f"{scale:>5} {mode:>9} {r['rows']:>8} {r['rows'] / r['seconds']:>9.0f} "
+                      f"{r['peak_mb']:>7.0f}MB {r['growth_mb']:>6.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
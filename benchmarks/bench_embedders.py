@@ -0,0 +1,105 @@
+"""Query-embedding latency and ingestion throughput: OpenAI API vs. local ONNX (fp32 / int8).
+
+For every backend:
+  * query p50/p95 for single queries, one at a time (what a lone user sees)
+  * queries/s and p95 with `--concurrency` threads (local queries share micro-batches)
+  * ingestion docs/s through the IngestionEngine backend contract, `--batch` docs per call
+The int8 model is also compared with fp32 by cosine similarity of the same texts, to
+show what quantisation costs in vector agreement.
+
+Usage (from the repo root):
+    python -m local_embedder --quantize                     # once: writes onnx/model_int8.onnx
+    python -m benchmarks.bench_embedders --backends local-fp32 local-int8
+    python -m benchmarks.bench_embedders --backends openai local-int8 --docs 500   # needs OPENAI_API_KEY
+"""
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from dataset_preprocessor import SNAPSHOT_PATH, load_snapshot
+from ingestion_engine import LocalBatchEmbedder, OpenAIBatchEmbedder
+from local_embedder import LOCAL_MODEL_PATH, LocalEmbedder
+
+NCERT_PATH = './NCERT'
+
+
+def build_backend(name: str, model_path: str):
+    """(agno embedder for queries, IngestionEngine backend for documents)."""
+    if name == "openai":
+        from openai import OpenAI
+        from agno.knowledge.embedder.openai import OpenAIEmbedder
+
+        embedder = OpenAIEmbedder(id='text-embedding-3-large', dimensions=3072)
+        return embedder, OpenAIBatchEmbedder(OpenAI(), model=embedder.id, dimensions=embedder.dimensions)
+    embedder = LocalEmbedder(model_path=model_path, quantized=(name == "local-int8"))
+    embedder.warm()
+    return embedder, LocalBatchEmbedder(embedder)
+
+
+def timed(call, *args):
+    start = time.perf_counter()
+    result = call(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def bench_backend(name: str, model_path: str, queries, docs, concurrency: int, batch: int):
+    embedder, backend = build_backend(name, model_path)
+
+    single = [timed(embedder.get_embedding, q)[1] for q in queries]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        concurrent = [ms for _, ms in executor.map(lambda q: timed(embedder.get_embedding, q), queries)]
+    concurrent_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(0, len(docs), batch):
+        backend.embed(docs[i : i + batch])
+    ingest_seconds = time.perf_counter() - start
+
+    row = {
+        "backend": name,
+        "single_p50": np.percentile(single, 50), "single_p95": np.percentile(single, 95),
+        "qps": len(queries) / concurrent_seconds, "concurrent_p95": np.percentile(concurrent, 95),
+        "docs_per_s": len(docs) / ingest_seconds,
+        "mean_batch": getattr(getattr(embedder, "_batcher", None), "mean_batch", 0.0),
+    }
+    return row, embedder
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["local-fp32", "local-int8"],
+                        choices=["openai", "local-fp32", "local-int8"])
+    parser.add_argument("--model-path", default=LOCAL_MODEL_PATH)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=50, help="docs per ingestion call (knowledge_gs1.BATCH_SIZE)")
+    args = parser.parse_args()
+
+    contents = load_snapshot(base_path=NCERT_PATH, snapshot_path=SNAPSHOT_PATH)['content'].to_pylist()
+    docs = contents[: args.docs]
+    queries = [next((line[3:] for line in c.splitlines() if line.startswith("Q: ")), c[:200])
+               for c in contents[-args.queries:]]
+
+    print(f"{len(queries)} queries (concurrency {args.concurrency}), {len(docs)} docs in batches of {args.batch}\n")
+    print(f"{'backend':<11} {'p50 ms':>8} {'p95 ms':>8} {'queries/s':>10} {'conc p95':>9} {'mean batch':>10} {'docs/s':>8}")
+    embedders = {}
+    for name in args.backends:
+        row, embedders[name] = bench_backend(name, args.model_path, queries, docs, args.concurrency, args.batch)
+        print(f"{name:<11} {row['single_p50']:>8.1f} {row['single_p95']:>8.1f} {row['qps']:>10.1f} "
+              f"{row['concurrent_p95']:>9.1f} {row['mean_batch']:>10.1f} {row['docs_per_s']:>8.0f}")
+
+    if {"local-fp32", "local-int8"} <= embedders.keys():
+        sample = docs[:200]
+        full, _ = embedders["local-fp32"].embed_documents(sample)
+        quant, _ = embedders["local-int8"].embed_documents(sample)
+        cosines = np.sum(np.asarray(full) * np.asarray(quant), axis=1)
+        print(f"\nint8 vs fp32 cosine: mean={cosines.mean():.4f} min={cosines.min():.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Recall@k and latency of vector-only, BM25-only and hybrid (RRF) GS1 retrieval.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_hybrid_retrieval --modes vector lexical hybrid --k 5 10
+    python -m benchmarks.bench_hybrid_retrieval --modes lexical          # offline, no API keys
+
+Two labelled query sets are used:
+  * judge  - questions from llm_as_judge_ds.csv (mark suffix stripped). Relevant rows are the
+             union of the top rows for the *reference answer* under BM25 and (when available)
+             dense search, so neither ranker is graded only against itself on the question.
+  * ncert  - a sample of NCERT Q&A rows queried by their own question; relevant = that row.
+"""
+import re
+import time
+import random
+import hashlib
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from dataset_preprocessor import SNAPSHOT_PATH, load_snapshot
+from hybrid_retrieval import HybridRetriever
+
+JUDGE_DATASET = 'llm_as_judge_ds.csv'
+NCERT_PATH = './NCERT'
+LABELS_PER_RANKER = 5
+# "... 15M", "... (15 Marks)", "... (10 Marks, 150 words)"
+_MARKS_RE = re.compile(r"\s*\(?\b(10|15)\s*(M|Marks)\b[^)]*\)?\s*$", re.IGNORECASE)
+
+
+def row_hash(content: str) -> str:
+    return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+
+def ncert_queries(snapshot, samples: int, seed: int = 7):
+    rng = random.Random(seed)
+    contents = snapshot['content'].to_pylist()
+    hashes = snapshot['content_hash'].to_pylist()
+    queries = []
+    for i in rng.sample(range(len(contents)), min(samples, len(contents))):
+        match = re.search(r"^Q: (.*)$", contents[i], re.MULTILINE)
+        if match and match.group(1).strip():
+            queries.append((match.group(1).strip(), {hashes[i]}))
+    return queries
+
+
+def judge_queries(retriever: HybridRetriever, use_vector: bool):
+    df = pd.read_csv(JUDGE_DATASET, encoding="latin1").fillna("")
+    queries = []
+    for _, row in df.iterrows():
+        question = _MARKS_RE.sub("", str(row["input"])).strip()
+        reference = str(row["reference"])
+        relevant = {row_hash(retriever.contents[r]) for r in retriever.lexical_search(reference, LABELS_PER_RANKER)}
+        if use_vector:
+            relevant |= {row_hash(retriever.contents[r]) for r in retriever.vector_search(reference, LABELS_PER_RANKER)}
+        if question and relevant:
+            queries.append((question, relevant))
+    return queries
+
+
+def run_mode(retriever: HybridRetriever, mode: str, queries, ks):
+    weights = {"vector": 1.0 if mode in ("vector", "hybrid") else 0.0,
+               "lexical": 1.0 if mode in ("lexical", "hybrid") else 0.0}
+    retriever.weights = weights
+    limit = max(ks)
+    hits = {k: [] for k in ks}
+    latencies = []
+    for query, relevant in queries:
+        start = time.perf_counter()
+        docs = retriever.search(query, limit=limit)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ranked = [row_hash(doc.content) for doc in docs]
+        for k in ks:
+            hits[k].append(len(relevant & set(ranked[:k])) / len(relevant))
+    return {k: float(np.mean(v)) for k, v in hits.items()}, np.percentile(latencies, [50, 95])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["vector", "lexical", "hybrid"],
+                        choices=["vector", "lexical", "hybrid"])
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--ncert-samples", type=int, default=200)
+    args = parser.parse_args()
+
+    use_vector = any(mode != "lexical" for mode in args.modes)
+    if use_vector:
+        from knowledge_gs1 import vector_db   # needs OPENAI/OPIK keys and an ingested table
+    else:
+        vector_db = None
+
+    retriever = HybridRetriever(vector_db=vector_db, base_path=NCERT_PATH, snapshot_path=SNAPSHOT_PATH)
+    retriever._ensure_index()
+    query_sets = {
+        "judge": judge_queries(retriever, use_vector),
+        "ncert": ncert_queries(load_snapshot(snapshot_path=SNAPSHOT_PATH), args.ncert_samples),
+    }
+
+    header = " ".join(f"{f'recall@{k}':>9}" for k in args.k)
+    print(f"{'set':>6} {'mode':>8} {'queries':>7} {header} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, queries in query_sets.items():
+        for mode in args.modes:
+            recall, (p50, p95) = run_mode(retriever, mode, queries, args.k)
+            cells = " ".join(f"{recall[k]:>9.3f}" for k in args.k)
+            print(f"{name:>6} {mode:>8} {len(queries):>7} {cells} {p50:>8.1f} {p95:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
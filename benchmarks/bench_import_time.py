@@ -0,0 +1,117 @@
+"""Cold-start import budget for the serving path.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters without any
+API keys in the environment, parses the report and checks:
+  * importing must succeed offline (no opik/OpenAI config at import time),
+  * ingestion-only packages (pandas, datasets, lancedb) must not be imported,
+  * cumulative import time must stay within --max-ms or within --tolerance of a
+    saved baseline.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --save-baseline benchmarks/import_baseline.json
+    python -m benchmarks.bench_import_time --baseline benchmarks/import_baseline.json --tolerance 0.25
+
+Exit code 1 on any regression, so it can gate CI.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+DEFAULT_MODULES = ["agent", "knowledge_gs1", "hybrid_retrieval", "answer_cache", "word_budget", "agent_pool"]
+FORBIDDEN = ["pandas", "datasets", "lancedb"]   # (tqdm arrives with opik itself)
+DEFAULT_MAX_MS = 10_000
+SECRET_VARS = ["OPENAI_API_KEY", "OPIK_API_KEY", "OPIK_WORKSPACE", "GOOGLE_API_KEY", "GEMINI_API_KEY"]
+
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) for every line of an -X importtime report."""
+    rows = []
+    for line in stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def measure(module: str, runs: int) -> Dict:
+    env = {k: v for k, v in os.environ.items() if k not in SECRET_VARS}
+    env["OPIK_TRACK_DISABLE"] = "true"
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              capture_output=True, text=True, env=env)
+        if proc.returncode != 0:
+            error = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+            return {"module": module, "error": "\n".join(error[-5:])}
+        rows = parse_importtime(proc.stderr)
+        total = next((cum for name, _, cum, depth in rows if name == module and depth == 0), 0)
+        if best is None or total < best["total_us"]:
+            best = {"module": module, "total_us": total, "rows": rows}
+
+    loaded = {name for name, *_ in best["rows"]}
+    heaviest = sorted(((cum, name) for name, _, cum, depth in best["rows"] if 1 <= depth <= 2), reverse=True)
+    return {
+        "module": module,
+        "total_ms": best["total_us"] / 1000,
+        "forbidden": [name for name in FORBIDDEN if name in loaded],
+        "heaviest": [(name, cum / 1000) for cum, name in heaviest[:8]],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per module (best run is kept)")
+    parser.add_argument("--max-ms", type=float, default=DEFAULT_MAX_MS, help="absolute budget per module")
+    parser.add_argument("--baseline", help="JSON of {module: ms} from --save-baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs. baseline")
+    parser.add_argument("--save-baseline", help="write the measured times as the new baseline")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    failures = []
+    measured = {}
+    for module in args.modules:
+        result = measure(module, args.runs)
+        if "error" in result:
+            print(f"❌ {module}: import failed without API keys\n{result['error']}")
+            failures.append(module)
+            continue
+
+        ms = result["total_ms"]
+        measured[module] = round(ms, 1)
+        limit = min(args.max_ms, baseline[module] * (1 + args.tolerance)) if module in baseline else args.max_ms
+        ok = ms <= limit and not result["forbidden"]
+        print(f"{'✅' if ok else '❌'} {module:<18} {ms:>8.0f} ms (budget {limit:.0f} ms)")
+        if result["forbidden"]:
+            print(f"   ingestion-only imports on the serving path: {', '.join(result['forbidden'])}")
+        for name, cum_ms in result["heaviest"]:
+            print(f"   {cum_ms:>8.0f} ms  {name}")
+        if not ok:
+            failures.append(module)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(measured, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.save_baseline}")
+
+    if failures:
+        print(f"\n⚠️ Import budget exceeded: {', '.join(failures)}")
+        sys.exit(1)
+    print("\n✅ Import budget OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Prompt tokens and latency per turn over one long chat session, with and without bounded memory.
+
+A `--turns` session (llm_as_judge_ds.csv questions interleaved with follow-ups that
+refer back to earlier answers) runs through the supervisor Team in synthetic replay
+with provider-like delays, whose time to first token grows with the prompt. `full`
+sends the whole transcript with every question, the way unbounded chat history does;
+`bounded` sends ConversationMemory's recent window plus its rolling summary.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_memory --turns 30
+    VYUHA_MEMORY_WINDOW_TOKENS=800 python -m benchmarks.bench_memory --turns 30 --every 5
+"""
+import os
+import math
+import time
+import argparse
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+os.environ.setdefault("GOOGLE_API_KEY", "offline")
+os.environ.setdefault("OPIK_TRACK_DISABLE", "true")
+
+import replay
+from conversation_memory import ConversationMemory
+from benchmarks.bench_pipeline import load_questions
+
+FOLLOW_UPS = [
+    "Elaborate on the second point of your previous answer. (10 Marks)",
+    "Give two examples that support your last answer. (10 Marks)",
+    "How does this connect to the question I asked before that? (15 Marks)",
+]
+
+
+def session(turns: int):
+    questions = load_questions(turns)
+    return [FOLLOW_UPS[(i // 3) % len(FOLLOW_UPS)] if i % 3 == 2 else questions[i] for i in range(turns)]
+
+
+def input_tokens(run_output) -> int:
+    """Prompt tokens of every model call in the run (supervisor and SME)."""
+    total, pending = 0, [run_output]
+    while pending:
+        run = pending.pop()
+        metrics = getattr(run, "metrics", None)
+        total += (getattr(metrics, "input_tokens", 0) or 0) if metrics is not None else 0
+        pending.extend(getattr(run, "member_responses", None) or [])
+    return total
+
+
+def run_session(team, prompts, memory: ConversationMemory):
+    from streaming import StreamStats, iter_answer_deltas
+    from word_budget import BudgetEnforcer, WordBudget
+
+    rows = []
+    for prompt in prompts:
+        budget = WordBudget.for_question(prompt)
+        enforcer = BudgetEnforcer(budget)
+        stats = StreamStats()
+        message = memory.prompt(prompt + budget.instruction())
+        # Run to completion (no early stop) so every turn reports its final token usage
+        for delta in iter_answer_deltas(team, message, stats=stats):
+            enforcer.feed(delta)
+        enforcer.finish()
+        memory.add(prompt, enforcer.text)
+        rows.append((memory.stats.context_tokens, input_tokens(stats.run_output), stats.ttft, stats.total))
+    return np.array(rows, dtype=float)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--every", type=int, default=5, help="print every n-th turn")
+    args = parser.parse_args()
+
+    replay.configure(replay.ReplayConfig(mode="synthetic", latency="synthetic"))
+    from agent import get_supervisor_team
+    from knowledge_gs1 import get_hybrid_retriever
+
+    get_hybrid_retriever().weights["vector"] = 0.0
+    team = get_supervisor_team()
+    for member in [team, *team.members]:
+        member.debug_mode = False
+
+    prompts = session(args.turns)
+    results = {}
+    for name, memory in (("full", ConversationMemory(window_tokens=math.inf, window_turns=math.inf)),
+                         ("bounded", ConversationMemory())):
+        start = time.perf_counter()
+        results[name] = run_session(team, prompts, memory)
+        print(f"{name}: {args.turns} turns in {time.perf_counter() - start:.1f}s ({memory.stats.report()})")
+
+    print(f"\n{'turn':>4} | {'history':>8} {'prompt tok':>10} {'ttft':>6} {'total':>6} | "
+          f"{'history':>8} {'prompt tok':>10} {'ttft':>6} {'total':>6}")
+    print(f"{'':>4} | {'full':^32} | {'bounded':^32}")
+    for i in range(args.turns):
+        if (i + 1) % args.every and i + 1 != args.turns:
+            continue
+        cells = " | ".join(f"{h:>8.0f} {p:>10.0f} {t:>5.2f}s {e:>5.2f}s" for h, p, t, e in
+                           (results["full"][i], results["bounded"][i]))
+        print(f"{i + 1:>4} | {cells}")
+
+    full, bounded = results["full"], results["bounded"]
+    print(f"\nsession prompt tokens  full={full[:, 1].sum():.0f} bounded={bounded[:, 1].sum():.0f} "
+          f"({1 - bounded[:, 1].sum() / full[:, 1].sum():.1%} fewer)")
+    print(f"last-5-turn mean       ttft full={full[-5:, 2].mean():.2f}s bounded={bounded[-5:, 2].mean():.2f}s, "
+          f"total full={full[-5:, 3].mean():.2f}s bounded={bounded[-5:, 3].mean():.2f}s")
+
+
+if __name__ == "__main__":
+    main()
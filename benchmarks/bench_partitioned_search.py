@@ -0,0 +1,185 @@
+"""Latency and recall of routed (subject/book pre-filtered) vs global search as the corpus grows.
+
+The NCERT GS1 snapshot is grown `--growth` times with synthetic GS2/GS3 rows (Polity,
+Governance, International Relations, Economy, Environment, Science and Technology,
+Internal Security). Their text mixes a subject vocabulary with the most frequent
+(generic) NCERT terms, so they compete with GS1 rows for the common query terms.
+
+Queries are NCERT Q&A rows asked by their own question (relevant = that row), as in
+bench_hybrid_retrieval. For each size:
+  * lexical - HybridRetriever BM25 over the whole corpus vs routed to the partition
+              chosen by the query router (global when it is not confident);
+  * vector  - LanceDB over random unit vectors (`--dims`) with subject/source/topic
+              scalar indexes: global top-k vs the same query pre-filtered to the
+              routed partition. The query is the target row's vector plus noise, so
+              recall drops only when the router sends it to the wrong partition.
+
+Usage (from the repo root, offline):
+    python -m benchmarks.bench_partitioned_search --growth 1 2 4 8
+    python -m benchmarks.bench_partitioned_search --growth 1 4 --dims 0      # lexical only
+"""
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from collections import Counter
+
+import numpy as np
+import pyarrow as pa
+
+from dataset_preprocessor import load_snapshot
+from hybrid_retrieval import BM25Index, HybridRetriever, tokenize
+from query_router import QueryRouter
+from vector_index import (IndexConfig, MIN_ROWS_FOR_INDEX, PARTITION_COLUMNS, build_vector_index,
+                          create_partition_indexes, partition_filter)
+from benchmarks.bench_hybrid_retrieval import NCERT_PATH, ncert_queries, row_hash
+
+GS23_LEXICON = {
+    "Polity": "constitution parliament article amendment fundamental rights judiciary supreme court "
+              "president governor legislature federalism lok sabha rajya sabha preamble directive "
+              "principles citizenship writ election commission speaker ordinance",
+    "Governance": "policy scheme transparency accountability rti citizen charter e-governance ngo "
+                  "self help group welfare implementation bureaucracy civil services panchayat "
+                  "municipality decentralisation grievance redressal",
+    "International Relations": "bilateral treaty diplomacy united nations security council wto brics "
+                               "quad neighbourhood foreign policy sanctions summit multilateral "
+                               "strategic partnership diaspora asean saarc",
+    "Economy": "inflation gdp fiscal deficit monetary policy repo rate banking gst taxation budget "
+               "subsidy msme investment fdi capital market unemployment rbi msp",
+    "Environment": "biodiversity climate change emissions carbon wetland conservation pollution "
+                   "sanctuary national park ozone ecosystem afforestation paris agreement "
+                   "renewable waste management",
+    "Science and Technology": "biotechnology nanotechnology isro satellite vaccine genome artificial "
+                              "intelligence semiconductor quantum nuclear reactor cyber robotics "
+                              "launch vehicle research",
+    "Internal Security": "terrorism insurgency naxalism border management cyber security money "
+                         "laundering radicalisation armed forces paramilitary intelligence "
+                         "smuggling organised crime",
+}
+TOPICS_PER_SUBJECT = 40
+SUBJECT_SHARE = 0.5         # share of a synthetic row's words drawn from its subject vocabulary
+BACKGROUND_TERMS = 300      # most frequent NCERT terms, the shared vocabulary of every paper
+
+
+def synthetic_rows(count: int, background: list, rng: random.Random):
+    """GS2/GS3-like rows in create_document's layout, with subject/source/topic metadata."""
+    rows = []
+    subjects = sorted(GS23_LEXICON)
+    for i in range(count):
+        subject = subjects[i % len(subjects)]
+        lexicon = GS23_LEXICON[subject].split()
+        paper = "GS2" if subject in ("Polity", "Governance", "International Relations") else "GS3"
+        topic = f"{subject} topic {rng.randrange(TOPICS_PER_SUBJECT)}"
+
+        def words(n):
+            return " ".join(rng.choice(lexicon) if rng.random() < SUBJECT_SHARE else rng.choice(background)
+                            for _ in range(n))
+        content = f"Subject: {subject}\nTopic: {topic}\nQ: {words(14)}?\nA: {words(30)}\nEXP: {words(60)}"
+        rows.append((content, {"subject": subject, "source": f"Synthetic_{paper}_{subject.replace(' ', '_')}",
+                               "topic": topic, "type": "Q&A", "merged_sources": ""}))
+    return rows
+
+
+def grown_retriever(base: HybridRetriever, extra):
+    """A lexical HybridRetriever over the NCERT rows plus `extra` synthetic rows."""
+    retriever = HybridRetriever(vector_db=None, weights={"vector": 0.0, "lexical": 1.0}, routing=True)
+    retriever.contents = base.contents + [content for content, _ in extra]
+    retriever.metadata = {field: np.concatenate([values, np.asarray([meta.get(field, "") for _, meta in extra],
+                                                                    dtype=object)])
+                          for field, values in base.metadata.items()}
+    retriever._row_by_hash = {row_hash(c): i for i, c in enumerate(retriever.contents)}
+    retriever._bm25 = BM25Index(retriever.contents)
+    retriever._router = QueryRouter(retriever.contents, retriever.metadata)
+    return retriever
+
+
+def time_queries(fn, queries):
+    latencies, hits = [], 0
+    for query, relevant in queries:
+        start = time.perf_counter()
+        found = fn(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += bool(found & relevant)
+    return hits / len(queries), np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def bench_lexical(retriever: HybridRetriever, queries, limit: int):
+    def run(query):
+        return {row_hash(doc.content) for doc in retriever.search(query, limit)}
+
+    retriever.routing = False
+    global_result = time_queries(run, queries)
+    retriever.routing = True
+    for query, _ in queries[:20]:
+        run(query)      # builds the partition indexes outside the timing
+    return global_result, time_queries(run, queries)
+
+
+def bench_vector(retriever: HybridRetriever, queries, limit: int, dims: int, rng: np.random.Generator):
+    folder = tempfile.mkdtemp(prefix="vyuha_partitions_")
+    try:
+        import lancedb
+
+        vectors = rng.standard_normal((len(retriever.contents), dims)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        hashes = [row_hash(c) for c in retriever.contents]
+        columns = {"vector": pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel()), dims),
+                   "id": pa.array(hashes)}
+        columns.update({c: pa.array([str(v) for v in retriever.metadata[c]]) for c in PARTITION_COLUMNS})
+        table = lancedb.connect(folder).create_table("bench", pa.table(columns))
+        create_partition_indexes(table)
+        config = IndexConfig()
+        if table.count_rows() >= MIN_ROWS_FOR_INDEX:
+            build_vector_index(table, config)
+        row_of = {h: i for i, h in enumerate(hashes)}
+
+        def search(query_vector, where=None):
+            builder = table.search(query_vector).limit(limit).nprobes(config.nprobes)
+            if where:
+                builder = builder.where(where, prefilter=True)
+            return set(builder.select(["id"]).to_arrow()["id"].to_pylist())
+
+        jitter = {q: vectors[row_of[next(iter(r))]] + rng.standard_normal(dims).astype(np.float32) * 0.02
+                  for q, r in queries}
+        global_result = time_queries(lambda q: search(jitter[q]), queries)
+        routed = time_queries(lambda q: search(jitter[q], partition_filter(retriever.route(q).filters)), queries)
+        return global_result, routed
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--growth", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="corpus size as a multiple of the NCERT GS1 rows")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--dims", type=int, default=384, help="random vector size for the LanceDB part (0: skip)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    base = HybridRetriever(vector_db=None, base_path=NCERT_PATH, weights={"vector": 0.0}, routing=False)
+    base.warm()
+    queries = ncert_queries(load_snapshot(base_path=NCERT_PATH), args.queries, seed=args.seed)
+    rng = random.Random(args.seed)
+    counts = Counter(t for text in base.contents for t in tokenize(text))
+    background = [term for term, _ in counts.most_common(BACKGROUND_TERMS)]
+    extra_all = synthetic_rows(len(base.contents) * (max(args.growth) - 1), background, rng)
+
+    print(f"{len(queries)} NCERT queries, top-{args.limit}\n")
+    print(f"{'rows':>7} {'routed':>7} | {'lexical global':>24} | {'lexical routed':>24} | "
+          f"{'vector global':>24} | {'vector routed':>24}")
+    print(f"{'':>7} {'':>7} | " + " | ".join([f"{'recall':>7} {'p50 ms':>7} {'p95 ms':>8}"] * 4))
+    for growth in args.growth:
+        retriever = grown_retriever(base, extra_all[: len(base.contents) * (growth - 1)])
+        routed_share = np.mean([bool(retriever.route(q).filters) for q, _ in queries])
+        cells = list(bench_lexical(retriever, queries, args.limit))
+        if args.dims:
+            cells += bench_vector(retriever, queries, args.limit, args.dims, np.random.default_rng(args.seed))
+        print(f"{len(retriever.contents):>7} {routed_share:>7.0%} | "
+              + " | ".join(f"{recall:>7.3f} {p50:>7.2f} {p95:>8.2f}" for recall, p50, p95 in cells))
+
+
+if __name__ == "__main__":
+    main()
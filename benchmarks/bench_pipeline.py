@@ -0,0 +1,176 @@
+"""Offline, deterministic throughput of the supervisor -> SME -> knowledge pipeline.
+
+Gemini, the OpenAI embedder and DuckDuckGo are served by replay.py: from recorded
+cassettes (`--mode replay`) or scripted synthetic responses (`--mode synthetic`, no
+cassettes needed). Retrieval, agno orchestration, budget enforcement and stream
+rendering run for real, so `overhead` below is this repo's own cost per request.
+`--latency synthetic|recorded` adds provider-like delays back in for end-to-end numbers.
+`--no-prefetch` / `--no-fast-path` turn off the speculative knowledge search and the
+SME-only path for simple factual questions (prefetch.py) to measure what they save.
+
+Each run is appended to `--history` with the current commit, and compared with the
+previous run of the same configuration.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_pipeline --questions 20 --concurrency 2
+    python -m benchmarks.bench_pipeline --mode synthetic --latency synthetic
+    VYUHA_REPLAY=record python app.py ...   # then: --mode replay --latency recorded
+"""
+import os
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Provider clients are still constructed (never called): dummy keys keep their constructors quiet
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+os.environ.setdefault("GOOGLE_API_KEY", "offline")
+os.environ.setdefault("OPIK_TRACK_DISABLE", "true")
+
+import replay
+from metrics import registry
+
+HISTORY_PATH = './bench_results/pipeline.jsonl'
+JUDGE_DATASET = 'llm_as_judge_ds.csv'
+
+
+def load_questions(n: int):
+    questions = pd.read_csv(JUDGE_DATASET, encoding="latin1").fillna("")["input"].astype(str).tolist()
+    return [questions[i % len(questions)] for i in range(n)]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def answer(pool, question: str, prefetching: bool = True, fast_path: bool = True):
+    from streaming import StreamStats, ThrottledRenderer, iter_answer_deltas
+    from word_budget import BudgetEnforcer, WordBudget
+    from context_packing import packing_budget
+    from prefetch import choose_runner, prefetch
+
+    stats = StreamStats()
+    budget = WordBudget.for_question(question)
+    enforcer = BudgetEnforcer(budget, stats=None)
+    renderer = ThrottledRenderer(lambda text, final: None, stats=stats)
+    with prefetch(question, enabled=prefetching) as scope, pool.lease() as team, packing_budget(budget.marks):
+        runner, _ = choose_runner(team, question, scope, enabled=fast_path)
+        stream = iter_answer_deltas(runner, f"{question}\n\n{budget.instruction()}", stats)
+        for delta in stream:
+            renderer.feed(enforcer.feed(delta))
+            if enforcer.exhausted:
+                stream.close()
+                stats.finished = time.perf_counter()
+                break
+        renderer.flush(final=True)
+    return stats
+
+
+def bench_components(questions, reps: int):
+    from knowledge_gs1 import get_embedder, get_hybrid_retriever
+
+    results = {}
+    embedder, retriever = get_embedder(), get_hybrid_retriever()
+    retriever.warm()
+    for name, call in (("embedding", embedder.get_embedding), ("retrieval", retriever.search)):
+        start = time.perf_counter()
+        for _ in range(reps):
+            for question in questions:
+                call(question)
+        elapsed = time.perf_counter() - start
+        results[name] = {"calls_per_s": reps * len(questions) / elapsed, "ms_per_call": elapsed * 1000 / (reps * len(questions))}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["synthetic", "replay"], default="synthetic")
+    parser.add_argument("--latency", choices=["none", "synthetic", "recorded"], default="none")
+    parser.add_argument("--cassettes", default=replay.CASSETTE_DIR)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--component-reps", type=int, default=5)
+    parser.add_argument("--vector", action="store_true",
+                        help="include LanceDB vector search (needs the ingested GS1 table); default is BM25 only")
+    parser.add_argument("--no-prefetch", action="store_true", help="no speculative knowledge search")
+    parser.add_argument("--no-fast-path", action="store_true", help="every question goes through the supervisor")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    args = parser.parse_args()
+
+    replayer = replay.configure(replay.ReplayConfig(mode=args.mode, cassette_dir=args.cassettes, latency=args.latency))
+
+    from agent import get_supervisor_team
+    from agent_pool import AgentPool
+    from knowledge_gs1 import get_hybrid_retriever
+
+    if not args.vector:
+        get_hybrid_retriever().weights["vector"] = 0.0
+
+    def build_team():
+        team = get_supervisor_team()
+        for member in [team, *team.members]:
+            member.debug_mode = False
+        return team
+
+    questions = load_questions(args.questions)
+    components = bench_components(questions, args.component_reps)
+
+    pool = AgentPool(build_team, size=args.concurrency, max_size=args.concurrency).boot()
+    simulated_before = replayer.stats.simulated_seconds
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        runs = list(executor.map(lambda q: answer(pool, q, not args.no_prefetch, not args.no_fast_path), questions))
+    wall = time.perf_counter() - start
+    simulated = replayer.stats.simulated_seconds - simulated_before
+
+    totals = np.array([r.total for r in runs if r.total is not None])
+    ttfts = np.array([r.ttft for r in runs if r.ttft is not None]) if any(r.ttft for r in runs) else np.zeros(1)
+    result = {
+        "commit": git_commit(),
+        "config": {"mode": args.mode, "latency": args.latency, "questions": args.questions,
+                   "concurrency": args.concurrency, "vector": args.vector,
+                   "prefetch": not args.no_prefetch, "fast_path": not args.no_fast_path},
+        "questions_per_s": len(runs) / wall,
+        "e2e_p50_s": float(np.percentile(totals, 50)),
+        "e2e_p95_s": float(np.percentile(totals, 95)),
+        "ttft_p50_s": float(np.percentile(ttfts, 50)),
+        # Request time not spent in (simulated) provider calls, averaged per request
+        "overhead_ms": (totals.sum() - simulated) * 1000 / len(runs),
+        "components": components,
+        "stages": registry.to_dict()["stages"],
+    }
+
+    print(f"\n{args.questions} questions, concurrency {args.concurrency}, mode={args.mode} latency={args.latency}")
+    print(f"throughput   {result['questions_per_s']:.2f} questions/s")
+    print(f"end-to-end   p50={result['e2e_p50_s'] * 1000:.0f} ms p95={result['e2e_p95_s'] * 1000:.0f} ms "
+          f"ttft p50={result['ttft_p50_s'] * 1000:.0f} ms")
+    print(f"overhead     {result['overhead_ms']:.1f} ms/request (excluding {simulated:.2f}s simulated provider time)")
+    for name, c in components.items():
+        print(f"{name:<12} {c['calls_per_s']:.1f} calls/s ({c['ms_per_call']:.2f} ms/call)")
+    print(f"\n{registry.report()}\n\nreplay: {replayer.stats.report()}")
+
+    previous = None
+    if os.path.exists(args.history):
+        with open(args.history, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["config"] == result["config"]:
+                    previous = entry
+    if previous:
+        print(f"\nvs {previous['commit']}: throughput {result['questions_per_s'] / previous['questions_per_s'] - 1:+.1%}, "
+              f"overhead {result['overhead_ms'] - previous['overhead_ms']:+.1f} ms/request")
+    os.makedirs(os.path.dirname(args.history) or ".", exist_ok=True)
+    with open(args.history, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
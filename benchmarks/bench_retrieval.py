@@ -0,0 +1,192 @@
+"""Retrieval quality (recall@k, MRR, nDCG@k) and latency per retrieval configuration.
+
+Labelled query -> relevant-row pairs come from two sources (see bench_hybrid_retrieval):
+  * judge  - llm_as_judge_ds.csv questions; relevant rows are the top rows for the reference answer
+  * ncert  - NCERT Q&A rows queried by their own question; relevant = that row
+Labels are frozen to `--labels` on the first run so later runs grade against the same set.
+Each label also records the subject of its relevant rows, used by the `subject` filter config.
+
+Configurations are the cross product of --modes (vector/lexical/hybrid), --filters
+(none/subject) and --vector-search (lancedb/two-stage). Lexical-only runs need no keys
+or network; vector runs need the ingested GS1 table plus query embeddings, which can be
+recorded once (`--embedder record`) and replayed offline from cassettes (`--embedder replay`).
+
+Gate a change on the numbers:
+    python -m benchmarks.bench_retrieval --modes lexical --save-baseline retrieval_baseline.json
+    python -m benchmarks.bench_retrieval --modes lexical --baseline retrieval_baseline.json   # exit 1 on regression
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+
+from dataset_preprocessor import SNAPSHOT_PATH, load_snapshot
+from hybrid_retrieval import HybridRetriever
+from benchmarks.bench_hybrid_retrieval import NCERT_PATH, judge_queries, row_hash
+
+LABELS_PATH = './bench_results/retrieval_labels.json'
+MODE_WEIGHTS = {
+    "vector": {"vector": 1.0, "lexical": 0.0},
+    "lexical": {"vector": 0.0, "lexical": 1.0},
+    "hybrid": {"vector": 1.0, "lexical": 1.0},
+}
+QUALITY_KEYS = ("recall", "mrr", "ndcg")
+LATENCY_SLACK_MS = 2.0     # sub-millisecond BM25 timings jitter by more than any tolerance
+
+
+# --- Labels ---
+
+def ncert_labels(snapshot, samples: int, seed: int = 7) -> List[Dict]:
+    rng = random.Random(seed)
+    contents = snapshot['content'].to_pylist()
+    hashes = snapshot['content_hash'].to_pylist()
+    subjects = snapshot['subject'].to_pylist()
+    labels = []
+    for i in rng.sample(range(len(contents)), min(samples, len(contents))):
+        question = next((line[3:].strip() for line in contents[i].splitlines() if line.startswith("Q: ")), "")
+        if question:
+            labels.append({"set": "ncert", "query": question, "relevant": [hashes[i]], "subject": subjects[i]})
+    return labels
+
+
+def build_labels(retriever: HybridRetriever, use_vector: bool, samples: int) -> List[Dict]:
+    subject_by_hash = {row_hash(content): retriever.metadata['subject'][i] for i, content in enumerate(retriever.contents)}
+    labels = []
+    for query, relevant in judge_queries(retriever, use_vector):
+        subject = Counter(subject_by_hash[h] for h in relevant).most_common(1)[0][0]
+        labels.append({"set": "judge", "query": query, "relevant": sorted(relevant), "subject": subject})
+    return labels + ncert_labels(load_snapshot(snapshot_path=SNAPSHOT_PATH), samples)
+
+
+# --- Metrics ---
+
+def score_ranking(ranked: List[str], relevant: set, ks: List[int]) -> Dict[str, float]:
+    """Binary-relevance recall@k and nDCG@k, plus MRR over the whole ranking."""
+    scores = {}
+    first = next((i for i, h in enumerate(ranked) if h in relevant), None)
+    scores["mrr"] = 0.0 if first is None else 1.0 / (first + 1)
+    for k in ks:
+        top = ranked[:k]
+        scores[f"recall@{k}"] = len(relevant & set(top)) / len(relevant)
+        dcg = sum(1.0 / math.log2(i + 2) for i, h in enumerate(top) if h in relevant)
+        ideal = sum(1.0 / math.log2(i + 2) for i in range(min(k, len(relevant))))
+        scores[f"ndcg@{k}"] = dcg / ideal if ideal else 0.0
+    return scores
+
+
+def run_config(retriever: HybridRetriever, labels: List[Dict], ks: List[int], use_filter: bool) -> Dict[str, float]:
+    limit = max(ks)
+    per_query, latencies = [], []
+    for label in labels:
+        filters = {"subject": label["subject"]} if use_filter and label.get("subject") else None
+        start = time.perf_counter()
+        docs = retriever.search(label["query"], limit=limit, filters=filters)
+        latencies.append((time.perf_counter() - start) * 1000)
+        per_query.append(score_ranking([row_hash(doc.content) for doc in docs], set(label["relevant"]), ks))
+    result = {name: float(np.mean([q[name] for q in per_query])) for name in per_query[0]} if per_query else {}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0.0, 0.0, 0.0)
+    result.update(p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99), queries=len(labels))
+    return result
+
+
+def regressions(name: str, result: Dict[str, float], baseline: Dict[str, float], max_drop: float,
+                latency_tolerance: float) -> List[str]:
+    problems = []
+    for metric, value in result.items():
+        if metric.split("@")[0] in QUALITY_KEYS and metric in baseline and value < baseline[metric] - max_drop:
+            problems.append(f"{name} {metric} {baseline[metric]:.3f} -> {value:.3f}")
+    if "p95_ms" in baseline and result["p95_ms"] > baseline["p95_ms"] * (1 + latency_tolerance) + LATENCY_SLACK_MS:
+        problems.append(f"{name} p95 {baseline['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["vector", "lexical", "hybrid"], choices=list(MODE_WEIGHTS))
+    parser.add_argument("--filters", nargs="+", default=["none", "subject"], choices=["none", "subject"])
+    parser.add_argument("--vector-search", nargs="+", default=["lancedb"], choices=["lancedb", "two-stage"])
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--embedder", choices=["live", "record", "replay"], default="replay",
+                        help="query embeddings: live API, record to cassettes, or replay cassettes offline")
+    parser.add_argument("--ncert-samples", type=int, default=300)
+    parser.add_argument("--labels", default=LABELS_PATH)
+    parser.add_argument("--relabel", action="store_true", help="rebuild the frozen labels")
+    parser.add_argument("--baseline", help="JSON from --save-baseline to gate against")
+    parser.add_argument("--max-drop", type=float, default=0.01, help="allowed absolute drop in any quality metric")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25, help="allowed p95 slowdown vs. baseline")
+    parser.add_argument("--save-baseline")
+    args = parser.parse_args()
+
+    use_vector = any(mode != "lexical" for mode in args.modes)
+    vector_sources = {"lancedb": None}
+    if use_vector:
+        os.environ.setdefault("OPIK_TRACK_DISABLE", "true")
+        if args.embedder != "live":
+            import replay
+            replay.configure(replay.ReplayConfig(mode=args.embedder))
+        from knowledge_gs1 import get_vector_db, get_two_stage_search
+        vector_sources = {"lancedb": get_vector_db, "two-stage": get_two_stage_search}
+
+    retriever = HybridRetriever(vector_db=vector_sources.get("lancedb"), base_path=NCERT_PATH,
+                                snapshot_path=SNAPSHOT_PATH)
+    retriever.warm()
+
+    if os.path.exists(args.labels) and not args.relabel:
+        with open(args.labels, "r", encoding="utf-8") as f:
+            labels = json.load(f)
+    else:
+        labels = build_labels(retriever, use_vector, args.ncert_samples)
+        os.makedirs(os.path.dirname(args.labels) or ".", exist_ok=True)
+        with open(args.labels, "w", encoding="utf-8") as f:
+            json.dump(labels, f)
+        print(f"🏷️ Labelled {len(labels)} queries -> {args.labels}")
+
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    sets = sorted({label["set"] for label in labels})
+    columns = [f"recall@{k}" for k in args.k] + ["mrr"] + [f"ndcg@{k}" for k in args.k]
+    print(f"{'config':<30} {'set':>6} {'n':>4} " + " ".join(f"{c:>9}" for c in columns)
+          + f" {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+    measured, failures = {}, []
+    for mode in args.modes:
+        for search in (args.vector_search if mode != "lexical" else ["-"]):
+            if search != "-":
+                retriever._vector_db = vector_sources[search]
+            retriever.weights = dict(MODE_WEIGHTS[mode])
+            for filter_name in args.filters:
+                for label_set in sets:
+                    name = f"{mode}/{search}/{filter_name}/{label_set}"
+                    subset = [label for label in labels if label["set"] == label_set]
+                    result = run_config(retriever, subset, args.k, filter_name == "subject")
+                    measured[name] = result
+                    cells = " ".join(f"{result.get(c, 0.0):>9.3f}" for c in columns)
+                    print(f"{mode + '/' + search + '/' + filter_name:<30} {label_set:>6} {len(subset):>4} {cells} "
+                          f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+                    if name in baseline:
+                        failures += regressions(name, result, baseline[name], args.max_drop, args.latency_tolerance)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(measured, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.save_baseline}")
+
+    if failures:
+        print("\n⚠️ Retrieval regressions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    if baseline:
+        print("\n✅ Retrieval within baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Load test of the answer service (serving.py): throughput, tail latency and shedding.
+
+The service runs in-process on a free port with its real admission control, worker
+threads and NDJSON streaming. Teams are fake by default: each "model" sleeps for a
+TTFT drawn around `--ttft` and then streams `--tokens` deltas `--token-ms` apart on
+the worker thread, the way a blocking Gemini stream would. `--model synthetic` uses
+the real supervisor Team with replay.py's scripted models and provider-like delays.
+
+Clients arrive open-loop (Poisson, `--rps`) from `--users` distinct users; a
+`--cancel-rate` share of them disconnects after the first delta to exercise
+cancellation.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_serving --rps 8 --duration 20 --slots 4 --queue 16
+    python -m benchmarks.bench_serving --rps 20 --users 5 --cancel-rate 0.2
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+import aiohttp
+
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+os.environ.setdefault("GOOGLE_API_KEY", "offline")
+os.environ.setdefault("OPIK_TRACK_DISABLE", "true")
+
+from agno.run.team import TeamRunEvent
+
+from agent_pool import AgentPool
+from serving import AnswerService, start_service
+
+
+class FakeTeam:
+    """Blocking stand-in for a Team: sleeps like a provider, streams content events."""
+
+    members = []        # a Team as far as iter_answer_deltas is concerned
+    active = 0
+    peak = 0
+    _lock = threading.Lock()
+
+    def __init__(self, ttft: float, tokens: int, token_ms: float, seed: int):
+        self.ttft, self.tokens, self.token_seconds = ttft, tokens, token_ms / 1000
+        self.rng = random.Random(seed)
+
+    def run(self, prompt, stream=True, yield_run_output=True, **kwargs):
+        with FakeTeam._lock:
+            FakeTeam.active += 1
+            FakeTeam.peak = max(FakeTeam.peak, FakeTeam.active)
+        try:
+            time.sleep(self.rng.lognormvariate(0, 0.3) * self.ttft)
+            for i in range(self.tokens):
+                yield SimpleNamespace(event=TeamRunEvent.run_content.value, content=f"word{i} ")
+                time.sleep(self.token_seconds)
+        finally:
+            with FakeTeam._lock:
+                FakeTeam.active -= 1
+
+
+async def client(session: aiohttp.ClientSession, url: str, user: str, cancel: bool):
+    start = time.perf_counter()
+    result = {"status": None, "ttft": None, "total": None, "cancelled": False}
+    payload = {"prompt": "Discuss the causes of the Revolt of 1857. (15 Marks)", "marks": 15, "user": user}
+    async with session.post(f"{url}/answer", json=payload) as response:
+        result["status"] = response.status
+        if response.status != 200:
+            return result
+        async for line in response.content:
+            event = json.loads(line)
+            if event["type"] == "delta" and result["ttft"] is None:
+                result["ttft"] = time.perf_counter() - start
+                if cancel:
+                    result["cancelled"] = True
+                    response.close()
+                    return result
+        result["total"] = time.perf_counter() - start
+    return result
+
+
+def build_pool(args) -> AgentPool:
+    if args.model == "synthetic":
+        import replay
+        from agent import get_supervisor_team
+        from knowledge_gs1 import get_hybrid_retriever
+
+        replay.configure(replay.ReplayConfig(mode="synthetic", latency="synthetic"))
+        get_hybrid_retriever().weights["vector"] = 0.0
+        factory = get_supervisor_team
+    else:
+        import prefetch
+        prefetch.PREFETCH_ENABLED = False       # fake teams never search the knowledge base
+        seeds = iter(range(1_000_000))
+        factory = lambda: FakeTeam(args.ttft, args.tokens, args.token_ms, next(seeds))
+    return AgentPool(factory, size=args.slots, max_size=args.slots).boot()
+
+
+async def run_load(args) -> None:
+    service = AnswerService(build_pool(args), max_concurrency=args.slots, max_per_user=args.per_user,
+                            max_queue=args.queue, queue_timeout=args.queue_timeout)
+    runner = await start_service(service, "127.0.0.1", 0)
+    port = runner.addresses[0][1]
+    url = f"http://127.0.0.1:{port}"
+
+    rng = random.Random(args.seed)
+    tasks = []
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None)) as session:
+        while time.perf_counter() - start < args.duration:
+            user = f"user-{rng.randrange(args.users)}"
+            tasks.append(asyncio.create_task(client(session, url, user, rng.random() < args.cancel_rate)))
+            await asyncio.sleep(rng.expovariate(args.rps))
+        results = await asyncio.gather(*tasks)
+    wall = time.perf_counter() - start
+    # Cancelled runs finish on their worker threads shortly after the disconnect
+    while service.running:
+        await asyncio.sleep(0.05)
+    await runner.cleanup()
+
+    statuses = Counter(r["status"] for r in results)
+    done = [r for r in results if r["total"] is not None]
+    totals = np.array([r["total"] for r in done]) if done else np.zeros(1)
+    ttfts = np.array([r["ttft"] for r in results if r["ttft"] is not None] or [0.0])
+    print(f"\n{len(results)} requests over {args.duration:.0f}s (offered {len(results) / args.duration:.1f}/s), "
+          f"slots={args.slots} queue={args.queue} per-user={args.per_user} users={args.users} model={args.model}")
+    print(f"throughput   {len(done) / wall:.2f} completed/s  statuses {dict(sorted(statuses.items()))}")
+    print(f"latency      p50={np.percentile(totals, 50):.2f}s p95={np.percentile(totals, 95):.2f}s "
+          f"p99={np.percentile(totals, 99):.2f}s (completed)")
+    print(f"ttft         p50={np.percentile(ttfts, 50):.2f}s p95={np.percentile(ttfts, 95):.2f}s "
+          f"p99={np.percentile(ttfts, 99):.2f}s")
+    print(f"server       {service.stats.report()}")
+    if args.model == "fake":
+        print(f"concurrency  peak {FakeTeam.peak} runs (limit {args.slots}), "
+              f"{sum(r['cancelled'] for r in results)} clients disconnected early")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["fake", "synthetic"], default="fake")
+    parser.add_argument("--rps", type=float, default=8.0, help="mean arrival rate (requests/s)")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds of arrivals")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--cancel-rate", type=float, default=0.1)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--queue", type=int, default=16)
+    parser.add_argument("--per-user", type=int, default=1)
+    parser.add_argument("--queue-timeout", type=float, default=10.0)
+    parser.add_argument("--ttft", type=float, default=0.5, help="fake model: mean seconds to first token")
+    parser.add_argument("--tokens", type=int, default=60, help="fake model: deltas per answer")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="fake model: ms between deltas")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run_load(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Per-request tracing overhead: synchronous vs. batched export, with and without sampling.
+
+Each simulated request opens a root span and `--spans` child spans with a few
+attributes, roughly what the agno instrumentation emits for one Team run. The
+exporter sleeps `--export-ms` per call to stand in for the network round trip, so
+the numbers show how much of that lands on the request thread. Runs offline.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_tracing_overhead --requests 200 --spans 20 --export-ms 30
+"""
+import time
+import argparse
+from typing import Sequence
+
+import numpy as np
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace import NoOpTracerProvider, Status, StatusCode
+
+from telemetry import TelemetryStats, create_provider
+
+
+class SlowExporter(SpanExporter):
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.spans = 0
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        time.sleep(self.latency)
+        self.spans += len(spans)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def simulate(provider, requests: int, spans: int, error_every: int):
+    tracer = provider.get_tracer("bench")
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        with tracer.start_as_current_span("Vyuha-Query") as root:
+            root.set_attribute("final_answer", "x" * 1500)
+            for j in range(spans):
+                with tracer.start_as_current_span(f"step-{j}") as child:
+                    child.set_attribute("input.value", "question " * 20)
+                    child.set_attribute("output.value", "answer " * 50)
+            if error_every and i % error_every == 0:
+                root.set_status(Status(StatusCode.ERROR, "simulated"))
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return np.array(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--spans", type=int, default=20, help="child spans per request")
+    parser.add_argument("--export-ms", type=float, default=30.0, help="simulated exporter round trip")
+    parser.add_argument("--error-every", type=int, default=20, help="mark every Nth request as failed")
+    args = parser.parse_args()
+
+    latency = args.export_ms / 1000
+    configs = {
+        "no tracing": lambda: (NoOpTracerProvider(), None, None),
+        "simple (sync export)": lambda: _simple(latency),
+        "batched, keep all": lambda: _batched(latency, tail_ratio=1.0),
+        "batched, tail 25%": lambda: _batched(latency, tail_ratio=0.25),
+        "batched, head 10%": lambda: _batched(latency, tail_ratio=1.0, head_ratio=0.1),
+    }
+
+    print(f"{args.requests} requests x {args.spans + 1} spans, exporter round trip {args.export_ms:.0f} ms\n")
+    print(f"{'configuration':<22} {'mean us':>9} {'p50 us':>9} {'p95 us':>9} {'overhead us':>12} {'exported':>9} {'dropped':>8}")
+    baseline = None
+    for name, factory in configs.items():
+        provider, exporter, stats = factory()
+        lat = simulate(provider, args.requests, args.spans, args.error_every)
+        if isinstance(provider, TracerProvider):
+            provider.force_flush()
+            provider.shutdown()
+        mean = lat.mean()
+        baseline = mean if baseline is None else baseline
+        dropped = (stats.dropped_queue_full + stats.dropped_buffer_full) if stats else 0
+        exported = exporter.spans if exporter else 0
+        print(f"{name:<22} {mean:>9.0f} {np.percentile(lat, 50):>9.0f} {np.percentile(lat, 95):>9.0f} "
+              f"{mean - baseline:>12.0f} {exported:>9} {dropped:>8}")
+
+
+def _simple(latency):
+    exporter = SlowExporter(latency)
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    return provider, exporter, None
+
+
+def _batched(latency, tail_ratio, head_ratio=1.0):
+    exporter = SlowExporter(latency)
+    stats = TelemetryStats()
+    provider = create_provider(exporter, stats, head_ratio=head_ratio, tail_ratio=tail_ratio, interval=0.5)
+    return provider, exporter, stats
+
+
+if __name__ == "__main__":
+    main()
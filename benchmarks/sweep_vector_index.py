@@ -0,0 +1,164 @@
+"""Recall vs. latency vs. index size sweep for GS1 vector search settings.
+
+Usage (from the repo root):
+    python -m benchmarks.sweep_vector_index --source ./lance_db/GS1:GS1
+    python -m benchmarks.sweep_vector_index --synthetic 100000 --partitions 64 256 --nprobes 10 30 80
+
+Vectors are copied into a scratch LanceDB (the live table is never re-indexed).
+Queries are stored vectors with small gaussian noise, so no embedding API calls are
+made; ground truth is an exact flat search at full dimension.
+"""
+import os
+import time
+import argparse
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+import pyarrow as pa
+import lancedb
+
+from vector_index import IndexConfig, TwoStageSearch, build_vector_index, index_size_bytes, table_dir
+
+SCRATCH_TABLE = 'sweep'
+COPY_BATCH_ROWS = 2048
+
+
+def dir_size_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(folder, f)) for folder, _, files in os.walk(path) for f in files)
+
+
+def synthetic_batches(rows: int, dims: int, clusters: int = 64, seed: int = 0):
+    """Unit vectors around random centroids - roughly the shape of topic-clustered embeddings."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(clusters, dims)).astype(np.float32)
+    for start in range(0, rows, COPY_BATCH_ROWS):
+        n = min(COPY_BATCH_ROWS, rows - start)
+        vectors = centroids[rng.integers(0, clusters, n)] + rng.normal(scale=0.8, size=(n, dims)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        yield [f"syn-{start + i}" for i in range(n)], vectors
+
+
+def source_batches(spec: str):
+    uri, name = spec.rsplit(':', 1)
+    table = lancedb.connect(uri).open_table(name)
+    reader = table.search().select(['id', 'vector']).limit(table.count_rows()).to_batches(batch_size=COPY_BATCH_ROWS)
+    for batch in reader:
+        if batch.num_rows:
+            vectors = batch.column('vector').flatten().to_numpy(zero_copy_only=False).reshape(batch.num_rows, -1)
+            yield batch.column('id').to_pylist(), vectors.astype(np.float32)
+
+
+def load_scratch(db, batches):
+    table = None
+    for ids, vectors in batches:
+        data = pa.table({
+            'vector': pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel()), vectors.shape[1]),
+            'id': pa.array(ids),
+        })
+        if table is None:
+            table = db.create_table(SCRATCH_TABLE, data=data, mode='overwrite')
+        else:
+            table.add(data)
+    return table
+
+
+def make_queries(table, n: int, noise: float, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    total = table.count_rows()
+    picks = set(rng.choice(total, size=min(n, total), replace=False).tolist())
+    sample = table.search().select(['vector']).limit(total).to_arrow()['vector']
+    vectors = np.stack([np.asarray(sample[i].as_py(), dtype=np.float32) for i in sorted(picks)])
+    vectors += rng.normal(scale=noise, size=vectors.shape).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def ground_truth(table, queries: np.ndarray, k: int):
+    return [set(table.search(q).bypass_vector_index().limit(k).select(['id']).to_arrow()['id'].to_pylist())
+            for q in queries]
+
+
+def measure(search_fn, queries, truth, k):
+    recalls, latencies = [], []
+    for q, relevant in zip(queries, truth):
+        start = time.perf_counter()
+        found = search_fn(q)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(relevant & set(found[:k])) / k)
+    p50, p95 = np.percentile(latencies, [50, 95])
+    return float(np.mean(recalls)), p50, p95
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--source", help="uri:table of an existing LanceDB table, e.g. ./lance_db/GS1:GS1")
+    source.add_argument("--synthetic", type=int, help="number of synthetic unit vectors to generate")
+    parser.add_argument("--dims", type=int, default=3072, help="dimensions of synthetic vectors")
+    parser.add_argument("--index-types", nargs="+", default=["IVF_PQ", "IVF_HNSW_SQ"])
+    parser.add_argument("--partitions", type=int, nargs="+", default=[0], help="0 = sqrt(rows)")
+    parser.add_argument("--sub-vectors", type=int, nargs="+", default=[96, 192])
+    parser.add_argument("--nprobes", type=int, nargs="+", default=[10, 20, 50])
+    parser.add_argument("--refine", type=int, nargs="+", default=[0, 5])
+    parser.add_argument("--two-stage-dims", type=int, nargs="+", default=[256, 512])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--noise", type=float, default=0.02)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as uri:
+        db = lancedb.connect(uri)
+        batches = source_batches(args.source) if args.source else synthetic_batches(args.synthetic, args.dims)
+        table = load_scratch(db, batches)
+        rows = table.count_rows()
+        data_mb = dir_size_bytes(table_dir(uri, SCRATCH_TABLE)) / 2 ** 20
+        queries = make_queries(table, args.queries, args.noise)
+        truth = ground_truth(table, queries, args.k)
+        print(f"{rows} rows, {queries.shape[1]}-d, {data_mb:.0f}MB of vectors, {len(queries)} queries, k={args.k}\n")
+        print(f"{'configuration':<52} {'build s':>8} {'extra MB':>9} {f'recall@{args.k}':>10} {'p50 ms':>8} {'p95 ms':>8}")
+
+        def row(label, build, extra, result):
+            recall, p50, p95 = result
+            print(f"{label:<52} {build:>8.1f} {extra:>9.1f} {recall:>10.3f} {p50:>8.2f} {p95:>8.2f}")
+
+        row("flat (exact)", 0.0, 0.0, measure(
+            lambda q: table.search(q).bypass_vector_index().limit(args.k).select(['id']).to_arrow()['id'].to_pylist(),
+            queries, truth, args.k))
+
+        for index_type in args.index_types:
+            sub_vector_grid = args.sub_vectors if 'PQ' in index_type else [None]
+            for partitions in args.partitions:
+                for sub_vectors in sub_vector_grid:
+                    config = IndexConfig(index_type=index_type, num_partitions=partitions or None,
+                                         num_sub_vectors=sub_vectors)
+                    build = build_vector_index(table, config)
+                    extra = index_size_bytes(uri, SCRATCH_TABLE) / 2 ** 20
+                    for nprobes in args.nprobes:
+                        for refine in args.refine:
+                            config.nprobes, config.refine_factor = nprobes, refine or None
+
+                            def search(q, nprobes=nprobes, refine=refine):
+                                query = table.search(q).nprobes(nprobes).limit(args.k)
+                                if refine:
+                                    query = query.refine_factor(refine)
+                                return query.select(['id']).to_arrow()['id'].to_pylist()
+
+                            row(config.label(), build, extra, measure(search, queries, truth, args.k))
+
+        # Two-stage: truncated first pass (flat) + exact full-dimension rerank
+        shim = SimpleNamespace(table=table, connection=db, table_name=SCRATCH_TABLE,
+                               _get_table_names=lambda conn: conn.table_names())
+        for dims in args.two_stage_dims:
+            if dims >= queries.shape[1]:
+                continue
+            two_stage = TwoStageSearch(shim, dims=dims)
+            start = time.perf_counter()
+            two_stage.build()
+            build = time.perf_counter() - start
+            extra = (dir_size_bytes(table_dir(uri, two_stage.table_name)) + index_size_bytes(uri, SCRATCH_TABLE)) / 2 ** 20
+            row(f"two-stage d={dims} x{two_stage.multiplier} + exact rerank", build, extra,
+                measure(lambda q: two_stage.search_ids(q, args.k), queries, truth, args.k))
+
+
+if __name__ == "__main__":
+    main()
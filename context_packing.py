@@ -0,0 +1,192 @@
+import os
+import re
+import math
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from hybrid_retrieval import tokenize
+from metrics import registry
+from word_budget import DEFAULT_MARKS, estimate_tokens
+
+
+# --- Configuration (env overrides) ---
+# Knowledge tokens handed to the SME per search, by the question's mark value
+MARK_CONTEXT_TOKENS = {
+    10: int(os.getenv("VYUHA_CONTEXT_TOKENS_10M", "700")),
+    15: int(os.getenv("VYUHA_CONTEXT_TOKENS_15M", "1100")),
+}
+REQUEST_BUDGET_FACTOR = 2.0     # all searches of one request together get at most 2x the per-search budget
+OVERLAP_THRESHOLD = 0.7         # token-set Jaccard at which two units count as the same fact
+RANK_DECAY = 0.15               # later hits need a stronger query match to win budget
+
+_FIELD_RE = re.compile(r"^(Q|A|EXP): (.*)$", re.MULTILINE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+
+
+@dataclass
+class PackingResult:
+    """What packing did across every knowledge search of one request."""
+    marks: int
+    budget: int
+    searches: int = 0
+    hits_in: int = 0
+    hits_out: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    _seen: List[Set[str]] = field(default_factory=list, repr=False)   # units already sent this request
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+    @property
+    def remaining(self) -> int:
+        return max(0, round(self.budget * REQUEST_BUDGET_FACTOR) - self.tokens_out)
+
+    def report(self) -> str:
+        return (f"{self.marks}M context: searches={self.searches} hits {self.hits_in}->{self.hits_out} "
+                f"tokens {self.tokens_in}->{self.tokens_out} saved~{self.tokens_saved}t")
+
+
+_current: ContextVar[Optional[PackingResult]] = ContextVar("vyuha_context_packing", default=None)
+
+
+@contextmanager
+def packing_budget(marks: Optional[int]) -> Iterator[PackingResult]:
+    """Scopes knowledge packing to one request (agno runs tool calls on the caller's thread)."""
+    marks = marks if marks in MARK_CONTEXT_TOKENS else DEFAULT_MARKS
+    result = PackingResult(marks=marks, budget=MARK_CONTEXT_TOKENS[marks])
+    token = _current.set(result)
+    try:
+        yield result
+    finally:
+        _current.reset(token)
+
+
+@dataclass
+class _Unit:
+    hit: int
+    order: int
+    label: str          # "QA" or "EXP"
+    text: str
+    terms: Set[str]
+    score: float = 0.0
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text) + 1
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def split_units(content: str, hit: int) -> Tuple[str, List[_Unit]]:
+    """Header line plus packable units: each Q/A pair whole, explanations per sentence."""
+    header = content.split("\n", 1)[0] if content.startswith("SUBJECT:") else ""
+    fields = _FIELD_RE.findall(content)
+    if not fields:
+        sentences = [s for s in _SENTENCE_RE.split(content[len(header):].strip()) if s]
+        return header, [_Unit(hit, i, "EXP", s, set(tokenize(s))) for i, s in enumerate(sentences)]
+
+    units, question = [], None
+    for label, text in fields:
+        if label == "Q":
+            question = text
+        elif label == "A":
+            pair = f"Q: {question or ''}\nA: {text}"
+            units.append(_Unit(hit, len(units), "QA", pair, set(tokenize(pair))))
+            question = None
+        else:
+            for sentence in _SENTENCE_RE.split(text.strip()):
+                if sentence:
+                    units.append(_Unit(hit, len(units), "EXP", sentence, set(tokenize(sentence))))
+    return header, units
+
+
+def pack(query: str, contents: List[str], budget: int, seen: Optional[List[Set[str]]] = None) -> List[str]:
+    """Query-relevant, non-overlapping parts of `contents` within `budget` tokens, by hit.
+
+    Returns one (possibly empty) packed string per input hit, in the original order.
+    """
+    seen = seen if seen is not None else []
+    query_terms = set(tokenize(query))
+    headers, units = [], []
+    for hit, content in enumerate(contents):
+        header, hit_units = split_units(content, hit)
+        headers.append(header)
+        units.extend(hit_units)
+
+    for unit in units:
+        overlap = len(query_terms & unit.terms)
+        # Term overlap normalised by length, discounted by retrieval rank
+        unit.score = overlap / math.sqrt(len(unit.terms) or 1) / (1 + RANK_DECAY * unit.hit)
+
+    chosen, used = [], 0
+    for unit in sorted(units, key=lambda u: (-u.score, u.hit, u.order)):
+        header_cost = 0 if any(c.hit == unit.hit for c in chosen) else estimate_tokens(headers[unit.hit])
+        if used + unit.tokens + header_cost > budget:
+            continue
+        if any(_jaccard(unit.terms, terms) >= OVERLAP_THRESHOLD for terms in seen):
+            continue
+        chosen.append(unit)
+        seen.append(unit.terms)
+        used += unit.tokens + header_cost
+
+    packed = []
+    for hit, header in enumerate(headers):
+        kept = sorted((u for u in chosen if u.hit == hit), key=lambda u: u.order)
+        if not kept:
+            packed.append("")
+            continue
+        lines = [header] if header else []
+        lines += [u.text for u in kept if u.label == "QA"]
+        explanation = " ".join(u.text for u in kept if u.label == "EXP")
+        if explanation:
+            lines.append(f"EXP: {explanation}" if header else explanation)
+        packed.append("\n".join(lines))
+    return packed
+
+
+class ContextPacker:
+    """Wraps a knowledge retriever: overlapping hits removed, sentences cut to the query, budget per mark value.
+
+    Same call signature as HybridRetriever, so it drops in as an Agent's
+    `knowledge_retriever`. The budget comes from the enclosing `packing_budget`
+    (10M/15M); outside one, each search gets the default-mark budget on its own.
+    """
+
+    def __init__(self, retriever: Callable[..., List[Dict[str, Any]]]):
+        self.retriever = retriever
+
+    @classmethod
+    def for_knowledge(cls, knowledge) -> "ContextPacker":
+        """Packs an agno Knowledge (plain vector search) instead of the hybrid retriever."""
+        def search(query: str, num_documents: Optional[int] = None, filters: Optional[Dict[str, Any]] = None, **kwargs):
+            return [doc.to_dict() for doc in knowledge.search(query, max_results=num_documents, filters=filters)]
+        return cls(search)
+
+    def __call__(self, query: str, num_documents: Optional[int] = None, filters: Optional[Dict[str, Any]] = None,
+                 **kwargs) -> List[Dict[str, Any]]:
+        docs = self.retriever(query, num_documents=num_documents, filters=filters, **kwargs) or []
+        result = _current.get()
+        if result is None:
+            result = PackingResult(marks=DEFAULT_MARKS, budget=MARK_CONTEXT_TOKENS[DEFAULT_MARKS])
+        budget = min(result.budget, result.remaining)
+
+        with registry.timer("knowledge.packing"):
+            contents = [str(doc.get("content", "")) for doc in docs]
+            packed = pack(query, contents, budget, result._seen)
+
+        out = [dict(doc, content=text) for doc, text in zip(docs, packed) if text]
+        tokens_in, tokens_out = sum(map(estimate_tokens, contents)), sum(map(estimate_tokens, packed))
+        result.searches += 1
+        result.hits_in += len(docs)
+        result.hits_out += len(out)
+        result.tokens_in += tokens_in
+        result.tokens_out += tokens_out
+        registry.inc("vyuha_context_tokens_total", tokens_in, kind="retrieved", marks=str(result.marks))
+        registry.inc("vyuha_context_tokens_total", tokens_out, kind="packed", marks=str(result.marks))
+        return out
@@ -0,0 +1,132 @@
+import os
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List
+
+from metrics import registry
+from word_budget import estimate_tokens, strip_mark_suffix
+
+
+# --- Configuration (env overrides) ---
+WINDOW_TOKENS = int(os.getenv("VYUHA_MEMORY_WINDOW_TOKENS", "1200"))     # recent turns sent verbatim
+WINDOW_TURNS = int(os.getenv("VYUHA_MEMORY_WINDOW_TURNS", "3"))
+SUMMARY_TOKENS = int(os.getenv("VYUHA_MEMORY_SUMMARY_TOKENS", "400"))    # rolling summary of older turns
+SUMMARY_ANSWER_WORDS = 30                                                # gist kept per folded answer
+MAX_SESSION_MESSAGES = int(os.getenv("VYUHA_MAX_SESSION_MESSAGES", "40"))  # chat messages kept per session
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_MARKUP_RE = re.compile(r"[*#|_`>~]+")
+
+
+@dataclass
+class Turn:
+    question: str
+    answer: str
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.question) + estimate_tokens(self.answer)
+
+
+def gist(answer: str, words: int = SUMMARY_ANSWER_WORDS) -> str:
+    """First sentence of an answer (markdown stripped), cut to `words` words."""
+    text = " ".join(_MARKUP_RE.sub(" ", answer).split())
+    first = _SENTENCE_RE.split(text, maxsplit=1)[0]
+    tokens = first.split()
+    return " ".join(tokens[:words]) + (" ..." if len(tokens) > words else "")
+
+
+@dataclass
+class MemoryStats:
+    turns: int = 0
+    folded: int = 0         # turns moved from the window into the summary
+    dropped: int = 0        # summary lines dropped at the summary cap
+    context_tokens: int = 0     # history tokens sent with the last question
+
+    def report(self) -> str:
+        return (f"turns={self.turns} folded={self.folded} dropped={self.dropped} "
+                f"context_tokens={self.context_tokens}")
+
+
+class ConversationMemory:
+    """Bounded history for one chat session.
+
+    The last turns are kept verbatim while they fit `window_turns` and `window_tokens`;
+    older turns are folded into a rolling summary of one line each (question + the
+    answer's first sentence), whose oldest lines fall off past `summary_tokens`. What
+    is sent with each question is therefore capped, however long the session runs.
+    """
+
+    def __init__(self, window_tokens: float = WINDOW_TOKENS, window_turns: float = WINDOW_TURNS,
+                 summary_tokens: float = SUMMARY_TOKENS):
+        self.window_tokens = window_tokens
+        self.window_turns = window_turns
+        self.summary_tokens = summary_tokens
+        self.recent: Deque[Turn] = deque()
+        self.summary: Deque[str] = deque()
+        self.stats = MemoryStats()
+
+    def add(self, question: str, answer: str) -> None:
+        self.recent.append(Turn(strip_mark_suffix(question), answer.strip()))
+        self.stats.turns += 1
+        # The newest turn always stays verbatim, even when it alone is over the window
+        while len(self.recent) > 1 and (len(self.recent) > self.window_turns or
+                                        sum(t.tokens for t in self.recent) > self.window_tokens):
+            self._fold(self.recent.popleft())
+
+    def _fold(self, turn: Turn) -> None:
+        self.summary.append(f"- Q: {turn.question} -> {gist(turn.answer)}")
+        self.stats.folded += 1
+        registry.inc("vyuha_memory_turns_folded_total")
+        while len(self.summary) > 1 and sum(estimate_tokens(line) for line in self.summary) > self.summary_tokens:
+            self.summary.popleft()
+            self.stats.dropped += 1
+
+    def context(self) -> str:
+        """History block for the next question ("" for a new session)."""
+        parts: List[str] = []
+        if self.summary:
+            parts.append("Earlier questions (summary):\n" + "\n".join(self.summary))
+        if self.recent:
+            parts.append("Recent turns:\n" + "\n\n".join(f"Student: {t.question}\nVyuha: {t.answer}"
+                                                         for t in self.recent))
+        return "\n\n".join(parts)
+
+    def prompt(self, message: str) -> str:
+        """`message` followed by the bounded history, for questions that refer back to it.
+
+        The new question goes first so the supervisor (and the SME's search) start from it.
+        """
+        context = self.context()
+        self.stats.context_tokens = estimate_tokens(context)
+        registry.inc("vyuha_memory_context_tokens_total", self.stats.context_tokens)
+        if not context:
+            return message
+        return (f"{message}\n\n---\nConversation so far (use it only if the question above refers back "
+                f"to it):\n{context}")
+
+    def clear(self) -> None:
+        self.recent.clear()
+        self.summary.clear()
+        self.stats = MemoryStats()
+
+    @property
+    def empty(self) -> bool:
+        """No history yet: the next answer depends on the question alone."""
+        return not self.recent and not self.summary
+
+    @property
+    def tokens(self) -> int:
+        return sum(t.tokens for t in self.recent) + sum(estimate_tokens(line) for line in self.summary)
+
+
+def trim_messages(messages: List[dict], limit: int = MAX_SESSION_MESSAGES) -> int:
+    """Drops the oldest chat messages past `limit` in place; returns how many were dropped."""
+    excess = len(messages) - limit
+    if excess <= 0:
+        return 0
+    # Keep user/assistant pairs together
+    excess += excess % 2
+    del messages[:excess]
+    return excess
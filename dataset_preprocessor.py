@@ -1,6 +1,7 @@
 import os
-import pandas as pd
-from datasets import load_dataset
+import json
+import hashlib
+import pyarrow as pa
 
 
 book_list=['KadamParth/NCERT_History_11th',
@@ -8,11 +9,32 @@ book_list=['KadamParth/NCERT_History_11th',
            'KadamParth/NCERT_Geography_11th',
            'KadamParth/NCERT_Geography_12th']
 
+# Rows read per pandas chunk while streaming the CSVs
+CSV_CHUNK_SIZE = 1000
+
+# Columnar snapshot of the processed corpus (Arrow IPC file -> memory-mappable)
+SNAPSHOT_PATH = './corpus/gs1_corpus.arrow'
+SNAPSHOT_SCHEMA = pa.schema([
+    pa.field('key', pa.string()),
+    pa.field('content', pa.string()),
+    pa.field('content_hash', pa.string()),
+    pa.field('source', pa.string()),
+    pa.field('subject', pa.string()),
+    pa.field('topic', pa.string()),
+    pa.field('type', pa.string()),
+    # Near-duplicate collapsing (dedup.py): books folded into this row and how many rows it replaced
+    pa.field('merged_sources', pa.string()),
+    pa.field('duplicates', pa.int32()),
+])
+
 
 
 
 # Download Files from HuggingFace Dataset Dierectory
 def download_dataset(base_path, book_list):
+    # Heavy HuggingFace import only when a book actually has to be fetched
+    from datasets import load_dataset
+
     os.makedirs(base_path,exist_ok=True)
 
     for books in book_list:        
@@ -32,63 +54,224 @@ def download_dataset(base_path, book_list):
 
 # Create document
 
-def create_document(base_path):
-    processed_docs = [] 
+def format_row(row, subject, clean_source):
+    """Turns one CSV row into a Document-ready dict (None for empty rows)."""
+    topic = str(row.get('Topic', 'General'))
+    question = str(row.get('Question', ''))
+    answer = str(row.get('Answer', ''))
+    explanation = str(row.get('Explanation', ''))
+
+    # Skip empty rows
+    if not question.strip() and not explanation.strip():
+        return None
+
+    # 1. THE RICH TEXT (For Embedding & LLM Reading)
+    # We keep the "Context Injection" here because it helps vector search
+    text_content = (
+        f"SUBJECT: {subject} | TOPIC: {topic}\n"
+        f"Q: {question}\n"
+        f"A: {answer}\n"
+        f"EXP: {explanation}"
+    )
+
+    # 2. THE STRUCTURED METADATA (For Opik & Database Filtering)
+    meta = {
+        "source": clean_source,
+        "subject": subject,
+        "topic": topic,
+        "type": "Q&A"
+    }
+
+    # 3. THE ROW KEY (Stable identity of a row for incremental re-indexing)
+    # Edits to answer/explanation keep the key, so they show up as "changed"
+    key = hashlib.md5(f"{topic}\x1f{question}".encode("utf-8")).hexdigest()
+
+    # Return all three as a dictionary
+    return {
+        "key": key,
+        "content": text_content,
+        "metadata": meta
+    }
+
+
+def iter_documents(base_path, chunksize=CSV_CHUNK_SIZE):
+    """Streams Document-ready dicts, reading each CSV `chunksize` rows at a time.
+
+    Peak memory is bounded by one chunk, no matter how many books are on disk.
+    """
+    import pandas as pd
 
     if not os.path.exists(base_path):
         print(f"Error: Path not found {base_path}")
-        return []
-    
-    for filename in os.listdir(base_path):
+        return
+
+    for filename in sorted(os.listdir(base_path)):
         filename_str = str(filename)
-        if filename_str.lower().endswith(".csv"):
-            file_path = os.path.join(base_path, filename_str)
-            try:
-                ds = pd.read_csv(file_path).fillna("")
-                records = ds.to_dict('records')
-                
-                # Extract clean subject/book name
-                # e.g., "NCERT_History_11th.csv" -> "History_11th"
-                clean_source = filename_str.replace('.csv', '')
-                subject = 'History' if 'history' in filename_str.lower() else 'Geography'
-
-                for row in records:
-                    topic = str(row.get('Topic', 'General'))
-                    question = str(row.get('Question', ''))
-                    answer = str(row.get('Answer', ''))
-                    explanation = str(row.get('Explanation', ''))
-
-                    # Skip empty rows
-                    if not question.strip() and not explanation.strip():
+        if not filename_str.lower().endswith(".csv"):
+            continue
+
+        file_path = os.path.join(base_path, filename_str)
+        # Extract clean subject/book name
+        # e.g., "NCERT_History_11th.csv" -> "History_11th"
+        clean_source = filename_str.replace('.csv', '')
+        subject = 'History' if 'history' in filename_str.lower() else 'Geography'
+        key_counts = {}
+
+        try:
+            for chunk in pd.read_csv(file_path, chunksize=chunksize):
+                for row in chunk.fillna("").to_dict('records'):
+                    doc = format_row(row, subject, clean_source)
+                    if doc is None:
                         continue
 
-                    # 1. THE RICH TEXT (For Embedding & LLM Reading)
-                    # We keep the "Context Injection" here because it helps vector search
-                    text_content = (
-                        f"SUBJECT: {subject} | TOPIC: {topic}\n"
-                        f"Q: {question}\n"
-                        f"A: {answer}\n"
-                        f"EXP: {explanation}"
-                    )
-
-                    # 2. THE STRUCTURED METADATA (For Opik & Database Filtering)
-                    meta = {
-                        "source": clean_source,
-                        "subject": subject,
-                        "topic": topic,
-                        "type": "Q&A"
-                    }
-
-                    # Return both as a dictionary
-                    processed_docs.append({
-                        "content": text_content,
-                        "metadata": meta
-                    })
-                    
-            except Exception as e:
-                print(f"Skipping file {filename_str} : {e}")
-                
-    return processed_docs
+                    # Repeated questions within a book get an occurrence suffix
+                    key_counts[doc["key"]] = key_counts.get(doc["key"], 0) + 1
+                    if key_counts[doc["key"]] > 1:
+                        doc["key"] = f"{doc['key']}#{key_counts[doc['key']]}"
+                    yield doc
+
+        except Exception as e:
+            print(f"Skipping file {filename_str} : {e}")
+
+
+def iter_batches(records, batch_size):
+    """Groups any record iterator into lists of `batch_size` without materialising it."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def create_document(base_path):
+    """Eager variant kept for callers that need the whole corpus as a list."""
+    return list(iter_documents(base_path))
+
+
+# --- Columnar Corpus Snapshot ---
+
+def _source_fingerprint(base_path):
+    """Name, size and mtime of every CSV; the snapshot is stale when this changes."""
+    if not os.path.exists(base_path):
+        return []
+    return [
+        [name, os.path.getsize(os.path.join(base_path, name)), os.path.getmtime(os.path.join(base_path, name))]
+        for name in sorted(os.listdir(base_path)) if name.lower().endswith(".csv")
+    ]
+
+
+def _dedup_fingerprint(dedup):
+    """Dedup settings baked into a snapshot; changing a threshold rebuilds it."""
+    return dedup.fingerprint() if dedup is not None else "off"
+
+
+def _default_dedup():
+    import dedup
+
+    return dedup.DedupConfig() if dedup.DEDUP_ENABLED else None
+
+
+def snapshot_is_fresh(base_path, snapshot_path=SNAPSHOT_PATH, dedup=None):
+    if not os.path.exists(snapshot_path):
+        return False
+    try:
+        with pa.memory_map(snapshot_path, 'r') as source:
+            schema = pa.ipc.open_file(source).schema
+        metadata = schema.metadata or {}
+        return (
+            schema.remove_metadata() == SNAPSHOT_SCHEMA
+            and json.loads(metadata.get(b'sources', b'[]')) == _source_fingerprint(base_path)
+            and metadata.get(b'dedup', b'').decode("utf-8") == _dedup_fingerprint(dedup)
+        )
+    except (pa.ArrowInvalid, OSError, ValueError):
+        return False
+
+
+def build_snapshot(base_path, snapshot_path=SNAPSHOT_PATH, chunksize=CSV_CHUNK_SIZE, dedup=None):
+    """Streams the CSVs into an Arrow IPC snapshot, one record batch per chunk.
+
+    With a `dedup.DedupConfig`, near-duplicate rows are then collapsed into one
+    representative each (see dedup.collapse_table) before the snapshot is published.
+    """
+    os.makedirs(os.path.dirname(snapshot_path) or ".", exist_ok=True)
+    schema = SNAPSHOT_SCHEMA.with_metadata({
+        'sources': json.dumps(_source_fingerprint(base_path)),
+        'dedup': _dedup_fingerprint(dedup),
+    })
+    tmp_path = f"{snapshot_path}.tmp"
+    rows = 0
+
+    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for batch in iter_batches(iter_documents(base_path, chunksize=chunksize), chunksize):
+            columns = {name: [] for name in SNAPSHOT_SCHEMA.names}
+            for doc in batch:
+                columns['key'].append(doc['key'])
+                columns['content'].append(doc['content'])
+                columns['content_hash'].append(hashlib.md5(doc['content'].encode("utf-8")).hexdigest())
+                for field in ('source', 'subject', 'topic', 'type'):
+                    columns[field].append(doc['metadata'][field])
+                columns['merged_sources'].append(doc['metadata']['source'])
+                columns['duplicates'].append(0)
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+            rows += len(batch)
+
+    if dedup is not None:
+        from dedup import collapse_table
+
+        # Clustering needs every row at once; the streamed file is its input
+        with pa.memory_map(tmp_path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+        table, report, _ = collapse_table(table, dedup)
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+            writer.write_table(table.replace_schema_metadata(schema.metadata), max_chunksize=chunksize)
+        print(f"🧹 Near-duplicates collapsed: {report.report()}")
+        rows = report.rows_out
+
+    os.replace(tmp_path, snapshot_path)
+    return rows
+
+
+def load_snapshot(base_path=None, snapshot_path=SNAPSHOT_PATH, dedup="default"):
+    """Memory-maps the snapshot (zero-copy). Rebuilds it first if `base_path` has newer CSVs.
+
+    `dedup` is a dedup.DedupConfig, None for the raw corpus, or "default" for the
+    settings in dedup.py.
+    """
+    if dedup == "default":
+        dedup = _default_dedup()
+    if base_path is not None and not snapshot_is_fresh(base_path, snapshot_path, dedup):
+        print(f"Building corpus snapshot: {snapshot_path}")
+        build_snapshot(base_path, snapshot_path, dedup=dedup)
+    with pa.memory_map(snapshot_path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def iter_snapshot_records(table, batch_size=CSV_CHUNK_SIZE):
+    """Yields snapshot rows in the same dict shape as iter_documents (plus content_hash)."""
+    for batch in table.to_batches(max_chunksize=batch_size):
+        for row in batch.to_pylist():
+            yield {
+                "key": row['key'],
+                "content": row['content'],
+                "content_hash": row['content_hash'],
+                "metadata": {field: row[field] for field in ('source', 'subject', 'topic', 'type', 'merged_sources', 'duplicates')},
+            }
+
+
+def corpus_stats(table):
+    """Row counts and content size per source, straight from the columnar snapshot."""
+    import pyarrow.compute as pc
+
+    lengths = pc.utf8_length(table['content'])
+    grouped = (
+        pa.table({'source': table['source'], 'subject': table['subject'], 'chars': lengths})
+        .group_by(['source', 'subject'])
+        .aggregate([('chars', 'count'), ('chars', 'mean')])
+    )
+    return grouped.to_pandas().rename(columns={'chars_count': 'rows', 'chars_mean': 'avg_chars'})
 
 if __name__ == "__main__":
     # Base directory for POC
@@ -98,6 +281,11 @@ if __name__ == "__main__":
     # Run the function that builds the dictionaries
     extracted_docs = create_document(base_path=base_path)
     print(f"\nGenerated {len(extracted_docs)} documents.")
+
+    # Columnar snapshot shared by ingestion, evaluation and retrieval tests
+    snapshot = load_snapshot(base_path=base_path)
+    print(f"\nSnapshot {SNAPSHOT_PATH}: {snapshot.num_rows} rows")
+    print(corpus_stats(snapshot).to_string(index=False))
     
     # --- VERIFICATION STEP ---
     # Print the very first document to see how it is structured
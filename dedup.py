@@ -0,0 +1,215 @@
+import os
+import re
+import zlib
+import json
+import hashlib
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+
+# --- Configuration (env overrides) ---
+DEDUP_ENABLED = os.getenv("VYUHA_DEDUP", "on") != "off"
+# Estimated Jaccard of word shingles to count as a near-duplicate. At 0.4 the rows that
+# share one explanation cluster together, and NCERT recall@10 matches the raw corpus
+# (0.997 vs 0.993); see benchmarks/bench_dedup.py for the sweep.
+SIMILARITY_THRESHOLD = float(os.getenv("VYUHA_DEDUP_THRESHOLD", "0.4"))
+NUM_PERM = 128                  # MinHash permutations (signature length)
+SHINGLE_SIZE = 3                # words per shingle
+MAX_CLUSTER_SIZE = int(os.getenv("VYUHA_DEDUP_MAX_CLUSTER", "6"))   # stops transitive chains merging a whole topic
+SEED = 1
+# Rows only merge within one book: the surviving row's source is what filters and routing match
+GROUP_BY = ("subject", "source")
+MERGE_FORMAT = 2                # bump when merge_contents changes, so snapshots are rebuilt
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_FIELD_RE = re.compile(r"^(Q|A|EXP): (.*)$", re.MULTILINE)
+
+
+@dataclass
+class DedupConfig:
+    threshold: float = SIMILARITY_THRESHOLD
+    num_perm: int = NUM_PERM
+    shingle_size: int = SHINGLE_SIZE
+    max_cluster_size: int = MAX_CLUSTER_SIZE
+    seed: int = SEED
+    group_by: Tuple[str, ...] = GROUP_BY
+
+    def fingerprint(self) -> str:
+        return json.dumps(dict(asdict(self), merge_format=MERGE_FORMAT), sort_keys=True)
+
+
+@dataclass
+class DedupReport:
+    rows_in: int = 0
+    rows_out: int = 0
+    clusters: int = 0                                   # clusters with more than one row
+    chars_in: int = 0
+    chars_out: int = 0
+    cluster_sizes: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def shrink(self) -> float:
+        return 1 - self.rows_out / self.rows_in if self.rows_in else 0.0
+
+    def report(self) -> str:
+        sizes = ", ".join(f"{size}x{count}" for size, count in sorted(self.cluster_sizes.items()))
+        return (f"rows {self.rows_in} -> {self.rows_out} (-{self.shrink:.1%}), "
+                f"text {self.chars_in / 1e6:.1f}M -> {self.chars_out / 1e6:.1f}M chars "
+                f"(~{(self.chars_in - self.chars_out) // 4:,} embedding tokens saved), "
+                f"merged clusters={self.clusters} [{sizes}]")
+
+
+# --- MinHash / LSH ---
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows) whose S-curve midpoint (1/b)^(1/r) sits just below `threshold`."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        midpoint = (1 / bands) ** (1 / rows)
+        if midpoint <= threshold and (best is None or midpoint > best[2]):
+            best = (bands, rows, midpoint)
+    return (best[0], best[1]) if best else (num_perm, 1)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    words = _WORD_RE.findall(text.lower())
+    grams = {" ".join(words[i : i + size]) for i in range(max(1, len(words) - size + 1))}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = SEED):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _MERSENNE, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _MERSENNE, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        if hashes.size == 0:
+            return np.full(self.a.shape, np.iinfo(np.uint64).max, dtype=np.uint64)
+        # (a*x + b) mod p per permutation, wrapping at 2^64 like datasketch; a spans the
+        # full field so small shingle hashes do not win every permutation
+        with np.errstate(over="ignore"):
+            values = (np.outer(hashes, self.a) + self.b) % _MERSENNE
+        return values.min(axis=0)
+
+
+def candidate_pairs(signatures: np.ndarray, bands: int, rows: int, groups: List[str]) -> set:
+    """Rows that share at least one LSH band bucket (only within the same group, e.g. subject)."""
+    pairs = set()
+    for band in range(bands):
+        buckets: Dict[Tuple[str, bytes], List[int]] = {}
+        chunk = np.ascontiguousarray(signatures[:, band * rows : (band + 1) * rows])
+        for i in range(len(signatures)):
+            buckets.setdefault((groups[i], chunk[i].tobytes()), []).append(i)
+        for members in buckets.values():
+            if 1 < len(members) <= 64:    # huge buckets are boilerplate, not duplicates
+                pairs.update((members[x], members[y]) for x in range(len(members)) for y in range(x + 1, len(members)))
+    return pairs
+
+
+def cluster_near_duplicates(texts: List[str], groups: List[str], config: Optional[DedupConfig] = None) -> List[List[int]]:
+    """Union-find over verified LSH candidates; returns clusters as row-index lists (in row order)."""
+    config = config or DedupConfig()
+    hasher = MinHasher(config.num_perm, config.seed)
+    signatures = np.stack([hasher.signature(shingles(t, config.shingle_size)) for t in texts]) if texts else \
+        np.zeros((0, config.num_perm), dtype=np.uint64)
+    bands, rows = lsh_params(config.threshold, config.num_perm)
+
+    parent = list(range(len(texts)))
+    size = [1] * len(texts)
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    scored = []
+    for i, j in candidate_pairs(signatures, bands, rows, groups):
+        similarity = float(np.mean(signatures[i] == signatures[j]))
+        if similarity >= config.threshold:
+            scored.append((similarity, i, j))
+    # Most similar pairs first, so the size cap keeps the tightest clusters
+    for _, i, j in sorted(scored, reverse=True):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j and size[root_i] + size[root_j] <= config.max_cluster_size:
+            parent[root_j] = root_i
+            size[root_i] += size[root_j]
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(texts)):
+        clusters.setdefault(find(i), []).append(i)
+    return sorted(clusters.values(), key=lambda members: members[0])
+
+
+# --- Collapsing ---
+
+def group_keys(table: pa.Table, fields: Sequence[str] = GROUP_BY) -> List[str]:
+    """Per-row group for candidate_pairs: rows of different groups are never compared."""
+    return ["\0".join(values) for values in zip(*(table[name].to_pylist() for name in fields))]
+
+
+def merge_contents(contents: List[str]) -> str:
+    """One document per cluster: the first row's header, every distinct Q/A pair, every distinct EXP.
+
+    Nothing a member said is dropped; the sentences explanations share are removed
+    per query by context_packing.pack, which splits EXP lines into sentences.
+    """
+    header = contents[0].split("\n", 1)[0]
+    qa_pairs, explanations = [], []
+    for content in contents:
+        fields = dict(_FIELD_RE.findall(content))
+        pair = f"Q: {fields.get('Q', '')}\nA: {fields.get('A', '')}"
+        if pair not in qa_pairs:
+            qa_pairs.append(pair)
+        explanation = f"EXP: {fields.get('EXP', '')}"
+        if fields.get("EXP") and explanation not in explanations:
+            explanations.append(explanation)
+    return "\n".join([header, *qa_pairs, *explanations])
+
+
+def body(content: str) -> str:
+    """Text compared for similarity: Q/A/EXP without the SUBJECT/TOPIC header shared by a whole topic."""
+    return content.split("\n", 1)[1] if "\n" in content else content
+
+
+def collapse_table(table: pa.Table, config: Optional[DedupConfig] = None) -> Tuple[pa.Table, DedupReport, List[List[int]]]:
+    """Collapses near-duplicate snapshot rows into one representative row per cluster.
+
+    Rows are only compared within `config.group_by` (subject and book), so every
+    member shares the representative's source and source filters lose nothing. The
+    representative keeps the first row's key (stable identity for incremental
+    re-indexing) and metadata; `merged_sources` and `duplicates` record what was
+    folded into it.
+    """
+    config = config or DedupConfig()
+    contents = table['content'].to_pylist()
+    clusters = cluster_near_duplicates([body(c) for c in contents], group_keys(table, config.group_by), config)
+
+    columns = {name: [] for name in table.schema.names}
+    sources = table['source'].to_pylist()
+    report = DedupReport(rows_in=table.num_rows, rows_out=len(clusters), chars_in=sum(len(c) for c in contents))
+    for members in clusters:
+        first = members[0]
+        row = {name: table[name][first].as_py() for name in ('key', 'source', 'subject', 'topic', 'type')}
+        content = contents[first] if len(members) == 1 else merge_contents([contents[i] for i in members])
+        row.update(
+            content=content,
+            content_hash=hashlib.md5(content.encode("utf-8")).hexdigest(),
+            merged_sources=",".join(sorted({sources[i] for i in members})),
+            duplicates=len(members) - 1,
+        )
+        for name in columns:
+            columns[name].append(row[name])
+        report.chars_out += len(content)
+        if len(members) > 1:
+            report.clusters += 1
+            report.cluster_sizes[len(members)] = report.cluster_sizes.get(len(members), 0) + 1
+    return pa.table(columns, schema=table.schema), report, clusters
@@ -0,0 +1,205 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+# --- Configuration ---
+CACHE_ROOT = './lance_db/embedding_cache'
+DEFAULT_MAX_BYTES = 1 * 1024 ** 3   # 1 GiB of vectors per (model, dimensions)
+EVICT_FRACTION = 0.1                # free 10% of the slots at once when full
+INITIAL_SLOTS = 1024
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    entries: int = 0
+    capacity: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self) -> str:
+        return (f"hits={self.hits} misses={self.misses} hit_rate={self.hit_rate:.1%} "
+                f"writes={self.writes} evictions={self.evictions} entries={self.entries}/{self.capacity}")
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (model id, dimensions, content hash).
+
+    Vectors live in a single memory-mapped float16/float32 matrix (`vectors.bin`), one
+    row per slot. A small SQLite index maps content hash -> slot and tracks last use
+    so the least recently used vectors are evicted once `max_bytes` is reached.
+    """
+
+    def __init__(self, model: str, dimensions: int, root: str = CACHE_ROOT,
+                 dtype: str = 'float16', max_bytes: int = DEFAULT_MAX_BYTES):
+        self.model = model
+        self.dimensions = int(dimensions)
+        self.dtype = np.dtype(dtype)
+        self.row_bytes = self.dimensions * self.dtype.itemsize
+        self.max_slots = max(1, int(max_bytes // self.row_bytes))
+        self.stats = CacheStats(capacity=self.max_slots)
+
+        safe_model = re.sub(r'[^A-Za-z0-9._-]', '_', model)
+        self.path = os.path.join(root, f"{safe_model}-{self.dimensions}-{self.dtype.name}")
+        os.makedirs(self.path, exist_ok=True)
+        self._vectors_path = os.path.join(self.path, 'vectors.bin')
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.path, 'index.sqlite'), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (hash TEXT PRIMARY KEY, slot INTEGER UNIQUE, last_used REAL)"
+        )
+        self._db.commit()
+
+        self._free_slots: List[int] = []
+        self._next_slot = self._db.execute("SELECT COALESCE(MAX(slot) + 1, 0) FROM entries").fetchone()[0]
+        used = {row[0] for row in self._db.execute("SELECT slot FROM entries")}
+        self._free_slots = [slot for slot in range(self._next_slot) if slot not in used]
+        self.stats.entries = len(used)
+
+        self._vectors: Optional[np.memmap] = None
+        self._open_vectors(max(INITIAL_SLOTS, self._next_slot))
+
+    # --- Storage ---
+
+    def _open_vectors(self, min_slots: int) -> None:
+        """(Re)maps the vector file, growing it geometrically up to the slot cap."""
+        current = os.path.getsize(self._vectors_path) // self.row_bytes if os.path.exists(self._vectors_path) else 0
+        slots = current
+        if current < min_slots:
+            slots = min(self.max_slots, max(min_slots, current * 2))
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            with open(self._vectors_path, 'ab') as f:
+                f.truncate(slots * self.row_bytes)
+        if self._vectors is None or self._vectors.shape[0] != slots:
+            self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode='r+', shape=(slots, self.dimensions))
+
+    def _allocate(self, n: int) -> List[int]:
+        """Returns up to `n` slots, evicting LRU entries when the cache is at its size cap.
+
+        Fewer than `n` only when nothing is left to evict (`n` above `max_slots`).
+        """
+        slots: List[int] = []
+        while len(slots) < n:
+            if self._free_slots:
+                slots.append(self._free_slots.pop())
+            elif self._next_slot < self.max_slots:
+                slots.append(self._next_slot)
+                self._next_slot += 1
+            elif not self._evict(max(n - len(slots), int(self.max_slots * EVICT_FRACTION), 1)):
+                break
+        if self._next_slot > self._vectors.shape[0]:
+            self._open_vectors(self._next_slot)
+        return slots
+
+    def _evict(self, n: int) -> int:
+        victims = self._db.execute("SELECT hash, slot FROM entries ORDER BY last_used ASC LIMIT ?", (n,)).fetchall()
+        self._db.executemany("DELETE FROM entries WHERE hash = ?", [(h,) for h, _ in victims])
+        self._free_slots.extend(slot for _, slot in victims)
+        self.stats.evictions += len(victims)
+        self.stats.entries -= len(victims)
+        return len(victims)
+
+    # --- Public API ---
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Bulk lookup. Returns float32 copies for every hash that is cached."""
+        hashes = list(dict.fromkeys(hashes))
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT hash, slot FROM entries WHERE hash IN ({placeholders})", chunk
+                ).fetchall()
+                if rows:
+                    slots = np.array([slot for _, slot in rows])
+                    block = np.asarray(self._vectors[slots], dtype=np.float32)
+                    for (h, _), vector in zip(rows, block):
+                        found[h] = vector
+            if found:
+                now = time.time()
+                self._db.executemany("UPDATE entries SET last_used = ? WHERE hash = ?", [(now, h) for h in found])
+                self._db.commit()
+            self.stats.hits += len(found)
+            self.stats.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, Sequence[float]]) -> None:
+        with self._lock:
+            existing = set()
+            keys = list(items)
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                existing.update(h for (h,) in self._db.execute(
+                    f"SELECT hash FROM entries WHERE hash IN ({placeholders})", chunk))
+            # A batch larger than the whole cache keeps its first `max_slots` vectors; the rest stay uncached
+            new = [h for h in keys if h not in existing][: self.max_slots]
+            if not new:
+                return
+
+            slots = self._allocate(len(new))
+            new = new[: len(slots)]
+            matrix = np.asarray([items[h] for h in new], dtype=np.float32)
+            if matrix.shape[1] != self.dimensions:
+                raise ValueError(f"Expected {self.dimensions}-d vectors, got {matrix.shape[1]}-d")
+            self._vectors[np.array(slots)] = matrix.astype(self.dtype)
+            self._vectors.flush()
+
+            now = time.time()
+            self._db.executemany("INSERT INTO entries (hash, slot, last_used) VALUES (?, ?, ?)",
+                                 [(h, slot, now) for h, slot in zip(new, slots)])
+            self._db.commit()
+            self.stats.writes += len(new)
+            self.stats.entries += len(new)
+
+    def __len__(self) -> int:
+        return self.stats.entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+            self._free_slots = []
+            self._next_slot = 0
+            self.stats.entries = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._db.close()
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache('text-embedding-3-large', 3072, root=tmp, max_bytes=3072 * 2 * 100)
+        rng = np.random.default_rng(0)
+        vectors = {f"hash-{i}": rng.normal(0, 0.05, 3072) for i in range(150)}
+        cache.put_many(dict(list(vectors.items())[:100]))
+        hit = cache.get_many(list(vectors)[:120])
+        cache.put_many(dict(list(vectors.items())[100:]))   # forces LRU eviction
+        print(cache.stats.report())
+        error = np.abs(hit["hash-0"] - vectors["hash-0"]).max()
+        print(f"float16 max abs error: {error:.2e}")
+        cache.close()
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from agent_pool import AgentPool
+
+
+# --- Configuration ---
+RESULTS_DIR = './eval_results'
+EVAL_WORKERS = 4        # agents answering in parallel (each reused across items)
+SCORING_WORKERS = 8     # metric.score() calls in flight; LLM-judge metrics are I/O bound
+
+
+def item_id(item: Dict[str, Any]) -> str:
+    """Stable id of a dataset row, so a resumed run recognises the rows it already did."""
+    return hashlib.md5(f"{item.get('input', '')}\x1f{item.get('reference', '')}".encode("utf-8")).hexdigest()
+
+
+class ResultsStore:
+    """Append-only JSONL checkpoint: one line per answered or scored item, last line wins.
+
+    Each line is flushed and fsynced, so a crash loses at most the item in flight.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.records: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue    # torn last line from a crash
+                    self.records[record["id"]] = record
+
+    def save(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.records[record["id"]] = record
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        return self.records.get(record_id)
+
+
+@dataclass
+class RunSummary:
+    items: int
+    answered: int
+    errors: int
+    resumed: int
+    scores: Dict[str, float]
+    latency_p50: float
+    latency_p95: float
+    input_tokens: int
+    output_tokens: int
+    wall_seconds: float
+
+    def report(self) -> str:
+        lines = [
+            f"items={self.items} answered={self.answered} errors={self.errors} resumed={self.resumed} "
+            f"wall={self.wall_seconds:.1f}s",
+            f"latency p50={self.latency_p50:.1f}s p95={self.latency_p95:.1f}s "
+            f"tokens in={self.input_tokens} out={self.output_tokens}",
+        ]
+        lines += [f"  {name:<20} {value:.3f}" for name, value in sorted(self.scores.items())]
+        return "\n".join(lines)
+
+
+class EvalRunner:
+    """Answers dataset items with a bounded pool of reused agents and scores them in parallel.
+
+    `task(item, agent)` returns the scoring dict ({input, output, reference, context, ...});
+    every metric's `score(**fields)` runs on a separate thread pool as soon as its item
+    is answered. Both stages checkpoint to the ResultsStore, so a resumed run skips
+    answered items and only re-scores what is missing or errored.
+    """
+
+    def __init__(self, agent_factory: Callable[[], Any], task: Callable[[Dict[str, Any], Any], Dict[str, Any]],
+                 metrics: List[Any], store: ResultsStore, workers: int = EVAL_WORKERS,
+                 scoring_workers: int = SCORING_WORKERS):
+        self.pool = AgentPool(agent_factory, size=workers, max_size=workers)
+        self.task = task
+        self.metrics = metrics
+        self.store = store
+        self.workers = workers
+        self.scoring_workers = scoring_workers
+
+    def _answer(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        record = {"id": item_id(item), "input": item.get("input"), "reference": item.get("reference")}
+        start = time.perf_counter()
+        try:
+            with self.pool.lease() as agent:
+                record.update(self.task(item, agent))
+            record["error"] = None
+        except Exception as e:
+            record.update(output="", context=[], error=f"{type(e).__name__}: {e}")
+        record["latency_s"] = round(time.perf_counter() - start, 3)
+        record["scores"] = {}
+        self.store.save(record)
+        return record
+
+    def _score(self, metric, record: Dict[str, Any]):
+        fields = dict(record, expected_output=record.get("reference"))
+        try:
+            result = metric.score(**fields)
+            results = result if isinstance(result, list) else [result]
+            return {r.name: {"value": r.value, "reason": r.reason} for r in results}
+        except Exception as e:
+            return {getattr(metric, "name", type(metric).__name__): {"value": None, "reason": f"error: {e}"}}
+
+    def _missing_metrics(self, record: Dict[str, Any]) -> List[Any]:
+        # A metric that raised is stored with value None (and its error as reason): re-score it on resume
+        done = {name for name, score in (record.get("scores") or {}).items() if score.get("value") is not None}
+        return [m for m in self.metrics if getattr(m, "name", type(m).__name__) not in done]
+
+    def run(self, items: Iterable[Dict[str, Any]], progress: Optional[Callable[[int], None]] = None) -> RunSummary:
+        start = time.perf_counter()
+        items = list(items)
+        self.pool.boot()
+        resumed = 0
+        pending_answers, to_score = [], []
+        for item in items:
+            record = self.store.get(item_id(item))
+            if record is None or record.get("error"):
+                pending_answers.append(item)
+            else:
+                resumed += 1
+                if self._missing_metrics(record):
+                    to_score.append(record)
+                elif progress:
+                    progress(1)
+
+        score_lock = threading.Lock()
+
+        def submit_scoring(executor, record):
+            missing = self._missing_metrics(record) if not record.get("error") else []
+            if not missing:
+                if progress:
+                    progress(1)
+                return []
+            remaining = {"n": len(missing)}
+
+            def done(future):
+                with score_lock:
+                    record.setdefault("scores", {}).update(future.result())
+                    remaining["n"] -= 1
+                    finished = remaining["n"] == 0
+                if finished:
+                    self.store.save(record)
+                    if progress:
+                        progress(1)
+
+            futures = []
+            for metric in missing:
+                future = executor.submit(self._score, metric, record)
+                future.add_done_callback(done)
+                futures.append(future)
+            return futures
+
+        with ThreadPoolExecutor(max_workers=self.scoring_workers) as scorer, \
+                ThreadPoolExecutor(max_workers=self.workers) as answerer:
+            scoring = []
+            for record in to_score:
+                scoring += submit_scoring(scorer, record)
+            for future in as_completed([answerer.submit(self._answer, item) for item in pending_answers]):
+                scoring += submit_scoring(scorer, future.result())
+            for future in scoring:
+                future.result()
+
+        return self.summary(items, resumed, time.perf_counter() - start)
+
+    def summary(self, items: List[Dict[str, Any]], resumed: int = 0, wall_seconds: float = 0.0) -> RunSummary:
+        records = [self.store.get(item_id(item)) for item in items]
+        records = [r for r in records if r is not None]
+        answered = [r for r in records if not r.get("error")]
+        latencies = np.array([r["latency_s"] for r in answered]) if answered else np.zeros(1)
+        scores: Dict[str, List[float]] = {}
+        for record in answered:
+            for name, score in (record.get("scores") or {}).items():
+                if score.get("value") is not None:
+                    scores.setdefault(name, []).append(float(score["value"]))
+        return RunSummary(
+            items=len(items),
+            answered=len(answered),
+            errors=len(records) - len(answered),
+            resumed=resumed,
+            scores={name: float(np.mean(values)) for name, values in scores.items()},
+            latency_p50=float(np.percentile(latencies, 50)),
+            latency_p95=float(np.percentile(latencies, 95)),
+            input_tokens=sum(r.get("input_tokens", 0) for r in answered),
+            output_tokens=sum(r.get("output_tokens", 0) for r in answered),
+            wall_seconds=wall_seconds,
+        )
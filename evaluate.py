@@ -1,6 +1,9 @@
 import os
+import argparse
 import pandas as pd
 import json
+from typing import List, Dict, Any
+from tqdm import tqdm
 from dotenv import load_dotenv
 from opik import Opik
 from opik.evaluation import evaluate
@@ -8,60 +11,91 @@ from opik.evaluation.metrics import (
     Hallucination, LevenshteinRatio, Moderation, 
     AnswerRelevance, ContextRecall, ContextPrecision
 )
+from opik.evaluation.metrics import base_metric, score_result
 from agent import get_gs1_agent 
+from eval_runner import RESULTS_DIR, EVAL_WORKERS, EvalRunner, ResultsStore, item_id
+from word_budget import WordBudget, budget_stats, count_words, mark_value
+from context_packing import packing_budget
 
 # 1. LOAD ENVIRONMENT VARIABLES
 load_dotenv() 
 
-# Initialize Opik Client
-client = Opik(workspace=os.getenv("OPIK_WORKSPACE"))
+DATASET_NAME = "Vyuha-Benchmark-GS1-v2"
+DATASET_CSV = "llm_as_judge_ds.csv"
 
-# 2. DATASET LOADER (With the "NaN" Fix)
-def get_benchmarking_dataset():
-    dataset_name = "Vyuha-Benchmark-GS1-v2"
-    
-    # 1. DELETE EXISTING (Clean Slate)
+
+# Opik client on first use: a local-only run must not need Opik Cloud
+def get_client():
     try:
-        client.delete_dataset(name=dataset_name)
-        print(f"🗑️ Deleted old version of {dataset_name}")
-    except:
-        pass # It didn't exist, which is fine
-
-    # 2. CREATE FRESH
-    print(f"🆕 Creating fresh dataset: {dataset_name}")
-    dataset = client.create_dataset(name=dataset_name)
-    
-    # 3. READ & INSERT
+        client = Opik(workspace=os.getenv("OPIK_WORKSPACE"))
+        client.auth_check()
+        return client
+    except Exception as e:
+        print(f"⚠️ Opik unavailable, using the local results backend only: {e}")
+        return None
+
+# 2. DATASET LOADER (With the "NaN" Fix)
+def load_items(path=DATASET_CSV):
     try:
-        df = pd.read_csv("llm_as_judge_ds.csv",encoding="latin1")
-        
-        # 1. Force all column names to be strings (Fixes 'Hashable' error)
-        df.columns = df.columns.astype(str)
-        
-        # 2. Force all data to be strings (Fixes NaN/Float errors)
-        df = df.fillna("").astype(str)
-        
-        # 3. Explicitly type hint the variable (Optional, helps Pylance)
-        from typing import List, Dict, Any
-        dataset_items: List[Dict[str, Any]] = df.to_dict(orient="records")
-        
-        dataset.insert(dataset_items)
-        print(f"✅ Successfully inserted {len(dataset_items)} items from CSV.")
-        
+        df = pd.read_csv(path,encoding="latin1")
     except FileNotFoundError:
-        print("❌ CRITICAL ERROR: 'llm_as_judge_ds.csv' not found in this folder.")
+        print(f"❌ CRITICAL ERROR: '{path}' not found in this folder.")
         raise
-        
+
+    # 1. Force all column names to be strings (Fixes 'Hashable' error)
+    df.columns = df.columns.astype(str)
+
+    # 2. Force all data to be strings (Fixes NaN/Float errors)
+    df = df.fillna("").astype(str)
+
+    # 3. Explicitly type hint the variable (Optional, helps Pylance)
+    dataset_items: List[Dict[str, Any]] = df.to_dict(orient="records")
+    return dataset_items
+
+
+def get_benchmarking_dataset(client, dataset_items):
+    # Reuse the dataset across runs; Opik skips items that are already in it
+    dataset = client.get_or_create_dataset(name=DATASET_NAME)
+    dataset.insert(dataset_items)
+    print(f"✅ Dataset {DATASET_NAME} synced with {len(dataset_items)} items from CSV.")
     return dataset
 
-# 3. THE EXAM TASK (Agent runs here)
-def evaluation_task(dataset_item):
-    # Initialize a fresh agent for each question
-    agent = get_gs1_agent()
+# 3. WORD LIMIT METRIC (same counter and budgets as the Streamlit app)
+class WordBudgetMetric(base_metric.BaseMetric):
+    def __init__(self, name: str = "word_budget"):
+        super().__init__(name=name)
+
+    def score(self, input: str, output: str, **ignored_kwargs):
+        budget = WordBudget.for_question(input)
+        words = count_words(output)
+        return score_result.ScoreResult(
+            name=self.name,
+            value=1.0 if budget.within(words) else 0.0,
+            reason=f"{words} words for a {budget.marks}-mark question (limit {budget.limit})"
+        )
+
+# Replays scores computed by the local runner, so logging to Opik re-runs nothing
+class StoredScoreMetric(base_metric.BaseMetric):
+    def __init__(self, name: str, store: ResultsStore):
+        super().__init__(name=name, track=False)
+        self.store = store
+
+    def score(self, input: str, reference: str = "", **ignored_kwargs):
+        record = self.store.get(item_id({"input": input, "reference": reference})) or {}
+        stored = (record.get("scores") or {}).get(self.name) or {}
+        if stored.get("value") is None:
+            return score_result.ScoreResult(name=self.name, value=0.0, reason="not scored", scoring_failed=True)
+        return score_result.ScoreResult(name=self.name, value=stored["value"], reason=stored.get("reason"))
+
+# 4. THE EXAM TASK (Agent runs here)
+def evaluation_task(dataset_item, agent=None):
+    # Agents come from the runner's pool; standalone calls still get a fresh one
+    agent = agent or get_gs1_agent()
     
     # Run the Agent (Non-streaming for evaluation)
     # We use the prompt from the CSV 'input' column
-    response = agent.run(dataset_item["input"], stream=False)
+    with packing_budget(mark_value(dataset_item["input"])):
+        response = agent.run(dataset_item["input"], stream=False)
     
     # --- CONTEXT EXTRACTION ---
     # We need to find what the agent "read" to check for Hallucinations
@@ -82,39 +116,74 @@ def evaluation_task(dataset_item):
     # Default to "No Context" if nothing found (prevents metric crash)
     final_context = retrieved_context if retrieved_context else ["No external context used"]
 
+    # Unenforced answer length -> baseline for the app's "tokens saved" estimate
+    output = str(response.content) if response.content else ""
+    if output:
+        budget_stats.observe_natural(WordBudget.for_question(dataset_item["input"]).marks, output)
+
     return {
         "input": str(dataset_item["input"]),
         "output": str(response.content) if response.content else "Error: No Output",
         "reference": str(dataset_item["reference"]), # The "Model Answer" from your CSV
-        "context": final_context
+        "context": final_context,
+        "word_count": count_words(output),
+        "input_tokens": getattr(response.metrics, "input_tokens", 0) or 0,
+        "output_tokens": getattr(response.metrics, "output_tokens", 0) or 0
     }
 
-# 4. RUN THE BENCHMARK
+# 5. RUN THE BENCHMARK
 if __name__ == "__main__":
-    # Get the dataset
-    dataset = get_benchmarking_dataset()
-    
+    parser = argparse.ArgumentParser(description="Parallel, resumable Vyuha-AI evaluation")
+    parser.add_argument("--experiment", default="Vyuha-GS1-Experiment-06") # Change this name for subsequent runs (02, 03...)
+    parser.add_argument("--workers", type=int, default=EVAL_WORKERS, help="agents answering in parallel")
+    parser.add_argument("--backend", choices=["auto", "opik", "local"], default="auto")
+    parser.add_argument("--offline-metrics", action="store_true", help="only metrics that need no LLM judge")
+    args = parser.parse_args()
+
     # Define the Metrics (The "Grading Rubric")
-    metrics = [
-        Hallucination(),       # Is it making things up?
-        AnswerRelevance(),     # Did it answer the specific question?
-        LevenshteinRatio(),    # How close is the text to your reference answer?
-        Moderation(),          # Is the content safe?
-        ContextRecall(),       # Did we find the right facts in the search?
-        ContextPrecision()     # Is the relevant info ranked high?
+    if args.offline_metrics:
+        metrics = [LevenshteinRatio(), WordBudgetMetric()]
+    else:
+        metrics = [
+            Hallucination(),       # Is it making things up?
+            AnswerRelevance(),     # Did it answer the specific question?
+            LevenshteinRatio(),    # How close is the text to your reference answer?
+            Moderation(),          # Is the content safe?
+            ContextRecall(),       # Did we find the right facts in the search?
+            ContextPrecision(),    # Is the relevant info ranked high?
+            WordBudgetMetric()     # Is it within the 150/250 word mandate?
+        ]
 
-    ]
+    dataset_items = load_items()
+    # Checkpoint per experiment: re-running the same command resumes where it stopped
+    store = ResultsStore(os.path.join(RESULTS_DIR, f"{args.experiment}.jsonl"))
+    runner = EvalRunner(get_gs1_agent, evaluation_task, metrics, store, workers=args.workers)
 
     print("\n🚀 Starting Vyuha-AI Evaluation Run...")
-    print("This may take a few minutes depending on the number of questions...\n")
-    
-    evaluate(
-        experiment_name="Vyuha-GS1-Experiment-06", # Change this name for subsequent runs (02, 03...)
-        dataset=dataset,
-        task=evaluation_task,
-        scoring_metrics=metrics,
-        scoring_key_mapping={'expected_output': 'reference'},
-        verbose=True
-        )
-    
-    print("\n✅ Evaluation Complete! Check your Opik Dashboard.")
\ No newline at end of file
+    print(f"Results checkpoint: {store.path}\n")
+    with tqdm(total=len(dataset_items), desc="Evaluating") as progress:
+        summary = runner.run(dataset_items, progress=progress.update)
+
+    budget_stats.save()
+    print(f"\n📊 {summary.report()}")
+    with open(os.path.join(RESULTS_DIR, f"{args.experiment}.summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary.__dict__, f, indent=2)
+
+    client = get_client() if args.backend != "local" else None
+    if client is None:
+        if args.backend == "opik":
+            raise SystemExit("❌ --backend opik requested but Opik is unavailable")
+        print("\n✅ Evaluation Complete! Results are in the local results store.")
+    else:
+        # Log the stored answers and scores as an Opik experiment (no agent or judge calls)
+        dataset = get_benchmarking_dataset(client, dataset_items)
+        score_names = sorted({name for r in store.records.values() for name in (r.get("scores") or {})})
+        evaluate(
+            experiment_name=args.experiment,
+            dataset=dataset,
+            task=lambda item: store.get(item_id(item)) or {"output": "Error: No Output"},
+            scoring_metrics=[StoredScoreMetric(name, store) for name in score_names],
+            task_threads=args.workers,
+            verbose=True
+            )
+        print("\n✅ Evaluation Complete! Check your Opik Dashboard.")
@@ -0,0 +1,115 @@
+import os
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class SyncPlan:
+    """What an incremental sync has to do to bring the table in line with the CSVs.
+
+    Only row keys are kept, so planning a 1M-row corpus costs a few MB; the rows to
+    embed are re-streamed from disk with `pending()`.
+    """
+    to_embed: Set[Tuple[str, str]] = field(default_factory=set)    # (source, key) of new + changed rows
+    replaced_row_ids: Dict[Tuple[str, str], str] = field(default_factory=dict)  # (source, key) -> stale row id
+    removed: Dict[str, List[str]] = field(default_factory=dict)     # source -> keys no longer present
+    added: int = 0
+    changed: int = 0
+    unchanged: int = 0
+
+    def pending(self, records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yields the records of a fresh pass over the corpus that still need embedding."""
+        for record in records:
+            if (record["metadata"]["source"], record["key"]) in self.to_embed:
+                yield record
+
+    @property
+    def removed_count(self) -> int:
+        return sum(len(keys) for keys in self.removed.values())
+
+    def report(self) -> str:
+        return (f"added={self.added} changed={self.changed} "
+                f"removed={self.removed_count} unchanged={self.unchanged}")
+
+
+class IndexManifest:
+    """Persisted record of which rows of each source file are in the vector table.
+
+    Layout: {"version": 1, "table": "GS1", "sources": {source: {row_key: {"hash", "row_id"}}}}
+    """
+
+    def __init__(self, path: str, table_name: str):
+        self.path = path
+        self.table_name = table_name
+        self.sources: Dict[str, Dict[str, Dict[str, str]]] = {}
+        self.exists = False
+
+    @classmethod
+    def load(cls, path: str, table_name: str) -> "IndexManifest":
+        manifest = cls(path, table_name)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION and data.get("table") == table_name:
+                manifest.sources = data.get("sources", {})
+                manifest.exists = True
+            else:
+                print(f"⚠️ Ignoring incompatible manifest at {path}")
+        return manifest
+
+    def save(self) -> None:
+        """Atomic write so a crash mid-ingestion never leaves a half-written manifest."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "table": self.table_name, "sources": self.sources}, f)
+        os.replace(tmp_path, self.path)
+        self.exists = True
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self.sources.values())
+
+    def plan(self, records: Iterable[Dict[str, Any]]) -> SyncPlan:
+        """Diffs streamed records (dicts with 'key', 'content_hash', 'metadata') against the manifest."""
+        plan = SyncPlan()
+        seen: Dict[str, set] = {}
+
+        for record in records:
+            source = record["metadata"]["source"]
+            key = record["key"]
+            seen.setdefault(source, set()).add(key)
+            entry = self.sources.get(source, {}).get(key)
+
+            if entry is None:
+                plan.added += 1
+                plan.to_embed.add((source, key))
+            elif entry["hash"] != record["content_hash"]:
+                plan.changed += 1
+                plan.replaced_row_ids[(source, key)] = entry["row_id"]
+                plan.to_embed.add((source, key))
+            else:
+                plan.unchanged += 1
+
+        for source, rows in self.sources.items():
+            gone = [key for key in rows if key not in seen.get(source, set())]
+            if gone:
+                plan.removed[source] = gone
+        return plan
+
+    def row_ids(self, source: str, keys: List[str]) -> List[str]:
+        rows = self.sources.get(source, {})
+        return [rows[key]["row_id"] for key in keys if key in rows]
+
+    def record(self, source: str, key: str, content_hash: str, row_id: str) -> None:
+        self.sources.setdefault(source, {})[key] = {"hash": content_hash, "row_id": row_id}
+
+    def forget(self, source: str, keys: List[str]) -> None:
+        rows = self.sources.get(source, {})
+        for key in keys:
+            rows.pop(key, None)
+        if source in self.sources and not rows:
+            del self.sources[source]
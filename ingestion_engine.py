@@ -0,0 +1,435 @@
+import re
+import time
+import random
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from opik import track
+
+from word_budget import estimate_tokens
+
+
+# --- Configuration ---
+MAX_WORKERS = 4
+MAX_RETRIES = 6
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+
+# Conservative defaults until the provider tells us the real quota via headers
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+
+
+# --- Errors & Results ---
+
+class RateLimitedError(Exception):
+    """Raised by an embedding backend when the provider answers with HTTP 429."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.headers = headers or {}
+
+
+@dataclass
+class EmbeddingResult:
+    embeddings: List[List[float]]
+    total_tokens: int = 0
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class IngestionStats:
+    docs: int = 0
+    tokens: int = 0
+    batches: int = 0
+    cached: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    failed_batches: List[int] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def tokens_per_sec(self) -> float:
+        return self.tokens / self.elapsed if self.elapsed else 0.0
+
+    def report(self) -> str:
+        return (
+            f"Embedded {self.docs} docs / {self.tokens} tokens in {self.elapsed:.1f}s "
+            f"({self.docs_per_sec:.1f} docs/s, {self.tokens_per_sec:.0f} tokens/s) | "
+            f"batches={self.batches} cached={self.cached} retries={self.retries} 429s={self.rate_limited} "
+            f"failed={len(self.failed_batches)}"
+        )
+
+
+# --- Header Parsing ---
+
+_DURATION_RE = re.compile(r"([\d.]+)(ms|s|m|h)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parses OpenAI reset durations such as '20ms', '1s' or '6m0s' into seconds."""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers: Dict[str, str]) -> Optional[float]:
+    """Reads 'retry-after-ms' / 'retry-after' from a 429 response."""
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000.0
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+
+# --- Rate Limiting ---
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_minute = float(rate_per_minute)
+        self.capacity = float(capacity or rate_per_minute)
+        self.available = self.capacity
+        self.blocked_until = 0.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.available = min(self.capacity, self.available + (now - self._last) * self.rate_per_minute / 60.0)
+        self._last = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Blocks until `amount` can be taken. Returns the seconds spent waiting."""
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.available >= amount:
+                    self.available -= amount
+                    return waited
+                else:
+                    wait = (amount - self.available) * 60.0 / self.rate_per_minute
+            time.sleep(wait)
+            waited += wait
+
+    def sync(self, limit: Optional[float] = None, remaining: Optional[float] = None) -> None:
+        """Aligns the bucket with the quota the provider reports."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if limit:
+                self.rate_per_minute = float(limit)
+                self.capacity = float(limit)
+            if remaining is not None:
+                self.available = min(self.available, float(remaining))
+
+    def pause(self, seconds: float) -> None:
+        """Stops every consumer for `seconds` and halves the refill rate (multiplicative decrease)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.available = 0.0
+            self.rate_per_minute = max(1.0, self.rate_per_minute / 2)
+
+
+class AdaptiveRateLimiter:
+    """Request + token buckets driven by x-ratelimit-* headers and 429 responses."""
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def acquire(self, n_tokens: int) -> float:
+        return self.requests.acquire(1) + self.tokens.acquire(n_tokens)
+
+    def observe(self, headers: Dict[str, str]) -> None:
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+
+        def _num(key):
+            try:
+                return float(headers[key])
+            except (KeyError, TypeError, ValueError):
+                return None
+
+        self.requests.sync(_num("x-ratelimit-limit-requests"), _num("x-ratelimit-remaining-requests"))
+        self.tokens.sync(_num("x-ratelimit-limit-tokens"), _num("x-ratelimit-remaining-tokens"))
+
+    def on_rate_limited(self, retry_after: Optional[float], headers: Optional[Dict[str, str]] = None) -> float:
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        wait = retry_after
+        if wait is None:
+            resets = [parse_duration(headers.get("x-ratelimit-reset-requests")),
+                      parse_duration(headers.get("x-ratelimit-reset-tokens"))]
+            wait = max([r for r in resets if r is not None], default=BASE_BACKOFF)
+        self.requests.pause(wait)
+        self.tokens.pause(wait)
+        return wait
+
+
+# --- Embedding Backends ---
+
+class OpenAIBatchEmbedder:
+    """Embeds a whole batch in one request and surfaces the rate-limit headers."""
+
+    def __init__(self, client, model: str, dimensions: Optional[int] = None):
+        # The engine owns retries, so switch off the SDK's own retry loop
+        self.client = client.with_options(max_retries=0)
+        self.model = model
+        self.dimensions = dimensions
+
+    @track(name='embed_batch', capture_input=False, capture_output=False)
+    def embed(self, texts: List[str]) -> EmbeddingResult:
+        from openai import RateLimitError
+
+        params: Dict[str, Any] = {"input": texts, "model": self.model, "encoding_format": "float"}
+        if self.dimensions and self.model.startswith("text-embedding-3"):
+            params["dimensions"] = self.dimensions
+
+        try:
+            raw = self.client.embeddings.with_raw_response.create(**params)
+        except RateLimitError as e:
+            headers = dict(e.response.headers) if e.response is not None else {}
+            raise RateLimitedError(str(e), retry_after=parse_retry_after(headers), headers=headers) from e
+
+        response = raw.parse()
+        return EmbeddingResult(
+            embeddings=[item.embedding for item in sorted(response.data, key=lambda d: d.index)],
+            total_tokens=response.usage.total_tokens if response.usage else 0,
+            headers=dict(raw.headers),
+        )
+
+
+class LocalBatchEmbedder:
+    """Runs batches through a local_embedder.LocalEmbedder on CPU (no quota, so no 429s)."""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+
+    def embed(self, texts: List[str]) -> EmbeddingResult:
+        vectors, tokens = self.embedder.embed_documents(texts)
+        return EmbeddingResult(embeddings=vectors, total_tokens=tokens)
+
+
+class FakeEmbedder:
+    """Local stand-in for the OpenAI embeddings API.
+
+    Returns deterministic vectors, sends OpenAI-style x-ratelimit-* headers and raises
+    RateLimitedError once the simulated quota is exhausted. Quotas apply per `window`
+    seconds (60 like the real API, shorter to exercise throttling quickly).
+    """
+
+    def __init__(self, dimensions: int = 8, requests_per_minute: int = 600, tokens_per_minute: int = 200_000,
+                 latency: float = 0.05, failure_rate: float = 0.0, window: float = 60.0, seed: int = 0):
+        self.dimensions = dimensions
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.rejected = 0
+        self._rng = random.Random(seed)
+        self._window: List[tuple] = []  # (timestamp, tokens) of accepted calls in the current window
+        self._lock = threading.Lock()
+
+    def vector(self, text: str) -> List[float]:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [b / 255.0 for b in (digest * (self.dimensions // len(digest) + 1))[: self.dimensions]]
+
+    def embed(self, texts: List[str]) -> EmbeddingResult:
+        tokens = sum(estimate_tokens(t) for t in texts)
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            self._window = [(ts, n) for ts, n in self._window if now - ts < self.window]
+            used_requests = len(self._window)
+            used_tokens = sum(n for _, n in self._window)
+            reset = self.window - (now - self._window[0][0]) if self._window else 0.0
+            scale = 60.0 / self.window
+            headers = {
+                "x-ratelimit-limit-requests": str(self.requests_per_minute * scale),
+                "x-ratelimit-limit-tokens": str(self.tokens_per_minute * scale),
+                "x-ratelimit-reset-requests": f"{reset:.3f}s",
+                "x-ratelimit-reset-tokens": f"{reset:.3f}s",
+            }
+            if used_requests + 1 > self.requests_per_minute or used_tokens + tokens > self.tokens_per_minute:
+                self.rejected += 1
+                headers["retry-after-ms"] = str(int(reset * 1000))
+                raise RateLimitedError("429 Too Many Requests", retry_after=reset, headers=headers)
+            failed = self._rng.random() < self.failure_rate
+            if not failed:
+                self._window.append((now, tokens))
+                headers["x-ratelimit-remaining-requests"] = str(self.requests_per_minute - used_requests - 1)
+                headers["x-ratelimit-remaining-tokens"] = str(self.tokens_per_minute - used_tokens - tokens)
+
+        time.sleep(self.latency)
+        if failed:
+            raise ConnectionError("simulated transient failure")
+        return EmbeddingResult(embeddings=[self.vector(t) for t in texts], total_tokens=tokens, headers=headers)
+
+
+# --- Engine ---
+
+class IngestionEngine:
+    """Embeds document batches concurrently under an adaptive rate limit.
+
+    `write_fn(batch_index, documents)` is called (serialised) once every document in
+    the batch carries its embedding, so the vector store never sees empty vectors.
+    With an `EmbeddingCache`, cached vectors are reused and only misses reach the backend.
+    """
+
+    def __init__(self, backend, write_fn: Callable[[int, List[Any]], None],
+                 limiter: Optional[AdaptiveRateLimiter] = None, max_workers: int = MAX_WORKERS,
+                 max_retries: int = MAX_RETRIES, base_backoff: float = BASE_BACKOFF, max_backoff: float = MAX_BACKOFF,
+                 cache=None):
+        self.backend = backend
+        self.write_fn = write_fn
+        self.cache = cache
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.stats = IngestionStats()
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+    def _embed_with_retry(self, texts: List[str]) -> EmbeddingResult:
+        # Reserve quota before the call; never zero, or a tiny batch would skip the limiter
+        estimate = max(1, sum(estimate_tokens(t) for t in texts))
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(estimate)
+            try:
+                result = self.backend.embed(texts)
+                self.limiter.observe(result.headers)
+                return result
+            except RateLimitedError as e:
+                wait = self.limiter.on_rate_limited(e.retry_after, e.headers)
+                with self._stats_lock:
+                    self.stats.rate_limited += 1
+                    self.stats.retries += 1
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(wait + self.backoff(attempt))
+            except Exception:
+                with self._stats_lock:
+                    self.stats.retries += 1
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff(attempt))
+
+    def _process(self, batch_index: int, documents: List[Any]) -> int:
+        hashes = [hashlib.md5(doc.content.encode("utf-8")).hexdigest() for doc in documents]
+        cached = self.cache.get_many(hashes) if self.cache is not None else {}
+        for doc, content_hash in zip(documents, hashes):
+            if content_hash in cached:
+                doc.embedding = cached[content_hash].tolist()
+
+        pending = [(doc, content_hash) for doc, content_hash in zip(documents, hashes) if content_hash not in cached]
+        total_tokens = 0
+        if pending:
+            result = self._embed_with_retry([doc.content for doc, _ in pending])
+            if len(result.embeddings) != len(pending):
+                raise ValueError(f"Expected {len(pending)} embeddings, got {len(result.embeddings)}")
+            for (doc, _), embedding in zip(pending, result.embeddings):
+                doc.embedding = embedding
+            if self.cache is not None:
+                self.cache.put_many({content_hash: doc.embedding for doc, content_hash in pending})
+            total_tokens = result.total_tokens
+
+        with self._write_lock:
+            self.write_fn(batch_index, documents)
+
+        with self._stats_lock:
+            self.stats.docs += len(documents)
+            self.stats.cached += len(documents) - len(pending)
+            self.stats.tokens += total_tokens
+            self.stats.batches += 1
+        return len(documents)
+
+    def run(self, batches, progress: Optional[Callable[[int], None]] = None) -> IngestionStats:
+        """Processes an iterable of document lists. Failed batches are recorded, never dropped silently.
+
+        `batches` is consumed lazily with at most 2 x max_workers batches in flight, so a
+        generator keeps memory flat regardless of corpus size.
+        """
+        start = time.perf_counter()
+        batch_iter = enumerate(batches)
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            def submit_next() -> None:
+                item = next(batch_iter, None)
+                if item is not None:
+                    in_flight[pool.submit(self._process, *item)] = item[0]
+
+            for _ in range(self.max_workers * 2):
+                submit_next()
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch_index = in_flight.pop(future)
+                    try:
+                        finished = future.result()
+                        if progress:
+                            progress(finished)
+                    except Exception as e:
+                        print(f"⚠️ Batch {batch_index} failed after {self.max_retries} retries: {e}")
+                        self.stats.failed_batches.append(batch_index)
+                    submit_next()
+
+        self.stats.elapsed = time.perf_counter() - start
+        return self.stats
+
+
+if __name__ == "__main__":
+    # Self-check against the fake embedder: a tight quota forces 429s and retries
+    from types import SimpleNamespace
+
+    written = {}
+    fake = FakeEmbedder(requests_per_minute=4, tokens_per_minute=20_000, latency=0.02, failure_rate=0.05, window=1.0)
+    engine = IngestionEngine(
+        backend=fake,
+        write_fn=lambda i, docs: written.__setitem__(i, len(docs)),
+        limiter=AdaptiveRateLimiter(requests_per_minute=600, tokens_per_minute=1_000_000),
+        max_workers=8,
+        base_backoff=0.05,
+        max_backoff=0.5,
+    )
+    docs = [SimpleNamespace(content=f"Sample NCERT row {n} " * 20, embedding=None) for n in range(400)]
+    batches = (docs[i:i + 50] for i in range(0, len(docs), 50))
+    stats = engine.run(batches)
+
+    print(stats.report())
+    print(f"Fake embedder calls={fake.calls} rejected={fake.rejected}")
+    assert sum(written.values()) + 50 * len(stats.failed_batches) == len(docs)
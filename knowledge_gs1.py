@@ -1,21 +1,14 @@
 import os
-import time
+import argparse
 import hashlib
-from tqdm import tqdm
+import threading
 from dotenv import load_dotenv
 
-# --- Native Opik Imports  ---
-from openai import OpenAI
-import opik 
-from opik.integrations.openai import track_openai
+from vector_index import IndexConfig
 
-# --- Agno Imports ---
-from agno.knowledge.knowledge import Knowledge
-from agno.knowledge.embedder.openai import OpenAIEmbedder
-from agno.vectordb.lancedb import LanceDb
-#from agno.knowledge.chunking.fixed import FixedSizeChunking
-from agno.knowledge.document import Document
-from dataset_preprocessor import download_dataset, create_document, book_list
+# Serving (agent.py / app.py) only needs the lazily built objects below; the
+# ingestion-only modules (pandas, datasets, tqdm, the engine) load inside main(),
+# and opik on first telemetry use.
 
 load_dotenv()
 
@@ -23,20 +16,86 @@ load_dotenv()
 # --- Configuration ---
 NCERT_PATH = './NCERT'
 VECTOR_PATH = './lance_db/GS1'
+
+# Embedding backend: 'openai' (text-embedding-3-large API) or 'local' (ONNX on CPU, local_embedder.py).
+# Vectors of different models are not comparable, so each backend gets its own table.
+EMBEDDER_BACKEND = os.getenv("VYUHA_EMBEDDER", "openai")
+LOCAL_QUANTIZATION = os.getenv("VYUHA_LOCAL_EMBEDDER_QUANT", "int8")   # local_embedder.QUANTIZATION
+TABLE_NAME = 'GS1' if EMBEDDER_BACKEND == 'openai' else f'GS1_{EMBEDDER_BACKEND}_{LOCAL_QUANTIZATION}'
+MANIFEST_PATH = f'./lance_db/{TABLE_NAME}_manifest.json'
 BATCH_SIZE = 50
-SLEEP_TIME = 1.5
+MAX_WORKERS = 4
+DELETE_CHUNK = 500
+
+# ANN index settings (pick with benchmarks/sweep_vector_index.py) and optional
+# 256-d Matryoshka first pass + exact 3072-d rerank
+INDEX_CONFIG = IndexConfig(index_type='IVF_PQ', nprobes=20)
+TWO_STAGE_SEARCH = False
+# Subject/book-filtered searches (query routing) pre-filter a metadata companion table
+PARTITIONED_SEARCH = True
 
 os.environ["OPIK_PROJECT_NAME"] = "Vyuha-AI"
-opik.configure(use_local=False)
-client = OpenAI()
-tracked_client = track_openai(client)
 
 
-embedder = OpenAIEmbedder(
-    id='text-embedding-3-large',
-    openai_client=tracked_client,
-    dimensions=3072
-)
+# --- Lazy construction (first use, not import) ---
+_lock = threading.RLock()
+_objects = {}
+
+
+def _lazy(name):
+    """Builds each shared object once, on first use, behind a process-wide lock."""
+    def decorator(builder):
+        def getter():
+            if name not in _objects:
+                with _lock:
+                    if name not in _objects:
+                        _objects[name] = builder()
+            return _objects[name]
+        getter.__name__ = builder.__name__
+        getter.__doc__ = builder.__doc__
+        return getter
+    return decorator
+
+
+@_lazy('telemetry')
+def configure_telemetry():
+    """Opik cloud config; needs OPIK keys + network, so it is skipped (with a warning) when absent."""
+    import opik
+
+    try:
+        opik.configure(use_local=False)
+        return True
+    except Exception as e:
+        print(f"⚠️ Opik telemetry not configured: {e}")
+        return False
+
+
+@_lazy('client')
+def get_client():
+    from openai import OpenAI
+    from opik.integrations.openai import track_openai
+
+    configure_telemetry()
+    return track_openai(OpenAI())
+
+
+@_lazy('embedder')
+def get_embedder():
+    from metrics import instrument_embedder
+    from replay import wrap_embedder
+
+    if EMBEDDER_BACKEND == 'local':
+        from local_embedder import LocalEmbedder
+        embedder = LocalEmbedder()
+    else:
+        from agno.knowledge.embedder.openai import OpenAIEmbedder
+        embedder = OpenAIEmbedder(
+            id='text-embedding-3-large',
+            openai_client=get_client(),
+            dimensions=3072
+        )
+    # wrap_embedder is a no-op unless VYUHA_REPLAY is set (record/replay/synthetic)
+    return instrument_embedder(wrap_embedder(embedder))
 
 # Experimenting: from fixed size to metadata based chunking
 # chunking_strategy = FixedSizeChunking(
@@ -44,18 +103,80 @@ embedder = OpenAIEmbedder(
 #     overlap=0
 #     )
 
-vector_db = LanceDb(
-    uri= VECTOR_PATH,
-    embedder=embedder,
-    table_name='GS1'
-)
+
+@_lazy('vector_db')
+def get_vector_db():
+    from agno.vectordb.lancedb import LanceDb
+
+    return LanceDb(
+        uri= VECTOR_PATH,
+        embedder=get_embedder(),
+        table_name=TABLE_NAME,
+        nprobes=INDEX_CONFIG.nprobes
+    )
+
 
 # creating the knowledgebase wrapper to be imported by agent.py later
-knowledge_base = Knowledge(
-    name= 'GS1_Knowledge_Base',
-    description='class 11 & 12 NCERT history and Geography books embeddings',
-    vector_db=vector_db
-)
+@_lazy('knowledge_base')
+def get_knowledge_base():
+    from agno.knowledge.knowledge import Knowledge
+
+    return Knowledge(
+        name= 'GS1_Knowledge_Base',
+        description='class 11 & 12 NCERT history and Geography books embeddings',
+        vector_db=get_vector_db()
+    )
+
+
+@_lazy('two_stage_search')
+def get_two_stage_search():
+    from vector_index import TwoStageSearch
+
+    return TwoStageSearch(get_vector_db(), index_config=INDEX_CONFIG)
+
+
+@_lazy('partitioned_search')
+def get_partitioned_search():
+    from vector_index import PartitionedSearch
+
+    return PartitionedSearch(get_vector_db(), index_config=INDEX_CONFIG)
+
+
+def _search_backend():
+    if TWO_STAGE_SEARCH:
+        return get_two_stage_search()
+    return get_partitioned_search() if PARTITIONED_SEARCH else get_vector_db()
+
+
+# Vector + BM25 search fused with reciprocal-rank fusion (used as the SME's knowledge search).
+# The vector side resolves lazily too, so a lexical-only query never touches OpenAI/LanceDB.
+@_lazy('hybrid_retriever')
+def get_hybrid_retriever():
+    from hybrid_retrieval import HybridRetriever
+
+    return HybridRetriever(
+        vector_db=_search_backend,
+        base_path=NCERT_PATH,
+        weights={'vector': 1.0, 'lexical': 1.0}
+    )
+
+
+_GETTERS = {
+    'client': get_client,
+    'embedder': get_embedder,
+    'vector_db': get_vector_db,
+    'knowledge_base': get_knowledge_base,
+    'two_stage_search': get_two_stage_search,
+    'partitioned_search': get_partitioned_search,
+    'hybrid_retriever': get_hybrid_retriever,
+}
+
+
+def __getattr__(name):
+    # Back-compat: `knowledge_gs1.vector_db` etc. still work, built on first access
+    if name in _GETTERS:
+        return _GETTERS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # --- NEW HELPER FUNCTION ---
 def get_content_hash(text: str) -> str:
@@ -63,73 +184,176 @@ def get_content_hash(text: str) -> str:
     return hashlib.md5(text.encode("utf-8")).hexdigest()
 
 
+def get_row_id(doc_id: str, batch_hash: str) -> str:
+    """Mirrors the row id LanceDb.insert derives from the document id and batch hash."""
+    return get_content_hash(f"{doc_id}_{batch_hash}")
+
+
+def refresh_indexes(rebuild: bool = False):
+    """Managed index step: ANN index on GS1 and, if enabled, the first-pass and metadata tables."""
+    from vector_index import ensure_vector_index
+
+    ensure_vector_index(get_vector_db(), INDEX_CONFIG, rebuild=rebuild)
+    if TWO_STAGE_SEARCH:
+        two_stage_search = get_two_stage_search()
+        rows = two_stage_search.build()
+        print(f"🧭 Rebuilt {two_stage_search.table_name} ({rows} rows)")
+    if PARTITIONED_SEARCH:
+        partitioned_search = get_partitioned_search()
+        rows = partitioned_search.build()
+        print(f"🧭 Rebuilt {partitioned_search.table_name} ({rows} rows, indexed by subject/source/topic)")
+
+
+def delete_rows(row_ids):
+    """Deletes LanceDB rows by id in chunks (one scan per chunk instead of per row)."""
+    for i in range(0, len(row_ids), DELETE_CHUNK):
+        chunk = ", ".join(f"'{row_id}'" for row_id in row_ids[i : i + DELETE_CHUNK])
+        get_vector_db().table.delete(f"id IN ({chunk})")
+
+
 # --- Main Ingestion Logic ---
-@opik.track(name='Ingest NCERT')
-def main():
-    # 1. Verify Dataset
-    if not os.path.exists(NCERT_PATH) or not os.listdir(NCERT_PATH):
-        print("NCERT directory empty. Starting download...")
+def main(full_rebuild: bool = False, use_cache: bool = True):
+    """Syncs the NCERT corpus into the table, traced as one Opik span."""
+    import opik
+
+    try:
+        return opik.track(name='Ingest NCERT')(ingest)(full_rebuild=full_rebuild, use_cache=use_cache)
+    finally:
+        # Force logs to send before closing
+        opik.flush_tracker()
+
+
+def ingest(full_rebuild: bool = False, use_cache: bool = True):
+    from tqdm import tqdm
+    from agno.knowledge.document import Document
+    from dataset_preprocessor import download_dataset, load_snapshot, iter_snapshot_records, iter_batches, book_list
+    from ingestion_engine import IngestionEngine, OpenAIBatchEmbedder, LocalBatchEmbedder, AdaptiveRateLimiter
+    from index_manifest import IndexManifest
+    from embedding_cache import EmbeddingCache
+
+    configure_telemetry()
+    embedder, vector_db = get_embedder(), get_vector_db()
+
+    # 1. Verify Dataset (fetches only the books that are missing on disk)
+    expected = [os.path.join(NCERT_PATH, f"{book.split('/')[-1]}.csv") for book in book_list]
+    if not all(os.path.exists(path) for path in expected):
+        print("NCERT books missing. Starting download...")
         download_dataset(base_path=NCERT_PATH, book_list=book_list)
 
-    # 2. Load documents into memory (Returns Dictionary List)
+    # 2. Memory-map the processed corpus (rebuilt only when a CSV changed)
     print("Reading and formatting documents...")
-    all_doc_data = create_document(base_path=NCERT_PATH) 
-    total_docs = len(all_doc_data)
-    print(f"Loaded {total_docs} rows to process.")
+    snapshot = load_snapshot(base_path=NCERT_PATH)
+    print(f"Loaded {snapshot.num_rows} rows to process.")
 
-    if total_docs == 0:
-        print("No documents found to process. Exiting.")
-        return
+    # Diff the rows against the manifest of what is already indexed
+    manifest = IndexManifest.load(MANIFEST_PATH, table_name=vector_db.table_name)
+    if full_rebuild or (not manifest.exists and vector_db.exists() and vector_db.get_count() > 0):
+        # No trustworthy record of the table contents -> start from a clean table
+        print("🧹 Rebuilding GS1 table from scratch...")
+        vector_db.drop()
+        manifest = IndexManifest(MANIFEST_PATH, table_name=vector_db.table_name)
 
-    # 3. Initialize/Reset Vector DB table
-    # This creates the table with the schema from the embedder
+    # This creates the table with the schema from the embedder (no-op if it exists)
     vector_db.create()
 
-    # 4. Batch Processing Loop
-    for i in tqdm(range(0, total_docs, BATCH_SIZE), desc="Processing Batches"):
-        batch_data = all_doc_data[i : i + BATCH_SIZE]
-        
-        batch_documents = []
-        batch_content_str = "" # Accumulator for the batch hash
-
-        for item in batch_data:
-            # Create Document using the pre-processed dictionary
-            doc = Document(
-                content=item['content'],
-                meta_data=item['metadata'] # Passing the dictionary directly
-            )
-            
-            # Generate unique ID based on content to prevent duplicates
-            doc.id = get_content_hash(doc.content)
-            
-            batch_documents.append(doc)
-            
-            # Accumulate content for batch integrity check
-            batch_content_str += doc.content
-
-        # Calculate Batch Hash (Required by LanceDB upsert)
-        batch_hash = get_content_hash(batch_content_str)
-
-        try:
-            # DIRECT UPSERT (No Chunking)
-            vector_db.upsert(
-                documents=batch_documents,
-                content_hash=batch_hash 
-            )
-            
-        except Exception as e:
-            print(f"⚠️ Error in batch {i}: {e}")
-            time.sleep(10) # Backoff on error
-            continue
-
-        # Politeness pause to avoid OpenAI Rate Limits
-        time.sleep(SLEEP_TIME)
+    plan = manifest.plan(iter_snapshot_records(snapshot))
+    print(f"🔎 Sync plan: {plan.report()}")
+
+    # 3. Drop rows whose source row disappeared
+    for source, keys in plan.removed.items():
+        delete_rows(manifest.row_ids(source, keys))
+        manifest.forget(source, keys)
+    if plan.removed:
+        manifest.save()
+
+    if not plan.to_embed:
+        # Also builds the metadata table for an index that predates partitioned search
+        if plan.removed or (PARTITIONED_SEARCH and not get_partitioned_search().exists()):
+            refresh_indexes()
+        print("\n✅ Knowledge Base already up to date.")
+        return plan
+
+    # 4. Lazily build batches of new/changed rows (second pass over the snapshot)
+    batch_records = {}      # batch_index -> records, until the batch is stored (or has failed)
+    inserted = []           # row counts of the batches actually written
+
+    def iter_document_batches():
+        for batch_index, records in enumerate(iter_batches(plan.pending(iter_snapshot_records(snapshot)), BATCH_SIZE)):
+            batch_documents = []
+            for item in records:
+                doc = Document(
+                    content=item['content'],
+                    meta_data=item['metadata'] # Passing the dictionary directly
+                )
+                # Generate unique ID based on content to prevent duplicates
+                doc.id = item['content_hash']
+                batch_documents.append(doc)
+            batch_records[batch_index] = records
+            yield batch_documents
+
+    # 5. Concurrent, rate-limited embedding + serialised writes
+    def write_batch(batch_index, batch_documents):
+        # Batch Hash (Required by LanceDB insert)
+        batch_hash = get_content_hash("".join(doc.content for doc in batch_documents))
+        vector_db.insert(
+            documents=batch_documents,
+            content_hash=batch_hash
+        )
+
+        # Retire the previous version of changed rows only once the new one is stored
+        records = batch_records[batch_index]
+        row_keys = [(item['metadata']['source'], item['key']) for item in records]
+        stale = [plan.replaced_row_ids[row_key] for row_key in row_keys if row_key in plan.replaced_row_ids]
+        if stale:
+            delete_rows(stale)
+
+        for item, doc in zip(records, batch_documents):
+            manifest.record(item['metadata']['source'], item['key'], item['content_hash'], get_row_id(doc.id, batch_hash))
+        manifest.save()
+        # Only a batch that got this far counts as stored; a raise above leaves it out of the manifest
+        inserted.append(len(batch_records.pop(batch_index)))
+
+    # Local vector cache: rebuilding from previously embedded rows costs no API calls
+    cache = EmbeddingCache(model=embedder.id, dimensions=embedder.dimensions) if use_cache else None
+
+    if EMBEDDER_BACKEND == 'local':
+        # CPU-bound and quota-free: the limiter never waits
+        backend, limiter = LocalBatchEmbedder(embedder), AdaptiveRateLimiter(float('inf'), float('inf'))
+    else:
+        backend = OpenAIBatchEmbedder(get_client(), model=embedder.id, dimensions=embedder.dimensions)
+        limiter = AdaptiveRateLimiter()
+
+    engine = IngestionEngine(
+        backend=backend,
+        write_fn=write_batch,
+        limiter=limiter,
+        max_workers=MAX_WORKERS,
+        cache=cache
+    )
+    with tqdm(total=len(plan.to_embed), desc="Embedding Documents") as progress:
+        stats = engine.run(iter_document_batches(), progress=progress.update)
+
+    print(f"\n📈 {stats.report()}")
+    if cache is not None:
+        print(f"🗄️ Embedding cache: {cache.stats.report()}")
+        cache.close()
+    failed = sum(len(batch_records.pop(batch_index, ())) for batch_index in stats.failed_batches)
+    print(f"🔎 Sync result: inserted={sum(inserted)} failed={failed} removed={plan.removed_count} "
+          f"(planned {len(plan.to_embed)})")
+    refresh_indexes(rebuild=full_rebuild)
+
+    if stats.failed_batches:
+        print(f"⚠️ {len(stats.failed_batches)} batches failed permanently: {sorted(stats.failed_batches)}")
+        print("Re-run ingestion to retry them (they are not in the manifest yet).")
+        return plan
 
     print("\n\nSUCCESS! Knowledge Base populated safely.")
-    
-    # Force logs to send before closing
-    opik.flush_tracker()
+    return plan
 
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sync the NCERT CSVs into the GS1 LanceDB table.")
+    parser.add_argument("--full", action="store_true", help="Drop the table and rebuild it (from cache where possible)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the local embedding cache")
+    args = parser.parse_args()
+    main(full_rebuild=args.full, use_cache=not args.no_cache)
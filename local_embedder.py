@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from agno.knowledge.embedder.base import Embedder
+
+
+# --- Configuration (env overrides) ---
+LOCAL_MODEL_PATH = os.getenv("VYUHA_LOCAL_EMBEDDER_PATH", "./models/bge-small-en-v1.5")
+MODEL_FILE = "onnx/model.onnx"
+QUANTIZED_MODEL_FILE = "onnx/model_int8.onnx"
+MAX_LENGTH = 512                # tokens per text (BERT-style position limit)
+BATCH_SIZE = 32                 # texts per ONNX run, for both ingestion and query micro-batches
+MAX_WAIT_MS = 4.0               # how long a query waits for others to share its batch
+QUERY_WORKERS = 2               # batches in flight at once (each runs on the intra-op thread pool)
+INTRA_OP_THREADS = int(os.getenv("VYUHA_LOCAL_EMBEDDER_THREADS", "0"))   # 0 = onnxruntime default (all cores)
+# 'int8' (QUANTIZED_MODEL_FILE) or 'fp32'; part of the embedder id and table name, as the vectors differ
+QUANTIZATION = os.getenv("VYUHA_LOCAL_EMBEDDER_QUANT", "int8")
+
+
+def quantize_model(model_path: str = LOCAL_MODEL_PATH) -> str:
+    """Writes a dynamic int8 copy of the model (weights int8, activations quantised per batch)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    source, target = os.path.join(model_path, MODEL_FILE), os.path.join(model_path, QUANTIZED_MODEL_FILE)
+    quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+    return target
+
+
+class OnnxEncoder:
+    """Tokenizer + ONNX Runtime session for a sentence-embedding model exported from Hugging Face.
+
+    Expects `tokenizer.json` and `onnx/model.onnx` (optionally `onnx/model_int8.onnx`) under
+    `model_path`. Pools token states (mean or CLS) and L2-normalises, like sentence-transformers.
+    """
+
+    def __init__(self, model_path: str, quantized: bool = True, pooling: str = "mean",
+                 max_length: int = MAX_LENGTH, threads: int = INTRA_OP_THREADS):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("The local embedder needs `pip install onnxruntime tokenizers`") from e
+
+        model_file = os.path.join(model_path, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        if not os.path.exists(model_file):
+            hint = " (run `python local_embedder.py --quantize` or set VYUHA_LOCAL_EMBEDDER_QUANT=fp32)" if quantized else ""
+            raise FileNotFoundError(f"{model_file} not found{hint}")
+        self.model_file = model_file
+        self.pooling = pooling
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts: List[str]) -> Tuple[np.ndarray, int]:
+        """Embeddings for one batch (padded to its longest text) and the number of real tokens."""
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        output = self.session.run(None, feeds)[0]
+
+        if output.ndim == 2:            # exported with pooling already applied
+            pooled = output
+        elif self.pooling == "cls":
+            pooled = output[:, 0]
+        else:
+            weights = mask[..., None].astype(output.dtype)
+            pooled = (output * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.where(norms == 0, 1.0, norms)).astype(np.float32), int(mask.sum())
+
+
+class DynamicBatcher:
+    """Coalesces concurrent single-text requests into micro-batches.
+
+    A lone query runs at once; when others are already queued the batch keeps filling
+    for up to `max_wait_ms`, so under load each ONNX run carries up to `batch_size` texts.
+    """
+
+    def __init__(self, encode, batch_size: int = BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS,
+                 workers: int = QUERY_WORKERS):
+        self.encode = encode
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.items = 0
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        for i in range(workers):
+            threading.Thread(target=self._run, name=f"vyuha-embed-{i}", daemon=True).start()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                # Only wait for stragglers when others are already queued (under load)
+                timeout = deadline - time.monotonic() if len(batch) > 1 else 0
+                try:
+                    batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                vectors, tokens = self.encode([text for text, _ in batch])
+                for i, (_, future) in enumerate(batch):
+                    future.set_result((vectors[i], tokens // len(batch)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+    @property
+    def mean_batch(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+
+@dataclass
+class LocalEmbedder(Embedder):
+    """agno Embedder backed by a local ONNX model on CPU (no network, no rate limits).
+
+    Query embeddings go through a DynamicBatcher; document batches (ingestion, agno
+    `enable_batch`) run directly in length-sorted chunks to minimise padding.
+    """
+
+    model_path: str = LOCAL_MODEL_PATH
+    id: Optional[str] = None
+    dimensions: Optional[int] = None
+    quantized: bool = QUANTIZATION == "int8"
+    pooling: str = "mean"
+    query_prefix: str = ""          # e.g. "Represent this sentence for searching relevant passages: " for bge
+    enable_batch: bool = True
+    batch_size: int = BATCH_SIZE
+    max_wait_ms: float = MAX_WAIT_MS
+    workers: int = QUERY_WORKERS
+    threads: int = INTRA_OP_THREADS
+    _encoder: Optional[OnnxEncoder] = field(default=None, init=False, repr=False)
+    _batcher: Optional[DynamicBatcher] = field(default=None, init=False, repr=False)
+    _lock: Any = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __post_init__(self):
+        # LanceDb needs the dimension at construction, before the model is loaded.
+        # The id keys EmbeddingCache, so int8 and fp32 vectors never share entries.
+        if self.id is None:
+            name = os.path.basename(os.path.normpath(self.model_path))
+            self.id = f"local-{name}-{'int8' if self.quantized else 'fp32'}"
+        if self.dimensions is None:
+            config_path = os.path.join(self.model_path, "config.json")
+            if os.path.exists(config_path):
+                with open(config_path, "r", encoding="utf-8") as f:
+                    self.dimensions = json.load(f).get("hidden_size")
+        if self.dimensions is None:
+            raise ValueError(f"Set LocalEmbedder.dimensions or provide {self.model_path}/config.json")
+
+    @property
+    def encoder(self) -> OnnxEncoder:
+        if self._encoder is None:
+            with self._lock:
+                if self._encoder is None:
+                    self._encoder = OnnxEncoder(self.model_path, quantized=self.quantized, pooling=self.pooling,
+                                                threads=self.threads)
+        return self._encoder
+
+    @property
+    def batcher(self) -> DynamicBatcher:
+        if self._batcher is None:
+            encoder = self.encoder
+            with self._lock:
+                if self._batcher is None:
+                    self._batcher = DynamicBatcher(encoder.encode, self.batch_size, self.max_wait_ms, self.workers)
+        return self._batcher
+
+    def warm(self) -> None:
+        """Loads the model and runs one batch, so the first query does not pay for it."""
+        self.batcher.submit("warm up").result()
+
+    def _truncate(self, vector: np.ndarray) -> List[float]:
+        # Matryoshka-style truncation when a smaller table dimension is configured
+        if len(vector) > self.dimensions:
+            vector = vector[: self.dimensions]
+            vector = vector / (np.linalg.norm(vector) or 1.0)
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> Tuple[List[List[float]], int]:
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        total_tokens = 0
+        for start in range(0, len(order), self.batch_size):
+            chunk = order[start : start + self.batch_size]
+            encoded, tokens = self.encoder.encode([texts[i] for i in chunk])
+            total_tokens += tokens
+            for i, vector in zip(chunk, encoded):
+                vectors[i] = self._truncate(vector)
+        return vectors, total_tokens
+
+    # --- agno Embedder interface ---
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embedding_and_usage(text)[0]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        vector, tokens = self.batcher.submit(self.query_prefix + text).result()
+        return self._truncate(vector), {"total_tokens": tokens}
+
+    def get_embeddings_batch_and_usage(self, texts: List[str]) -> Tuple[List[List[float]], List[Optional[Dict]]]:
+        vectors, tokens = self.embed_documents(texts)
+        return vectors, [{"total_tokens": tokens // max(1, len(texts))}] * len(texts)
+
+    async def async_get_embedding(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.get_embedding, text)
+
+    async def async_get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return await asyncio.to_thread(self.get_embedding_and_usage, text)
+
+    async def async_get_embeddings_batch_and_usage(self, texts: List[str]):
+        return await asyncio.to_thread(self.get_embeddings_batch_and_usage, texts)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prepare the local embedding model.")
+    parser.add_argument("--model-path", default=LOCAL_MODEL_PATH)
+    parser.add_argument("--quantize", action="store_true", help="write the int8 copy next to model.onnx")
+    args = parser.parse_args()
+    if args.quantize:
+        print(f"✅ Quantised model written to {quantize_model(args.model_path)}")
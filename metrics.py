@@ -0,0 +1,231 @@
+import json
+import math
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+# --- Configuration ---
+METRICS_PORT = 9464             # conventional port of Prometheus exporters
+PRECISION = 0.02                # HDR-style: every recorded value is within 2% of its bucket
+MIN_SECONDS = 1e-5
+QUANTILES = (0.5, 0.95, 0.99)
+
+# USD per 1M tokens (input, output); used when the provider reports no cost
+PRICES_PER_MILLION = {
+    "gemini-3-flash-preview": (0.50, 3.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gpt-4o": (2.50, 10.00),
+    "text-embedding-3-large": (0.13, 0.0),
+    "text-embedding-3-small": (0.02, 0.0),
+}
+
+
+class Histogram:
+    """Log-bucketed latency histogram: constant relative error, O(1) record, ~100 live buckets."""
+
+    def __init__(self, precision: float = PRECISION, min_value: float = MIN_SECONDS):
+        self._log_base = math.log1p(precision)
+        self.min_value = min_value
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        index = max(0, int(math.log(max(value, self.min_value) / self.min_value) / self._log_base))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                # geometric midpoint of the bucket, capped by the observed max
+                return min(self.max, self.min_value * math.exp((index + 0.5) * self._log_base))
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        out = {f"p{int(q * 100)}": self.quantile(q) for q in QUANTILES}
+        out.update(count=self.count, mean=self.sum / self.count if self.count else 0.0, max=self.max)
+        return out
+
+
+class MetricsRegistry:
+    """Per-stage latency histograms plus token and cost counters, kept in process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages.setdefault(stage, Histogram()).record(seconds)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed(self, stage: str) -> Callable:
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_usage(self, model: str, input_tokens: int, output_tokens: int, cost: Optional[float] = None) -> None:
+        self.inc("vyuha_tokens_total", input_tokens, model=model, kind="input")
+        self.inc("vyuha_tokens_total", output_tokens, model=model, kind="output")
+        if cost is None and model in PRICES_PER_MILLION:
+            price_in, price_out = PRICES_PER_MILLION[model]
+            cost = (input_tokens * price_in + output_tokens * price_out) / 1e6
+        if cost is not None:
+            self.inc("vyuha_cost_usd_total", cost, model=model)
+
+    # --- Exposition ---
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": {stage: hist.summary() for stage, hist in sorted(self.stages.items())},
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in sorted(self.counters.items())],
+            }
+
+    def to_prometheus(self) -> str:
+        lines = ["# HELP vyuha_stage_seconds Latency per pipeline stage", "# TYPE vyuha_stage_seconds summary"]
+        with self._lock:
+            for stage, hist in sorted(self.stages.items()):
+                for q in QUANTILES:
+                    lines.append(f'vyuha_stage_seconds{{stage="{stage}",quantile="{q}"}} {hist.quantile(q):.6f}')
+                lines.append(f'vyuha_stage_seconds_sum{{stage="{stage}"}} {hist.sum:.6f}')
+                lines.append(f'vyuha_stage_seconds_count{{stage="{stage}"}} {hist.count}')
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{name}{{{label_str}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def report(self) -> str:
+        rows = [f"{'stage':<36} {'count':>6} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8}"]
+        for stage, s in self.to_dict()["stages"].items():
+            rows.append(f"{stage:<36} {s['count']:>6} {s['p50']:>8.3f} {s['p95']:>8.3f} {s['p99']:>8.3f}")
+        return "\n".join(rows)
+
+
+registry = MetricsRegistry()
+
+
+# --- Hooks ---
+
+def tool_timing_hook(function_name: str, function_call: Callable, arguments: Dict[str, Any]):
+    """agno tool hook: times every tool call (knowledge search, DuckDuckGo, member delegation)."""
+    start = time.perf_counter()
+    try:
+        return function_call(**arguments)
+    finally:
+        registry.observe(f"tool.{function_name}", time.perf_counter() - start)
+
+
+def instrument_embedder(embedder, stage: str = "embedding"):
+    """Times an agno embedder's calls in place (single and batch entry points)."""
+    for method in ("get_embedding", "get_embedding_and_usage", "get_embeddings_batch_and_usage"):
+        if hasattr(embedder, method):
+            object.__setattr__(embedder, method, registry.timed(stage)(getattr(embedder, method)))
+    return embedder
+
+
+def _own_usage(run) -> Optional[Tuple[int, int, Optional[float]]]:
+    """(input, output, cost) of the model calls `run` made itself, from its assistant messages.
+
+    None when the run kept no messages.
+    """
+    calls = [m.metrics for m in getattr(run, "messages", None) or []
+             if m.role in ("assistant", "model") and m.metrics is not None and not getattr(m, "from_history", False)]
+    if not calls:
+        return None
+    costs = [c.cost for c in calls if getattr(c, "cost", None) is not None]
+    return (sum(c.input_tokens or 0 for c in calls), sum(c.output_tokens or 0 for c in calls),
+            sum(costs) if costs else None)
+
+
+def record_run_usage(run_output) -> None:
+    """Token/cost counters from a finished Team run and its member runs.
+
+    Every model call is counted once, on the run that made it (its own assistant
+    messages), so usage a Team's `metrics` rolls up from its members is not added
+    twice. A run without messages falls back to its `metrics`, members included.
+    """
+    pending = [run_output]
+    while pending:
+        run = pending.pop()
+        usage = _own_usage(run)
+        if usage is None:
+            metrics = getattr(run, "metrics", None)
+            if metrics is not None:
+                registry.record_usage(getattr(run, "model", None) or "unknown", metrics.input_tokens or 0,
+                                      metrics.output_tokens or 0, getattr(metrics, "cost", None))
+            continue
+        registry.record_usage(getattr(run, "model", None) or "unknown", *usage)
+        pending.extend(getattr(run, "member_responses", None) or [])
+
+
+# --- Local endpoint ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(registry.to_dict()).encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = registry.to_prometheus().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """Serves /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"⚠️ Metrics endpoint not started on :{port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="vyuha-metrics", daemon=True).start()
+    print(f"📊 Metrics at http://{host}:{port}/metrics (JSON: /metrics.json)")
+    return server
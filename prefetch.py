@@ -0,0 +1,155 @@
+import os
+import re
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from hybrid_retrieval import DEFAULT_LIMIT, tokenize
+from metrics import registry
+from word_budget import strip_mark_suffix
+
+
+# --- Configuration (env overrides) ---
+PREFETCH_ENABLED = os.getenv("VYUHA_PREFETCH", "on") != "off"
+FAST_PATH_ENABLED = os.getenv("VYUHA_FAST_PATH", "on") != "off"
+PREFETCH_WORKERS = 4
+# Overlap coefficient (shared terms / terms of the shorter side) between the SME's search
+# and the user's question needed to reuse the prefetch
+REUSE_MIN_OVERLAP = 0.6
+FAST_PATH_MAX_WORDS = 16
+
+_FACTUAL_RE = re.compile(r"^\s*(who|when|where|which|what (is|was|are|were)|name|define|list)\b", re.IGNORECASE)
+# Directive words of analytical Mains questions: these always go through the supervisor
+_ANALYTICAL_RE = re.compile(r"\b(discuss|analy[sz]e|examine|critically|evaluate|assess|elucidate|comment|"
+                            r"compare|contrast|explain why|how far|to what extent|justify)\b", re.IGNORECASE)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="vyuha-prefetch")
+    return _executor
+
+
+def is_simple_factual(question: str) -> bool:
+    """Short who/when/what-is style questions that one SME turn can answer without planning."""
+    text = strip_mark_suffix(question)
+    return (len(text.split()) <= FAST_PATH_MAX_WORDS and bool(_FACTUAL_RE.search(text))
+            and not _ANALYTICAL_RE.search(text))
+
+
+@dataclass
+class PrefetchScope:
+    """Knowledge search for one request's raw question, started before any model call."""
+    question: str
+    terms: Set[str]
+    future: Optional[Future] = None
+    started: float = field(default_factory=time.perf_counter)
+    search_seconds: Optional[float] = None
+    outcome: str = "unused"         # -> hit | miss | error
+    saved_seconds: float = 0.0
+    fast_path: bool = False
+
+    def covers(self, query: str, filters: Optional[Dict[str, Any]]) -> bool:
+        if self.future is None or self.outcome == "hit" or filters:
+            return False
+        terms = set(tokenize(query))
+        return bool(terms) and len(terms & self.terms) / min(len(terms), len(self.terms)) >= REUSE_MIN_OVERLAP
+
+    def take(self, num_documents: Optional[int]) -> List[Dict[str, Any]]:
+        """The prefetched hits; waits if the search is still running."""
+        wait_start = time.perf_counter()
+        docs = self.future.result()
+        waited = time.perf_counter() - wait_start
+        # The SME would have spent the whole search; it only spent the part still in flight
+        self.saved_seconds = max(0.0, (self.search_seconds or 0.0) - waited)
+        self.outcome = "hit"
+        return docs[: num_documents or DEFAULT_LIMIT]
+
+    def report(self) -> str:
+        search = f"{self.search_seconds * 1000:.0f}ms" if self.search_seconds is not None else "n/a"
+        return (f"prefetch={self.outcome} search={search} saved={self.saved_seconds * 1000:.0f}ms "
+                f"fast_path={self.fast_path}")
+
+
+_current: ContextVar[Optional[PrefetchScope]] = ContextVar("vyuha_prefetch", default=None)
+
+
+def _search(retriever, scope: PrefetchScope, query: str) -> List[Dict[str, Any]]:
+    start = time.perf_counter()
+    try:
+        return retriever(query, num_documents=DEFAULT_LIMIT)
+    finally:
+        scope.search_seconds = time.perf_counter() - start
+        registry.observe("prefetch.search", scope.search_seconds)
+
+
+@contextmanager
+def prefetch(question: str, retriever: Optional[Callable[..., List[Dict[str, Any]]]] = None,
+             enabled: Optional[bool] = None) -> Iterator[PrefetchScope]:
+    """Starts the knowledge search (query embedding + hybrid search) for `question` at once.
+
+    The SME's knowledge_retriever (a PrefetchingRetriever) picks the result up from
+    this request-scoped cache instead of searching again after supervisor planning.
+    """
+    query = strip_mark_suffix(question)
+    scope = PrefetchScope(question=query, terms=set(tokenize(query)))
+    if (PREFETCH_ENABLED if enabled is None else enabled) and scope.terms:
+        if retriever is None:
+            from knowledge_gs1 import get_hybrid_retriever
+            retriever = get_hybrid_retriever()
+        scope.future = _pool().submit(_search, retriever, scope, query)
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+        if scope.future is not None:
+            registry.inc("vyuha_prefetch_total", outcome=scope.outcome)
+            if scope.outcome == "hit":
+                registry.observe("prefetch.saved", scope.saved_seconds)
+
+
+class PrefetchingRetriever:
+    """knowledge_retriever that serves a matching search from the request's prefetch.
+
+    Falls through to `retriever` when there is no prefetch, the SME's query is about
+    something else than the question, filters are used, or the prefetch was already used.
+    """
+
+    def __init__(self, retriever: Callable[..., List[Dict[str, Any]]]):
+        self.retriever = retriever
+
+    def __call__(self, query: str, num_documents: Optional[int] = None, filters: Optional[Dict[str, Any]] = None,
+                 **kwargs) -> List[Dict[str, Any]]:
+        scope = _current.get()
+        if scope is not None and scope.covers(query, filters):
+            try:
+                return scope.take(num_documents)
+            except Exception as e:
+                scope.outcome = "error"
+                print(f"⚠️ Prefetched search failed, searching again: {e}")
+        elif scope is not None and scope.future is not None and scope.outcome == "unused":
+            scope.outcome = "miss"
+        return self.retriever(query, num_documents=num_documents, filters=filters, **kwargs)
+
+
+def choose_runner(team, question: str, scope: Optional[PrefetchScope] = None,
+                  enabled: Optional[bool] = None) -> Tuple[Any, bool]:
+    """(runnable, fast_path): the SME member alone for simple factual questions, else the Team."""
+    members = getattr(team, "members", None) or []
+    if (FAST_PATH_ENABLED if enabled is None else enabled) and members and is_simple_factual(question):
+        registry.inc("vyuha_fast_path_total")
+        if scope is not None:
+            scope.fast_path = True
+        return members[0], True
+    return team, False
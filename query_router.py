@@ -0,0 +1,115 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from hybrid_retrieval import tokenize
+
+
+# --- Configuration (env overrides) ---
+MIN_CONFIDENCE = float(os.getenv("VYUHA_ROUTER_CONFIDENCE", "0.99"))   # subject; below this -> global search
+FINE_MIN_CONFIDENCE = 0.999     # finer levels (book): a wrong book costs more recall than it saves time
+ROUTE_FIELDS = ("subject", "source")    # coarse to fine; `topic` is near-unique per row in NCERT
+SMOOTHING = 0.1
+
+
+@dataclass
+class Route:
+    """Metadata filters for one query; empty filters mean a global search."""
+    filters: Dict[str, str] = field(default_factory=dict)
+    confidence: float = 0.0     # posterior of the last level routed (or of the rejected first guess)
+
+    @property
+    def level(self) -> str:
+        return next(reversed(self.filters), "global") if self.filters else "global"
+
+    def report(self) -> str:
+        target = "/".join(self.filters.values()) or "global"
+        return f"route={target} confidence={self.confidence:.2f}"
+
+
+class NaiveBayes:
+    """Multinomial naive Bayes over retrieval tokens, uniform class priors."""
+
+    def __init__(self, texts: Sequence[List[str]], labels: Sequence[str], alpha: float = SMOOTHING):
+        self.classes = sorted(set(labels))
+        class_index = {c: i for i, c in enumerate(self.classes)}
+        self.vocabulary: Dict[str, int] = {}
+        counts: Dict[Tuple[int, int], int] = {}
+        for tokens, label in zip(texts, labels):
+            row = class_index[label]
+            for token in tokens:
+                column = self.vocabulary.setdefault(token, len(self.vocabulary))
+                counts[row, column] = counts.get((row, column), 0) + 1
+
+        matrix = np.full((len(self.classes), len(self.vocabulary)), alpha, dtype=np.float64)
+        if counts:
+            rows, columns = np.array(list(counts.keys())).T
+            matrix[rows, columns] += np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        self.log_likelihood = np.log(matrix / matrix.sum(axis=1, keepdims=True))
+
+    def posterior(self, tokens: List[str]) -> np.ndarray:
+        columns = [self.vocabulary[t] for t in tokens if t in self.vocabulary]
+        if not columns:
+            return np.full(len(self.classes), 1.0 / len(self.classes))
+        scores = self.log_likelihood[:, columns].sum(axis=1)
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+
+class QueryRouter:
+    """Routes a question to the metadata partition its search should run in.
+
+    One classifier per level of `fields`, each trained on the corpus rows of its
+    parent partition: subject first (History / Geography / ...), then the book within
+    that subject. Routing stops at the first level whose top class is below its
+    threshold (`min_confidence` for the first level, `fine_min_confidence` below it);
+    when even the subject is uncertain the route is global.
+    """
+
+    def __init__(self, contents: Sequence[str], metadata: Dict[str, Sequence[str]],
+                 fields: Sequence[str] = ROUTE_FIELDS, min_confidence: float = MIN_CONFIDENCE,
+                 fine_min_confidence: float = FINE_MIN_CONFIDENCE):
+        self.fields = [f for f in fields if f in metadata]
+        self.min_confidence = min_confidence
+        self.fine_min_confidence = fine_min_confidence
+        tokens = [tokenize(text) for text in contents]
+        self._models: Dict[Tuple[Tuple[str, str], ...], Tuple[str, NaiveBayes]] = {}
+        self._only: Dict[Tuple[Tuple[str, str], ...], Tuple[str, str]] = {}    # levels with a single value
+        self._fit(tokens, {f: list(metadata[f]) for f in self.fields}, np.arange(len(tokens)), (), 0)
+
+    def _fit(self, tokens, metadata, rows: np.ndarray, parent: Tuple[Tuple[str, str], ...], depth: int) -> None:
+        if depth == len(self.fields):
+            return
+        name = self.fields[depth]
+        labels = [metadata[name][i] for i in rows]
+        classes = sorted(set(labels))
+        if len(classes) > 1:
+            self._models[parent] = (name, NaiveBayes([tokens[i] for i in rows], labels))
+        elif classes:
+            self._only[parent] = (name, classes[0])
+        for value in classes:
+            child = rows[[label == value for label in labels]]
+            self._fit(tokens, metadata, child, parent + ((name, value),), depth + 1)
+
+    def route(self, query: str) -> Route:
+        tokens = tokenize(query)
+        route, path = Route(), ()
+        while path in self._models or path in self._only:
+            if path in self._only:
+                # Nothing to choose at this level (e.g. one book per subject); the parent filter suffices
+                path += (self._only[path],)
+                continue
+            name, model = self._models[path]
+            probabilities = model.posterior(tokens)
+            best = int(np.argmax(probabilities))
+            if probabilities[best] < (self.fine_min_confidence if route.filters else self.min_confidence):
+                if not route.filters:
+                    route.confidence = float(probabilities[best])
+                break
+            value = model.classes[best]
+            route.filters[name] = value
+            route.confidence = float(probabilities[best])
+            path += ((name, value),)
+        return route
@@ -0,0 +1,441 @@
+import os
+import re
+import json
+import time
+import asyncio
+import base64
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from word_budget import estimate_tokens
+
+
+# --- Configuration (env overrides) ---
+REPLAY_MODE = os.getenv("VYUHA_REPLAY", "off")                  # off | record | replay | synthetic
+CASSETTE_DIR = os.getenv("VYUHA_CASSETTE_DIR", "./cassettes")
+REPLAY_LATENCY = os.getenv("VYUHA_REPLAY_LATENCY", "none")      # none | recorded | synthetic
+SYNTHETIC_TTFT_MS = float(os.getenv("VYUHA_SYNTHETIC_TTFT_MS", "700"))
+SYNTHETIC_TOKENS_PER_S = float(os.getenv("VYUHA_SYNTHETIC_TOKENS_PER_S", "120"))
+SYNTHETIC_PREFILL_TOKENS_PER_S = float(os.getenv("VYUHA_SYNTHETIC_PREFILL_TOKENS_PER_S", "4000"))
+SYNTHETIC_EMBED_MS = float(os.getenv("VYUHA_SYNTHETIC_EMBED_MS", "120"))
+SYNTHETIC_SEARCH_MS = float(os.getenv("VYUHA_SYNTHETIC_SEARCH_MS", "900"))
+SYNTHETIC_ANSWER_WORDS = 180
+SYNTHETIC_DIMENSIONS = 3072
+CHUNK_WORDS = 4                 # words per synthetic stream delta
+
+# External tools whose results are recorded; the knowledge search is ours and always runs for real
+REPLAYED_TOOLS = {"web_search", "search_news", "duckduckgo_search", "duckduckgo_news"}
+# Tool the synthetic model calls first when it is offered, in order
+SYNTHETIC_TOOL_PLAN = ("delegate_task_to_member", "search_knowledge_base")
+
+_MEMBER_ID_RE = re.compile(r"ID: (\S+)")
+
+
+class CassetteMiss(KeyError):
+    """A replay-mode request that was never recorded."""
+
+
+def _encode(value: Any) -> Any:
+    # Gemini thought signatures are bytes; keep them round-trippable for partial re-recording
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    return str(value)
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if set(obj) == {"__bytes__"}:
+        return base64.b64decode(obj["__bytes__"])
+    return obj
+
+
+def request_key(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """JSONL file of recorded request -> response entries, loaded once and appended on record."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line, object_hook=_decode)
+                        self.entries[entry["key"]] = entry
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        entry = dict(entry, key=key)
+        line = json.dumps(entry, ensure_ascii=False, default=_encode)
+        with self._lock:
+            self.entries[key] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+@dataclass
+class ReplayConfig:
+    mode: str = REPLAY_MODE
+    cassette_dir: str = CASSETTE_DIR
+    latency: str = REPLAY_LATENCY
+    ttft_ms: float = SYNTHETIC_TTFT_MS
+    tokens_per_s: float = SYNTHETIC_TOKENS_PER_S
+    prefill_tokens_per_s: float = SYNTHETIC_PREFILL_TOKENS_PER_S
+    embed_ms: float = SYNTHETIC_EMBED_MS
+    search_ms: float = SYNTHETIC_SEARCH_MS
+    answer_words: int = SYNTHETIC_ANSWER_WORDS
+
+
+@dataclass
+class ReplayStats:
+    hits: Dict[str, int] = field(default_factory=dict)
+    recorded: Dict[str, int] = field(default_factory=dict)
+    synthetic: Dict[str, int] = field(default_factory=dict)
+    simulated_seconds: float = 0.0      # provider latency injected by replay, excluded from "our" overhead
+
+    def count(self, bucket: Dict[str, int], kind: str) -> None:
+        bucket[kind] = bucket.get(kind, 0) + 1
+
+    def report(self) -> str:
+        return (f"hits={self.hits} recorded={self.recorded} synthetic={self.synthetic} "
+                f"simulated={self.simulated_seconds:.2f}s")
+
+
+# --- Synthetic responses ---
+
+def _message_text(message) -> str:
+    content = getattr(message, "content", None)
+    return content if isinstance(content, str) else json.dumps(content, default=str) if content else ""
+
+
+def synthetic_embedding(text: str, dimensions: int = SYNTHETIC_DIMENSIONS) -> List[float]:
+    """Deterministic unit vector per text (same text -> same vector across runs)."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def synthetic_tool_result(function_name: str, arguments: Dict[str, Any]) -> str:
+    query = str(arguments.get("query") or arguments.get("keywords") or "")
+    return json.dumps([
+        {"title": f"Synthetic result {i + 1} for {query}", "href": f"https://example.org/{i + 1}",
+         "body": f"Offline stand-in for {function_name}; no network call was made."}
+        for i in range(int(arguments.get("max_results") or 5))
+    ])
+
+
+def synthetic_model_turn(messages: List[Any], tools: Optional[List[Dict[str, Any]]],
+                         answer_words: int) -> Dict[str, Any]:
+    """One scripted model turn: call the next pipeline tool once, then answer from the tool output.
+
+    Drives supervisor -> SME (delegation) -> knowledge search -> answer without a provider.
+    """
+    offered = {tool.get("function", {}).get("name") for tool in tools or [] if isinstance(tool, dict)}
+    last = messages[-1] if messages else None
+    prompt = _message_text(last)
+    input_tokens = sum(estimate_tokens(_message_text(m)) for m in messages)
+
+    if last is not None and last.role == "user":
+        for name in SYNTHETIC_TOOL_PLAN:
+            if name not in offered:
+                continue
+            if name == "delegate_task_to_member":
+                system = next((_message_text(m) for m in messages if m.role == "system"), "")
+                match = _MEMBER_ID_RE.search(system)
+                arguments = {"member_id": match.group(1) if match else "", "task": prompt}
+            else:
+                arguments = {"query": prompt[:200]}
+            call_id = "call_" + request_key(name, arguments)[:12]
+            return {"tool_calls": [{"id": call_id, "type": "function",
+                                    "function": {"name": name, "arguments": json.dumps(arguments)}}],
+                    "input_tokens": input_tokens, "output_tokens": 20}
+
+    # Answer built from the words the pipeline actually retrieved, so rendering/counting see real text
+    source = " ".join(_message_text(m) for m in messages if m.role == "tool") or prompt
+    words = re.findall(r"[A-Za-z][A-Za-z'-]+", source) or ["answer"]
+    text = " ".join(words[i % len(words)] for i in range(answer_words))
+    return {"content": text, "input_tokens": input_tokens, "output_tokens": estimate_tokens(text)}
+
+
+class Replayer:
+    """Record/replay (or synthesize) the model, embedder and web-search calls of the pipeline.
+
+    Models and embedders are patched per instance, the same way metrics.instrument_embedder
+    times them; web search is intercepted with an agno tool hook. Everything in between
+    (retrieval, orchestration, caching, rendering) runs for real.
+    """
+
+    def __init__(self, config: Optional[ReplayConfig] = None):
+        self.config = config or ReplayConfig()
+        if self.config.mode not in ("record", "replay", "synthetic"):
+            raise ValueError(f"Unknown replay mode: {self.config.mode}")
+        self.stats = ReplayStats()
+        self._stats_lock = threading.Lock()
+        self.cassettes = {kind: Cassette(os.path.join(self.config.cassette_dir, f"{kind}.jsonl"))
+                          for kind in ("model", "embedder", "tools")}
+
+    # --- Shared plumbing ---
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+            with self._stats_lock:
+                self.stats.simulated_seconds += seconds
+
+    def _lookup(self, kind: str, key: str, live: Callable[[], Any], synthetic: Callable[[], Any],
+                to_entry: Callable[[Any, float], Dict[str, Any]]):
+        """Returns (entry, source) where source is 'hit', 'recorded' or 'synthetic'."""
+        entry = self.cassettes[kind].get(key)
+        if entry is not None:
+            source = "hit"
+        elif self.config.mode == "record":
+            start = time.perf_counter()
+            result = live()
+            entry = to_entry(result, time.perf_counter() - start)
+            self.cassettes[kind].put(key, entry)
+            source = "recorded"
+        elif self.config.mode == "synthetic":
+            entry, source = synthetic(), "synthetic"
+        else:
+            raise CassetteMiss(f"No recorded {kind} response for key {key[:12]} in {self.config.cassette_dir}")
+        with self._stats_lock:
+            self.stats.count({"hit": self.stats.hits, "recorded": self.stats.recorded,
+                              "synthetic": self.stats.synthetic}[source], kind)
+        return entry, source
+
+    def _replay_delay(self, entry: Dict[str, Any], synthetic_seconds: float) -> float:
+        if self.config.latency == "recorded":
+            return entry.get("latency_s", 0.0)
+        if self.config.latency == "synthetic":
+            return synthetic_seconds
+        return 0.0
+
+    # --- Models ---
+
+    def _model_key(self, model, kwargs: Dict[str, Any], stream: bool) -> str:
+        messages = [
+            (m.role, _message_text(m), [(c.get("function") or {}).get("name") for c in (m.tool_calls or [])])
+            for m in kwargs.get("messages") or []
+        ]
+        tools = sorted((t.get("function") or {}).get("name", "") for t in kwargs.get("tools") or []
+                       if isinstance(t, dict))
+        return request_key(model.id, messages, tools, str(kwargs.get("response_format")), stream)
+
+    def _synthetic_model_entry(self, kwargs: Dict[str, Any], stream: bool) -> Dict[str, Any]:
+        turn = synthetic_model_turn(kwargs.get("messages") or [], kwargs.get("tools"), self.config.answer_words)
+        usage = {"input_tokens": turn["input_tokens"], "output_tokens": turn["output_tokens"],
+                 "total_tokens": turn["input_tokens"] + turn["output_tokens"]}
+        if "tool_calls" in turn:
+            responses = [{"role": "assistant", "tool_calls": turn["tool_calls"], "response_usage": usage}]
+        elif stream:
+            words = turn["content"].split(" ")
+            responses = [{"role": "assistant", "content": " ".join(words[i:i + CHUNK_WORDS]) + " "}
+                         for i in range(0, len(words), CHUNK_WORDS)]
+            responses[-1]["response_usage"] = usage
+        else:
+            responses = [{"role": "assistant", "content": turn["content"], "response_usage": usage}]
+        return {"responses": responses, "input_tokens": turn["input_tokens"], "output_tokens": turn["output_tokens"]}
+
+    def _synthetic_model_seconds(self, entry: Dict[str, Any]) -> List[float]:
+        """Per-response delays: time to first token (grows with the prompt), then decode time for each later delta."""
+        responses = entry["responses"]
+        per_token = 1.0 / self.config.tokens_per_s
+        delays = [self.config.ttft_ms / 1000 + entry.get("input_tokens", 0) / self.config.prefill_tokens_per_s]
+        for response in responses[1:]:
+            delays.append(estimate_tokens(str(response.get("content") or "")) * per_token)
+        if len(responses) == 1:
+            delays[0] += entry.get("output_tokens", 0) * per_token
+        return delays
+
+    def _delays(self, entry: Dict[str, Any]) -> List[float]:
+        if self.config.latency == "recorded" and entry.get("offsets"):
+            offsets = entry["offsets"]
+            return [offsets[0]] + [b - a for a, b in zip(offsets, offsets[1:])]
+        if self.config.latency == "recorded":
+            return [entry.get("latency_s", 0.0)] + [0.0] * (len(entry["responses"]) - 1)
+        if self.config.latency == "synthetic":
+            return self._synthetic_model_seconds(entry)
+        return [0.0] * len(entry["responses"])
+
+    def wrap_model(self, model):
+        from agno.models.response import ModelResponse
+
+        original_invoke, original_stream = model.invoke, model.invoke_stream
+
+        def invoke(**kwargs):
+            def live():
+                return original_invoke(**kwargs)
+
+            def to_entry(response, seconds):
+                return {"model": model.id, "responses": [response.to_dict()], "latency_s": seconds}
+
+            entry, _ = self._lookup("model", self._model_key(model, kwargs, False), live,
+                                    lambda: self._synthetic_model_entry(kwargs, False), to_entry)
+            self._sleep(sum(self._delays(entry)))
+            return ModelResponse.from_dict(dict(entry["responses"][0]))
+
+        def invoke_stream(**kwargs) -> Iterator[Any]:
+            key = self._model_key(model, kwargs, True)
+            entry = self.cassettes["model"].get(key)
+            if entry is None and self.config.mode == "record":
+                # Pass the live stream through while recording chunk timings
+                start, responses, offsets = time.perf_counter(), [], []
+                for response in original_stream(**kwargs):
+                    responses.append(response.to_dict())
+                    offsets.append(time.perf_counter() - start)
+                    yield response
+                self.cassettes["model"].put(key, {"model": model.id, "responses": responses,
+                                                  "offsets": offsets, "latency_s": offsets[-1] if offsets else 0.0})
+                with self._stats_lock:
+                    self.stats.count(self.stats.recorded, "model")
+                return
+            entry, _ = self._lookup("model", key, lambda: None,
+                                    lambda: self._synthetic_model_entry(kwargs, True), lambda r, s: {})
+            for response, delay in zip(entry["responses"], self._delays(entry)):
+                self._sleep(delay)
+                yield ModelResponse.from_dict(dict(response))
+
+        object.__setattr__(model, "invoke", invoke)
+        object.__setattr__(model, "invoke_stream", invoke_stream)
+        # The pipeline runs synchronously; async entry points are left to the provider
+        return model
+
+    # --- Embedders ---
+
+    def wrap_embedder(self, embedder):
+        dimensions = getattr(embedder, "dimensions", None) or SYNTHETIC_DIMENSIONS
+        original = embedder.get_embedding_and_usage
+        original_batch = getattr(embedder, "get_embeddings_batch_and_usage", None)
+        original_async_batch = getattr(embedder, "async_get_embeddings_batch_and_usage", None)
+
+        def key_of(text: str) -> str:
+            return request_key(getattr(embedder, "id", ""), dimensions, text)
+
+        def to_entry(result, seconds):
+            vector, usage = result
+            packed = base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+            return {"vector": packed, "usage": usage, "latency_s": seconds}
+
+        def from_entry(entry):
+            self._sleep(self._replay_delay(entry, self.config.embed_ms / 1000))
+            vector = np.frombuffer(base64.b64decode(entry["vector"]), dtype=np.float32)
+            return vector.tolist(), entry.get("usage")
+
+        def embed(text: str):
+            def synthetic():
+                vector = np.asarray(synthetic_embedding(text, dimensions), dtype=np.float32)
+                return {"vector": base64.b64encode(vector.tobytes()).decode("ascii"), "usage": None}
+
+            entry, _ = self._lookup("embedder", key_of(text), lambda: original(text), synthetic, to_entry)
+            return from_entry(entry)
+
+        def unrecorded(texts) -> List[str]:
+            if self.config.mode != "record":
+                return []
+            return [text for text in dict.fromkeys(texts) if self.cassettes["embedder"].get(key_of(text)) is None]
+
+        def record(texts, result, seconds) -> Dict[str, Dict[str, Any]]:
+            """Stores one live batch call per text; its latency is split evenly across the texts."""
+            entries = {}
+            for text, vector, usage in zip(texts, *result):
+                if not len(vector):
+                    continue    # agno's per-text fallback failed too; embed() retries it on its own
+                entries[text] = to_entry((vector, usage), seconds / len(texts))
+                self.cassettes["embedder"].put(key_of(text), entries[text])
+                with self._stats_lock:
+                    self.stats.count(self.stats.recorded, "embedder")
+            return entries
+
+        def batch_result(texts, entries):
+            pairs = [from_entry(entries[text]) if text in entries else embed(text) for text in texts]
+            return [vector for vector, _ in pairs], [usage for _, usage in pairs]
+
+        def get_embeddings_batch_and_usage(texts):
+            missing, entries = unrecorded(texts), {}
+            if missing and original_batch is not None:
+                # One live batch call for every text not in the cassette yet
+                start = time.perf_counter()
+                entries = record(missing, original_batch(missing), time.perf_counter() - start)
+            return batch_result(texts, entries)
+
+        async def async_get_embeddings_batch_and_usage(texts):
+            missing, entries = unrecorded(texts), {}
+            if missing:
+                start = time.perf_counter()
+                entries = record(missing, await original_async_batch(missing), time.perf_counter() - start)
+            return await asyncio.to_thread(batch_result, texts, entries)
+
+        object.__setattr__(embedder, "get_embedding_and_usage", embed)
+        object.__setattr__(embedder, "get_embedding", lambda text: embed(text)[0])
+        object.__setattr__(embedder, "get_embeddings_batch_and_usage", get_embeddings_batch_and_usage)
+        if original_async_batch is not None:
+            object.__setattr__(embedder, "async_get_embeddings_batch_and_usage", async_get_embeddings_batch_and_usage)
+        return embedder
+
+    # --- Tools ---
+
+    def tool_hook(self, function_name: str, function_call: Callable, arguments: Dict[str, Any]):
+        """agno tool hook: serves DuckDuckGo results from the cassette; other tools run normally."""
+        if function_name not in REPLAYED_TOOLS:
+            return function_call(**arguments)
+        key = request_key(function_name, arguments)
+        entry, _ = self._lookup(
+            "tools", key, lambda: function_call(**arguments),
+            lambda: {"result": synthetic_tool_result(function_name, arguments)},
+            lambda result, seconds: {"tool": function_name, "result": result, "latency_s": seconds},
+        )
+        self._sleep(self._replay_delay(entry, self.config.search_ms / 1000))
+        return entry["result"]
+
+
+# --- Process-wide switch (VYUHA_REPLAY) ---
+
+_replayer: Optional[Replayer] = None
+_replayer_lock = threading.Lock()
+
+
+def get_replayer() -> Optional[Replayer]:
+    """The env-configured Replayer, or None when replay is off (the default)."""
+    global _replayer
+    if REPLAY_MODE == "off" and _replayer is None:
+        return None
+    with _replayer_lock:
+        if _replayer is None:
+            _replayer = Replayer()
+        return _replayer
+
+
+def configure(config: ReplayConfig) -> Replayer:
+    """Installs an explicit Replayer (benchmarks), overriding the env settings."""
+    global _replayer
+    with _replayer_lock:
+        _replayer = Replayer(config)
+        return _replayer
+
+
+def wrap_model(model):
+    replayer = get_replayer()
+    return replayer.wrap_model(model) if replayer else model
+
+
+def wrap_embedder(embedder):
+    replayer = get_replayer()
+    return replayer.wrap_embedder(embedder) if replayer else embedder
+
+
+def tool_hooks() -> List[Callable]:
+    replayer = get_replayer()
+    return [replayer.tool_hook] if replayer else []
@@ -0,0 +1,206 @@
+"""Answers a whole mock test (CSV or JSONL of questions) through the supervisor team.
+
+Input rows follow llm_as_judge_ds.csv: an `input` column with the question (mark suffix
+included, e.g. "(15 Marks)") and optionally `reference`; other columns are kept.
+Questions run concurrently (`--concurrency` Teams, at most `--rpm` starts a minute),
+each answer is appended to `--out` as soon as it finishes, and questions that already
+have an answer there are skipped, so an interrupted run resumes where it stopped.
+
+Usage:
+    python run_test_series.py mock_test_07.csv --out test_results/mock_test_07.jsonl --concurrency 4
+    VYUHA_REPLAY=synthetic python run_test_series.py llm_as_judge_ds.csv --out /tmp/dry_run.jsonl   # offline
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from eval_runner import ResultsStore, item_id
+from word_budget import BudgetEnforcer, WordBudget, count_words
+
+load_dotenv()
+
+
+# --- Configuration ---
+RESULTS_DIR = './test_results'
+CONCURRENCY = 4         # Teams answering at once
+REQUESTS_PER_MINUTE = 30    # question starts per minute (each start fans out into several model calls)
+
+
+def load_questions(path: str) -> List[Dict[str, Any]]:
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        try:
+            df = pd.read_csv(path, encoding="utf-8")
+        except UnicodeDecodeError:
+            df = pd.read_csv(path, encoding="latin1")   # llm_as_judge_ds.csv is latin1
+        df.columns = df.columns.astype(str)
+        rows = df.fillna("").astype(str).to_dict(orient="records")
+    rows = [row for row in rows if str(row.get("input", "")).strip()]
+    if not rows:
+        raise ValueError(f"No questions with an `input` column in {path}")
+    return rows
+
+
+class AsyncRateLimiter:
+    """Async token bucket: `per_minute` starts a minute, up to `burst` at once after a pause."""
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        self.rate = per_minute / 60.0
+        self.capacity = float(max(1, burst))
+        self.available = self.capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Waits for a start; waiters are served in arrival order. Returns the seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        async with self._lock:
+            now = time.monotonic()
+            self.available = min(self.capacity, self.available + (now - self._last) * self.rate)
+            self._last = now
+            wait = max(0.0, (1.0 - self.available) / self.rate)
+            if wait:
+                await asyncio.sleep(wait)
+                self.available, self._last = 1.0, time.monotonic()
+            self.available -= 1.0
+            return wait
+
+
+def answer_question(pool, item: Dict[str, Any]) -> Dict[str, Any]:
+    """One question, answered exactly like the app: word budget enforced, context prefetched and packed."""
+    from context_packing import packing_budget
+    from metrics import record_run_usage
+    from prefetch import choose_runner, prefetch
+    from streaming import StreamStats, iter_answer_deltas
+
+    question = str(item["input"])
+    budget = WordBudget.for_question(question)
+    enforcer = BudgetEnforcer(budget)
+    stats = StreamStats()
+    with prefetch(question) as scope, pool.lease() as team, packing_budget(budget.marks) as packing:
+        runner, _ = choose_runner(team, question, scope)
+        deltas = iter_answer_deltas(runner, question + budget.instruction(), stats=stats)
+        for delta in deltas:
+            enforcer.feed(delta)
+            if enforcer.exhausted:
+                deltas.close()
+                stats.finished = time.perf_counter()
+                break
+    result = enforcer.finish()
+    metrics = getattr(stats.run_output, "metrics", None)
+    if stats.run_output is not None:
+        record_run_usage(stats.run_output)
+    return {
+        "output": enforcer.text,
+        "marks": budget.marks,
+        "word_limit": budget.limit,
+        "word_count": count_words(enforcer.text),
+        "within_budget": budget.within(count_words(enforcer.text)),
+        "stopped_early": result.stopped_early,
+        "ttft_s": round(stats.ttft, 3) if stats.ttft is not None else None,
+        # A run closed at the word budget has no final metrics; fall back to the streamed estimate
+        "input_tokens": getattr(metrics, "input_tokens", None),
+        "output_tokens": getattr(metrics, "output_tokens", None) or result.tokens_generated,
+        "context_tokens_saved": packing.tokens_saved,
+        "prefetch": scope.outcome,
+        "fast_path": scope.fast_path,
+    }
+
+
+async def run_series(items: List[Dict[str, Any]], store: ResultsStore, concurrency: int, rpm: float) -> Dict[str, Any]:
+    from agent import get_supervisor_team
+    from agent_pool import AgentPool
+    from knowledge_gs1 import get_hybrid_retriever
+
+    def done(item):
+        record = store.get(item_id(item))
+        return record is not None and not record.get("error")
+
+    pending = [item for item in items if not done(item)]
+    skipped = len(items) - len(pending)
+    if skipped:
+        print(f"⏭️ Skipping {skipped} questions already answered in {store.path}")
+    if not pending:
+        return {"answered": 0, "errors": 0, "skipped": skipped, "wall_seconds": 0.0}
+
+    def build_team():
+        team = get_supervisor_team()
+        for member in [team, *team.members]:
+            member.debug_mode = False      # per-question debug logs would drown the progress lines
+        return team
+
+    pool = await asyncio.to_thread(
+        AgentPool(build_team, size=min(concurrency, len(pending)), max_size=concurrency,
+                  warmers=[lambda: get_hybrid_retriever().warm()]).boot)
+    slots = asyncio.Semaphore(concurrency)
+    limiter = AsyncRateLimiter(rpm, burst=concurrency)
+    finished = {"answered": 0, "errors": 0}
+    start = time.perf_counter()
+
+    async def one(item: Dict[str, Any]) -> None:
+        async with slots:
+            await limiter.acquire()
+            record = dict(item, id=item_id(item))
+            began = time.perf_counter()
+            try:
+                record.update(await asyncio.to_thread(answer_question, pool, item))
+                record["error"] = None
+            except Exception as e:
+                record.update(output="", word_count=0, error=f"{type(e).__name__}: {e}")
+            record["latency_s"] = round(time.perf_counter() - began, 3)
+            store.save(record)
+        finished["errors" if record["error"] else "answered"] += 1
+        count = finished["answered"] + finished["errors"]
+        status = f"❌ {record['error']}" if record["error"] else \
+            f"✅ {record['latency_s']:.1f}s {record['word_count']}/{record['word_limit']} words"
+        print(f"[{count}/{len(pending)}] {status} | {str(item['input'])[:60]}")
+
+    await asyncio.gather(*(one(item) for item in pending))
+    return dict(finished, skipped=skipped, wall_seconds=time.perf_counter() - start)
+
+
+def report(items: List[Dict[str, Any]], store: ResultsStore, run: Dict[str, Any]) -> str:
+    records = [store.get(item_id(item)) for item in items]
+    answered = [r for r in records if r is not None and not r.get("error")]
+    latencies = np.array([r["latency_s"] for r in answered]) if answered else np.zeros(1)
+    wall = run["wall_seconds"]
+    lines = [
+        f"questions={len(items)} answered_now={run['answered']} errors={run['errors']} skipped={run['skipped']} "
+        f"wall={wall:.1f}s",
+        f"throughput {run['answered'] / wall * 60 if wall else 0.0:.1f} questions/min",
+        f"latency p50={np.percentile(latencies, 50):.1f}s p95={np.percentile(latencies, 95):.1f}s "
+        f"max={latencies.max():.1f}s",
+        f"tokens in={sum(r.get('input_tokens') or 0 for r in answered)} "
+        f"out={sum(r.get('output_tokens') or 0 for r in answered)}",
+        f"within word limit {sum(bool(r.get('within_budget')) for r in answered)}/{len(answered)}",
+    ]
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", help="CSV or JSONL with an `input` column")
+    parser.add_argument("--out", help=f"results JSONL (default: {RESULTS_DIR}/<questions name>.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE, help="question starts per minute")
+    args = parser.parse_args()
+
+    items = load_questions(args.questions)
+    out = args.out or os.path.join(RESULTS_DIR, os.path.splitext(os.path.basename(args.questions))[0] + ".jsonl")
+    store = ResultsStore(out)
+    run = asyncio.run(run_series(items, store, max(1, args.concurrency), args.rpm))
+    print(f"\n📝 Results: {out}\n{report(items, store, run)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import os
+import json
+import math
+import time
+import asyncio
+import threading
+from contextlib import aclosing, asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from aiohttp import web
+
+from context_packing import packing_budget
+from metrics import registry
+from prefetch import choose_runner, prefetch
+from streaming import StreamStats, iter_answer_deltas
+
+
+# --- Configuration (env overrides) ---
+SERVICE_HOST = os.getenv("VYUHA_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("VYUHA_SERVICE_PORT", "8765"))
+SERVICE_URL = os.getenv("VYUHA_SERVICE_URL")                         # set -> app.py streams from the service
+MAX_CONCURRENCY = int(os.getenv("VYUHA_MAX_CONCURRENCY", "4"))      # Team runs at once (provider quota)
+MAX_PER_USER = int(os.getenv("VYUHA_MAX_PER_USER", "1"))            # queued + running per user
+MAX_QUEUE = int(os.getenv("VYUHA_MAX_QUEUE", "16"))                 # waiting for a slot before shedding
+QUEUE_TIMEOUT = float(os.getenv("VYUHA_QUEUE_TIMEOUT", "30"))       # seconds in the queue before shedding
+CLIENT_TIMEOUT = 300.0                                              # whole-answer read timeout for clients
+
+
+class ServiceBusy(Exception):
+    """Request shed before it started: per-user limit, full queue or queue timeout."""
+
+    STATUS = {"user_limit": 429, "queue_full": 503, "queue_timeout": 503}
+
+    def __init__(self, reason: str, retry_after: int = 1):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def status(self) -> int:
+        return self.STATUS.get(self.reason, 503)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"error": "busy", "reason": self.reason, "retry_after": self.retry_after}
+
+
+@dataclass
+class ServiceStats:
+    accepted: int = 0
+    completed: int = 0
+    cancelled: int = 0
+    errors: int = 0
+    shed: Dict[str, int] = field(default_factory=dict)
+    run_seconds: float = 0.0
+
+    @property
+    def mean_run(self) -> float:
+        finished = self.completed + self.cancelled + self.errors
+        return self.run_seconds / finished if finished else 0.0
+
+    def report(self) -> str:
+        shed = " ".join(f"{reason}={count}" for reason, count in sorted(self.shed.items())) or "0"
+        return (f"accepted={self.accepted} completed={self.completed} cancelled={self.cancelled} "
+                f"errors={self.errors} shed[{shed}] mean_run={self.mean_run:.2f}s")
+
+
+class AnswerService:
+    """Admission control and cancellation around blocking Team runs.
+
+    Runs are admitted FIFO into `max_concurrency` slots. A request is shed at once
+    when its user already has `max_per_user` requests in flight or `max_queue`
+    requests are already waiting, and after `queue_timeout` seconds in the queue.
+    Each admitted run executes on its own worker thread with a pooled Team; when the
+    consumer stops reading, the run is closed at its next event and the slot is
+    only freed once it has actually stopped.
+    """
+
+    def __init__(self, pool, max_concurrency: int = MAX_CONCURRENCY, max_per_user: int = MAX_PER_USER,
+                 max_queue: int = MAX_QUEUE, queue_timeout: float = QUEUE_TIMEOUT,
+                 stream: Callable[..., Iterator[str]] = iter_answer_deltas):
+        self.pool = pool
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.stream = stream
+        self.stats = ServiceStats()
+        self.waiting = 0
+        self.running = 0
+        self._per_user: Dict[str, int] = {}
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="vyuha-run")
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: queue ahead x mean run time / slots."""
+        mean = self.stats.mean_run or 5.0
+        return max(1, math.ceil(mean * (self.waiting + 1) / self.max_concurrency))
+
+    def _shed(self, reason: str) -> ServiceBusy:
+        self.stats.shed[reason] = self.stats.shed.get(reason, 0) + 1
+        registry.inc("vyuha_requests_shed_total", reason=reason)
+        return ServiceBusy(reason, self.retry_after())
+
+    @asynccontextmanager
+    async def admit(self, user: str) -> AsyncIterator[None]:
+        if self._per_user.get(user, 0) >= self.max_per_user:
+            raise self._shed("user_limit")
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            raise self._shed("queue_full")
+
+        self._per_user[user] = self._per_user.get(user, 0) + 1
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._shed("queue_timeout") from None
+            finally:
+                self.waiting -= 1
+            registry.observe("service.queue_wait", time.perf_counter() - start)
+            self.stats.accepted += 1
+            self.running += 1
+            try:
+                yield
+            finally:
+                self.running -= 1
+                self._slots.release()
+        finally:
+            self._per_user[user] -= 1
+            if not self._per_user[user]:
+                del self._per_user[user]
+
+    async def run(self, prompt: str, marks: Optional[int] = None, session_id: Optional[str] = None,
+                  stats: Optional[StreamStats] = None, question: Optional[str] = None) -> AsyncIterator[str]:
+        """Answer deltas of one admitted request, produced on a worker thread.
+
+        `prompt` is the message sent to the model (question + budget instruction +
+        history); `question` is the student's raw question, which prefetch and the
+        fast-path choice look at. It defaults to `prompt`.
+        """
+        loop = asyncio.get_running_loop()
+        deltas: asyncio.Queue = asyncio.Queue()
+        cancel = threading.Event()
+        done = object()
+        kwargs = {"session_id": session_id} if session_id else {}
+        question = question or prompt
+
+        def produce() -> None:
+            try:
+                with prefetch(question) as scope, self.pool.lease() as team, packing_budget(marks):
+                    runner, _ = choose_runner(team, question, scope)
+                    for delta in self.stream(runner, prompt, stats, cancel=cancel, **kwargs):
+                        loop.call_soon_threadsafe(deltas.put_nowait, delta)
+                        if cancel.is_set():
+                            break
+                loop.call_soon_threadsafe(deltas.put_nowait, done)
+            except BaseException as e:
+                loop.call_soon_threadsafe(deltas.put_nowait, e)
+
+        start = time.perf_counter()
+        worker = loop.run_in_executor(self._executor, produce)
+        outcome = "cancelled"
+        try:
+            while True:
+                item = await deltas.get()
+                if item is done:
+                    outcome = "completed"
+                    return
+                if isinstance(item, BaseException):
+                    outcome = "errors"
+                    raise item
+                yield item
+        finally:
+            cancel.set()
+            # Keep the slot until the run has really stopped, so provider concurrency stays capped
+            await asyncio.shield(worker)
+            setattr(self.stats, outcome, getattr(self.stats, outcome) + 1)
+            self.stats.run_seconds += time.perf_counter() - start
+            registry.inc("vyuha_requests_total", status=outcome)
+            registry.observe("service.run", time.perf_counter() - start)
+
+    def health(self) -> Dict[str, Any]:
+        return {"running": self.running, "waiting": self.waiting, "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue, "stats": self.stats.report()}
+
+
+# --- HTTP (NDJSON streaming) ---
+
+async def _write(response: web.StreamResponse, payload: Dict[str, Any]) -> None:
+    await response.write((json.dumps(payload) + "\n").encode("utf-8"))
+
+
+def create_app(service: AnswerService) -> web.Application:
+    """POST /answer {"prompt", "question", "marks", "user", "session_id"} -> NDJSON start/delta/done lines.
+
+    Shed requests get 429 (per-user limit) or 503 (queue) with a Retry-After header
+    before any streaming starts.
+    """
+
+    async def answer(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        prompt = str(body.get("prompt") or "").strip()
+        if not prompt:
+            return web.json_response({"error": "empty prompt"}, status=400)
+        user = str(body.get("user") or request.remote or "anonymous")
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        stats = StreamStats()
+        try:
+            async with service.admit(user):
+                await response.prepare(request)
+                await _write(response, {"type": "start", "queued_ms": round((time.perf_counter() - stats.started) * 1000, 1)})
+                # aclosing: the run is stopped before admit() frees its slot, even on a reset
+                question = str(body.get("question") or "").strip() or None
+                async with aclosing(service.run(prompt, body.get("marks"), body.get("session_id"), stats,
+                                                question=question)) as deltas:
+                    async for delta in deltas:
+                        await _write(response, {"type": "delta", "text": delta})
+                await _write(response, {"type": "done", "ttft_ms": stats.ttft and round(stats.ttft * 1000, 1),
+                                        "total_ms": stats.total and round(stats.total * 1000, 1)})
+        except ServiceBusy as busy:
+            return web.json_response(busy.to_dict(), status=busy.status, headers={"Retry-After": str(busy.retry_after)})
+        except ConnectionResetError:
+            pass        # client went away mid-stream; run() has already closed the Team run
+        except Exception as e:
+            if not response.prepared:
+                return web.json_response({"error": str(e)}, status=500)
+            await _write(response, {"type": "error", "error": str(e)})
+        return response
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response(service.health())
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(text=registry.to_prometheus(), content_type="text/plain")
+
+    app = web.Application()
+    app.router.add_post("/answer", answer)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+async def start_service(service: AnswerService, host: str = SERVICE_HOST, port: int = SERVICE_PORT) -> web.AppRunner:
+    # handler_cancellation: a disconnect cancels the handler even while it waits for the model
+    runner = web.AppRunner(create_app(service), handler_cancellation=True)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+# --- Client (Streamlit runs synchronously, so this uses httpx's blocking stream) ---
+
+def iter_service_deltas(prompt: str, marks: Optional[int] = None, user: Optional[str] = None,
+                        session_id: Optional[str] = None, stats: Optional[StreamStats] = None,
+                        url: Optional[str] = None, question: Optional[str] = None) -> Iterator[str]:
+    """Same contract as streaming.iter_answer_deltas, served by the answer service.
+
+    `question` is the raw question behind the decorated `prompt`; the service uses it
+    for the speculative search and the fast path instead of the whole message.
+    Raises ServiceBusy when the request is shed. Closing the generator closes the
+    connection, which cancels the run on the server.
+    """
+    import httpx
+
+    payload = {"prompt": prompt, "question": question, "marks": marks, "user": user, "session_id": session_id}
+    with httpx.stream("POST", f"{(url or SERVICE_URL).rstrip('/')}/answer", json=payload,
+                      timeout=httpx.Timeout(CLIENT_TIMEOUT, connect=5.0)) as response:
+        if response.status_code in (429, 503):
+            response.read()
+            body = response.json()
+            raise ServiceBusy(body.get("reason", "busy"), int(body.get("retry_after", 1)))
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["type"] == "delta":
+                if stats is not None:
+                    if stats.first_token is None:
+                        stats.first_token = time.perf_counter()
+                    stats.chunks += 1
+                yield event["text"]
+            elif event["type"] == "error":
+                raise RuntimeError(event["error"])
+    if stats is not None:
+        stats.finished = time.perf_counter()
+
+
+async def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT) -> None:
+    from agent import get_supervisor_team
+    from agent_pool import AgentPool
+    from knowledge_gs1 import get_hybrid_retriever
+
+    pool = await asyncio.to_thread(
+        AgentPool(get_supervisor_team, size=MAX_CONCURRENCY, max_size=MAX_CONCURRENCY,
+                  warmers=[lambda: get_hybrid_retriever().warm()]).boot)
+    service = AnswerService(pool)
+    runner = await start_service(service, host, port)
+    print(f"✅ Answer service on http://{host}:{port} (slots={MAX_CONCURRENCY}, queue={MAX_QUEUE}, "
+          f"per-user={MAX_PER_USER})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
@@ -0,0 +1,117 @@
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Union
+
+from agno.run.agent import RunEvent, RunOutput
+from agno.run.team import TeamRunEvent, TeamRunOutput
+
+
+# --- Configuration ---
+FLUSH_INTERVAL = 0.08   # seconds between UI re-renders (~12 fps) however fast tokens arrive
+
+
+@dataclass
+class StreamStats:
+    started: float = field(default_factory=time.perf_counter)
+    first_token: Optional[float] = None
+    finished: Optional[float] = None
+    chunks: int = 0
+    flushes: int = 0
+    run_output: Optional[Union[TeamRunOutput, RunOutput]] = None   # final run (tokens, member runs) when not cut short
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Seconds from submitting the prompt to the first answer token."""
+        return None if self.first_token is None else self.first_token - self.started
+
+    @property
+    def total(self) -> Optional[float]:
+        return None if self.finished is None else self.finished - self.started
+
+    def report(self) -> str:
+        ttft = f"{self.ttft:.2f}s" if self.ttft is not None else "n/a"
+        total = f"{self.total:.2f}s" if self.total is not None else "n/a"
+        return f"ttft={ttft} total={total} chunks={self.chunks} renders={self.flushes}"
+
+
+def iter_answer_deltas(team, prompt: str, stats: Optional[StreamStats] = None,
+                       cancel: Optional[threading.Event] = None, **kwargs) -> Iterator[str]:
+    """Streams the Team's final-answer text as it is generated.
+
+    Member (SME) events and tool events are skipped; only the supervisor's own
+    content deltas reach the UI. A single Agent (the fast path) streams its own
+    content. Setting `cancel` closes the run at the next event of any kind, so a
+    client that went away does not wait for the answer's first token.
+    """
+    is_team = hasattr(team, "members")
+    content_event = TeamRunEvent.run_content.value if is_team else RunEvent.run_content.value
+    error_event = TeamRunEvent.run_error.value if is_team else RunEvent.run_error.value
+    events = team.run(prompt, stream=True, yield_run_output=True, **kwargs)
+    for event in events:
+        if cancel is not None and cancel.is_set():
+            events.close()
+            return
+        if isinstance(event, (TeamRunOutput, RunOutput)):
+            if stats is not None:
+                stats.run_output = event
+            continue
+        name = getattr(event, "event", None)
+        if name == content_event:
+            content = getattr(event, "content", None)
+            if isinstance(content, str) and content:
+                if stats is not None:
+                    if stats.first_token is None:
+                        stats.first_token = time.perf_counter()
+                    stats.chunks += 1
+                yield content
+        elif name == error_event:
+            raise RuntimeError(getattr(event, "content", None) or "Team run failed")
+    if stats is not None:
+        stats.finished = time.perf_counter()
+
+
+class ThrottledRenderer:
+    """Buffers streamed deltas and calls `render(text, final)` at most every `interval` seconds.
+
+    Streamlit can only replace a placeholder's markdown, so each render is O(len(text));
+    throttling keeps the total cost proportional to answer length x render rate rather
+    than answer length x number of tokens.
+    """
+
+    def __init__(self, render: Callable[[str, bool], None], interval: float = FLUSH_INTERVAL,
+                 stats: Optional[StreamStats] = None):
+        self.render = render
+        self.interval = interval
+        self.stats = stats
+        self._parts: List[str] = []
+        self._last_flush = 0.0
+        self._dirty = False
+
+    @property
+    def text(self) -> str:
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def feed(self, delta: str) -> None:
+        self._parts.append(delta)
+        self._dirty = True
+        now = time.perf_counter()
+        if now - self._last_flush >= self.interval:
+            self._last_flush = now
+            self.flush()
+
+    def replace(self, text: str) -> None:
+        """Swaps the buffered text (e.g. after a word-budget cut) and renders it."""
+        self._parts = [text]
+        self._dirty = True
+        self.flush()
+
+    def flush(self, final: bool = False) -> None:
+        if not self._dirty and not final:
+            return
+        self.render(self.text, final)
+        self._dirty = False
+        if self.stats is not None:
+            self.stats.flushes += 1
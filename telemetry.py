@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import queue
+import zlib
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from opentelemetry import trace as trace_api
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult, SpanProcessor
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import StatusCode
+
+
+# --- Configuration (env overrides) ---
+OPIK_OTLP_ENDPOINT = "https://www.opik.ai/api/v1/otlp/v1/traces"
+TRACE_EXPORTER = os.getenv("VYUHA_TRACE_EXPORTER", "auto")          # auto | opik | otlp | file | none
+TRACE_FILE = os.getenv("VYUHA_TRACE_FILE", "./traces/spans.jsonl")
+HEAD_SAMPLE_RATIO = float(os.getenv("VYUHA_TRACE_HEAD_RATIO", "1.0"))    # decided at span start, cheapest
+TAIL_SAMPLE_RATIO = float(os.getenv("VYUHA_TRACE_TAIL_RATIO", "0.25"))   # share of ordinary traces kept
+SLOW_TRACE_MS = float(os.getenv("VYUHA_TRACE_SLOW_MS", "8000"))          # slower traces are always kept
+MAX_QUEUE_SIZE = 2048           # spans waiting for export; newest spans are dropped beyond this
+MAX_EXPORT_BATCH = 256
+EXPORT_INTERVAL = 2.0           # seconds between background flushes
+MAX_PENDING_TRACES = 512        # traces buffered for the tail decision
+
+
+@dataclass
+class TelemetryStats:
+    spans: int = 0
+    traces_kept: int = 0
+    traces_sampled_out: int = 0
+    kept_errors: int = 0
+    kept_slow: int = 0
+    dropped_queue_full: int = 0
+    dropped_buffer_full: int = 0
+    exported: int = 0
+    export_failures: int = 0
+
+    def report(self) -> str:
+        return (f"spans={self.spans} kept={self.traces_kept} (errors={self.kept_errors} slow={self.kept_slow}) "
+                f"sampled_out={self.traces_sampled_out} exported={self.exported} "
+                f"dropped={self.dropped_queue_full + self.dropped_buffer_full} export_failures={self.export_failures}")
+
+
+class JsonlFileSpanExporter(SpanExporter):
+    """Local fallback: one compact OTel-JSON span per line, readable offline and in tests."""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(json.dumps(json.loads(span.to_json(indent=None))) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+class BoundedBatchProcessor(SpanProcessor):
+    """Exports finished spans from a background thread in batches.
+
+    The request thread only does a non-blocking `put`; when the bounded queue is full
+    the span is dropped and counted rather than slowing the user down.
+    """
+
+    def __init__(self, exporter: SpanExporter, stats: TelemetryStats, max_queue_size: int = MAX_QUEUE_SIZE,
+                 max_batch: int = MAX_EXPORT_BATCH, interval: float = EXPORT_INTERVAL):
+        self.exporter = exporter
+        self.stats = stats
+        self.max_batch = max_batch
+        self.interval = interval
+        self._queue: "queue.Queue[ReadableSpan]" = queue.Queue(maxsize=max_queue_size)
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._worker = threading.Thread(target=self._run, name="vyuha-span-export", daemon=True)
+        self._worker.start()
+
+    def on_start(self, span, parent_context=None) -> None:
+        pass
+
+    def on_end(self, span: ReadableSpan) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.stats.dropped_queue_full += 1
+            return
+        if self._queue.qsize() >= self.max_batch:
+            self._wake.set()
+
+    def _drain(self) -> None:
+        while True:
+            batch: List[ReadableSpan] = []
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            try:
+                result = self.exporter.export(batch)
+            except Exception:
+                result = SpanExportResult.FAILURE
+            if result == SpanExportResult.SUCCESS:
+                self.stats.exported += len(batch)
+            else:
+                self.stats.export_failures += len(batch)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._idle.clear()
+            self._drain()
+            self._idle.set()
+        self._drain()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        deadline = time.monotonic() + timeout_millis / 1000
+        while time.monotonic() < deadline:
+            if self._queue.empty() and self._idle.is_set():
+                return True
+            self._wake.set()
+            time.sleep(0.01)
+        return False
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        self._worker.join(timeout=5)
+        self.exporter.shutdown()
+
+
+class TailSamplingProcessor(SpanProcessor):
+    """Buffers spans per trace and decides when the root span ends.
+
+    Every trace with an error span and every trace slower than `slow_ms` is kept;
+    the rest are kept with probability `ratio` (deterministic per trace id).
+    """
+
+    def __init__(self, downstream: SpanProcessor, stats: TelemetryStats, ratio: float = TAIL_SAMPLE_RATIO,
+                 slow_ms: float = SLOW_TRACE_MS, max_pending: int = MAX_PENDING_TRACES):
+        self.downstream = downstream
+        self.stats = stats
+        self.ratio = ratio
+        self.slow_ms = slow_ms
+        self.max_pending = max_pending
+        self._pending: Dict[int, List[ReadableSpan]] = {}
+        self._lock = threading.Lock()
+
+    def on_start(self, span, parent_context=None) -> None:
+        pass
+
+    def _keep_by_ratio(self, trace_id: int) -> bool:
+        return (zlib.crc32(trace_id.to_bytes(16, "big")) % 10_000) < self.ratio * 10_000
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id
+        with self._lock:
+            self.stats.spans += 1
+            spans = self._pending.setdefault(trace_id, [])
+            spans.append(span)
+            if span.parent is not None and not span.parent.is_remote:
+                if len(self._pending) > self.max_pending:
+                    oldest = next(iter(self._pending))
+                    self.stats.dropped_buffer_full += len(self._pending.pop(oldest))
+                return
+            spans = self._pending.pop(trace_id)
+
+        error = any(s.status.status_code == StatusCode.ERROR for s in spans)
+        duration_ms = (span.end_time - span.start_time) / 1e6 if span.end_time and span.start_time else 0.0
+        slow = duration_ms >= self.slow_ms
+        if error or slow or self._keep_by_ratio(trace_id):
+            self.stats.traces_kept += 1
+            self.stats.kept_errors += int(error)
+            self.stats.kept_slow += int(slow and not error)
+            for s in spans:
+                self.downstream.on_end(s)
+        else:
+            self.stats.traces_sampled_out += 1
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.downstream.force_flush(timeout_millis)
+
+    def shutdown(self) -> None:
+        self.downstream.shutdown()
+
+
+def build_exporter(kind: str = TRACE_EXPORTER, file_path: str = TRACE_FILE) -> Optional[SpanExporter]:
+    """auto -> Opik cloud when keys exist, else an OTLP collector if configured, else the local file."""
+    if kind == "auto":
+        if os.getenv("OPIK_API_KEY"):
+            kind = "opik"
+        elif os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") or os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT"):
+            kind = "otlp"
+        else:
+            kind = "file"
+
+    if kind == "none":
+        return None
+    if kind == "file":
+        return JsonlFileSpanExporter(file_path)
+
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    if kind == "opik":
+        return OTLPSpanExporter(endpoint=OPIK_OTLP_ENDPOINT, headers={
+            "opik-api-key": os.getenv("OPIK_API_KEY"),
+            "opik-workspace": os.getenv("OPIK_WORKSPACE"),
+        })
+    if kind == "otlp":
+        return OTLPSpanExporter()    # endpoint/headers from the standard OTEL_EXPORTER_OTLP_* env vars
+    raise ValueError(f"Unknown trace exporter: {kind}")
+
+
+@dataclass
+class Telemetry:
+    provider: TracerProvider
+    stats: TelemetryStats
+    exporter: str
+
+
+def create_provider(exporter: Optional[SpanExporter], stats: TelemetryStats, head_ratio: float = HEAD_SAMPLE_RATIO,
+                    tail_ratio: float = TAIL_SAMPLE_RATIO, slow_ms: float = SLOW_TRACE_MS,
+                    **batch_kwargs) -> TracerProvider:
+    provider = TracerProvider(
+        sampler=ParentBased(TraceIdRatioBased(head_ratio)),
+        resource=Resource.create({"service.name": "vyuha-ai"}),
+    )
+    if exporter is not None:
+        batcher = BoundedBatchProcessor(exporter, stats, **batch_kwargs)
+        processor = batcher if tail_ratio >= 1.0 else TailSamplingProcessor(batcher, stats, tail_ratio, slow_ms)
+        provider.add_span_processor(processor)
+    return provider
+
+
+def setup_telemetry(kind: str = TRACE_EXPORTER, instrument_agno: bool = True) -> Telemetry:
+    """Installs the global tracer provider once per process and instruments agno."""
+    current = trace_api.get_tracer_provider()
+    if isinstance(current, TracerProvider) and hasattr(current, "vyuha_telemetry"):
+        return current.vyuha_telemetry
+
+    stats = TelemetryStats()
+    exporter = build_exporter(kind)
+    provider = create_provider(exporter, stats)
+    telemetry = Telemetry(provider=provider, stats=stats, exporter=type(exporter).__name__ if exporter else "none")
+    provider.vyuha_telemetry = telemetry
+    trace_api.set_tracer_provider(provider)
+
+    if instrument_agno:
+        from openinference.instrumentation.agno import AgnoInstrumentor
+        AgnoInstrumentor().instrument(tracer_provider=provider)
+    return telemetry
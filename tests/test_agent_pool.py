@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from agent_pool import AgentPool, PoolExhausted
+
+
+class Factory:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.built = 0
+
+    def __call__(self):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("build failed")
+        self.built += 1
+        return object()
+
+
+def test_failed_build_gives_its_slot_back():
+    pool = AgentPool(Factory(failures=1), size=1, max_size=1)
+    with pytest.raises(RuntimeError):
+        with pool.lease(timeout=0.1):
+            pass
+    assert pool._created == 0
+
+    with pool.lease(timeout=0.1) as instance:
+        assert instance is not None
+    assert pool._created == 1
+
+
+def test_boot_skips_failed_builds():
+    pool = AgentPool(Factory(failures=1), size=2, max_size=2).boot()
+    assert pool.idle == 1
+    assert pool._created == 1
+    assert pool.stats.builds == 1
+
+
+def test_boot_warms_instances_before_they_are_leased():
+    class Model:
+        clients = 0
+
+        def get_client(self):
+            Model.clients += 1
+
+    class Team:
+        def __init__(self):
+            self.model = Model()
+            self.members = [type("Member", (), {"model": Model()})()]
+
+    pool = AgentPool(Team, size=2, max_size=2).boot()
+    assert pool.idle == 2
+    assert Model.clients == 4
+
+
+def test_lease_raises_pool_exhausted_when_every_instance_is_busy():
+    pool = AgentPool(Factory(), size=1, max_size=1).boot()
+    with pool.lease(timeout=0.1):
+        with pytest.raises(PoolExhausted):
+            with pool.lease(timeout=0.05):
+                pass
+    assert pool.idle == 1
+    assert pool.stats.waits == 1
+
+
+def test_instance_returns_to_the_pool_for_a_waiting_lease():
+    pool = AgentPool(Factory(), size=1, max_size=1).boot()
+    leased = []
+
+    def wait_for_lease():
+        with pool.lease(timeout=5) as instance:
+            leased.append(instance)
+
+    with pool.lease() as first:
+        waiter = threading.Thread(target=wait_for_lease)
+        waiter.start()
+    waiter.join(timeout=5)
+    assert leased == [first]
+    assert pool.stats.builds == 1
@@ -0,0 +1,27 @@
+from context_packing import pack
+
+QA = ("SUBJECT: History | BOOK: Themes in Indian History\n"
+      "Q: Who founded the Maurya empire?\nA: Chandragupta Maurya founded it around 321 BCE.")
+EXP = ("SUBJECT: History | BOOK: Themes in Indian History\n"
+       "EXP: Ashoka ruled the Maurya empire after Bindusara. He issued edicts on dhamma. "
+       "Monsoon winds shaped Indian Ocean trade.")
+
+
+def test_repeated_hits_are_packed_once():
+    packed = pack("Maurya empire founder", [QA, QA], budget=500)
+    assert packed == [QA, ""]
+
+
+def test_overlap_with_earlier_searches_is_removed():
+    seen = []
+    assert pack("Maurya empire founder", [QA], budget=500, seen=seen) == [QA]
+    assert pack("Maurya empire founder", [QA], budget=500, seen=seen) == [""]
+
+
+def test_budget_keeps_the_most_relevant_sentences():
+    packed = pack("Ashoka edicts dhamma", [EXP], budget=25)
+    assert packed == ["SUBJECT: History | BOOK: Themes in Indian History\nEXP: He issued edicts on dhamma."]
+
+
+def test_hit_that_does_not_fit_is_dropped():
+    assert pack("Maurya empire founder", [QA], budget=5) == [""]
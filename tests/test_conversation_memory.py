@@ -0,0 +1,28 @@
+from conversation_memory import ConversationMemory, Turn
+
+
+def test_turn_has_no_empty_property():
+    assert not hasattr(Turn("q", "a"), "empty")
+
+
+def test_memory_empty_until_a_turn_is_added():
+    memory = ConversationMemory()
+    assert memory.empty
+    assert memory.context() == ""
+
+    memory.add("What is dhamma? (10 Marks)", "Ashoka's moral code.")
+    assert not memory.empty
+    assert "What is dhamma?" in memory.context()
+
+    memory.clear()
+    assert memory.empty
+
+
+def test_old_turns_fold_into_the_summary():
+    memory = ConversationMemory(window_turns=1)
+    memory.add("First question", "First answer. More detail.")
+    memory.add("Second question", "Second answer.")
+
+    assert [t.question for t in memory.recent] == ["Second question"]
+    assert list(memory.summary) == ["- Q: First question -> First answer."]
+    assert memory.stats.folded == 1
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache
+
+DIMENSIONS = 4
+
+
+@pytest.fixture
+def cache(tmp_path):
+    # float16 rows of 4 components: 8 bytes each, so 10 slots
+    cache = EmbeddingCache("test-model", DIMENSIONS, root=str(tmp_path), max_bytes=8 * 10)
+    yield cache
+    cache.close()
+
+
+def vectors(start, stop):
+    return {f"h{i}": [i / 100, 0.5, -0.25, 1.0] for i in range(start, stop)}
+
+
+def test_round_trip_is_float16_accurate(cache):
+    items = vectors(0, 3)
+    cache.put_many(items)
+    found = cache.get_many(list(items) + ["missing"])
+
+    assert set(found) == set(items)
+    for key, vector in items.items():
+        np.testing.assert_allclose(found[key], vector, atol=1e-3)
+    assert (cache.stats.hits, cache.stats.misses) == (3, 1)
+
+
+def test_persists_across_instances(tmp_path):
+    items = vectors(0, 2)
+    first = EmbeddingCache("test-model", DIMENSIONS, root=str(tmp_path))
+    first.put_many(items)
+    first.close()
+
+    second = EmbeddingCache("test-model", DIMENSIONS, root=str(tmp_path))
+    assert set(second.get_many(items)) == set(items)
+    assert len(second) == 2
+    second.close()
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.put_many(vectors(0, 10))
+    cache.get_many([f"h{i}" for i in range(5)])       # h0-h4 become the most recently used
+    cache.put_many(vectors(10, 15))
+
+    found = cache.get_many(list(vectors(0, 15)))
+    assert set(found) == {f"h{i}" for i in list(range(5)) + list(range(10, 15))}
+    assert cache.stats.evictions == 5
+    assert len(cache) == 10
+
+
+def test_batch_larger_than_the_cache_is_capped(cache):
+    cache.put_many(vectors(0, 25))
+
+    assert len(cache) == cache.max_slots == 10
+    assert len(cache.get_many(list(vectors(0, 25)))) == 10
+
+
+def test_rejects_vectors_of_the_wrong_dimension(cache):
+    with pytest.raises(ValueError):
+        cache.put_many({"h0": [0.0] * (DIMENSIONS + 1)})
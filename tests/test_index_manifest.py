@@ -0,0 +1,56 @@
+from index_manifest import IndexManifest
+
+
+def record(source, key, content_hash):
+    return {"key": key, "content_hash": content_hash, "metadata": {"source": source}}
+
+
+def test_plan_diffs_added_changed_removed_and_unchanged(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.json"), table_name="GS1")
+    manifest.record("a.csv", "1", "h1", "row-1")
+    manifest.record("a.csv", "2", "h2", "row-2")
+    manifest.record("b.csv", "1", "h3", "row-3")
+
+    records = [record("a.csv", "1", "h1"), record("a.csv", "2", "h2-new"), record("c.csv", "1", "h4")]
+    plan = manifest.plan(records)
+
+    assert (plan.added, plan.changed, plan.unchanged) == (1, 1, 1)
+    assert plan.to_embed == {("a.csv", "2"), ("c.csv", "1")}
+    assert plan.replaced_row_ids == {("a.csv", "2"): "row-2"}
+    assert plan.removed == {"b.csv": ["1"]}
+    assert plan.removed_count == 1
+    assert [r["key"] for r in plan.pending(records)] == ["2", "1"]
+
+
+def test_forget_and_row_ids(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.json"), table_name="GS1")
+    manifest.record("a.csv", "1", "h1", "row-1")
+    manifest.record("a.csv", "2", "h2", "row-2")
+
+    assert manifest.row_ids("a.csv", ["2", "missing"]) == ["row-2"]
+    manifest.forget("a.csv", ["1", "2"])
+    assert len(manifest) == 0
+    assert "a.csv" not in manifest.sources
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "nested" / "manifest.json")
+    manifest = IndexManifest(path, table_name="GS1")
+    manifest.record("a.csv", "1", "h1", "row-1")
+    manifest.save()
+
+    loaded = IndexManifest.load(path, table_name="GS1")
+    assert loaded.exists
+    assert loaded.sources == manifest.sources
+    assert loaded.plan([record("a.csv", "1", "h1")]).to_embed == set()
+
+
+def test_manifest_of_another_table_is_ignored(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = IndexManifest(path, table_name="GS1")
+    manifest.record("a.csv", "1", "h1", "row-1")
+    manifest.save()
+
+    loaded = IndexManifest.load(path, table_name="GS1_local_int8")
+    assert not loaded.exists
+    assert len(loaded) == 0
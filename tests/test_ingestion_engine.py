@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ingestion_engine import AdaptiveRateLimiter, EmbeddingResult, IngestionEngine, RateLimitedError
+
+
+class FlakyBackend:
+    """Fails with the queued errors first, then embeds; texts containing 'poison' always fail."""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        if any("poison" in t for t in texts):
+            raise ConnectionError("poisoned batch")
+        if self.errors:
+            raise self.errors.pop(0)
+        return EmbeddingResult(embeddings=[[float(len(t))] * 4 for t in texts], total_tokens=len(texts))
+
+
+def make_engine(backend, written, **kwargs):
+    def write_fn(batch_index, documents):
+        written[batch_index] = [doc.embedding for doc in documents]
+
+    # Unlimited quota and no backoff, so retries run without sleeping
+    kwargs.setdefault("base_backoff", 0.0)
+    return IngestionEngine(backend, write_fn, limiter=AdaptiveRateLimiter(float("inf"), float("inf")),
+                           max_workers=2, **kwargs)
+
+
+def docs(*contents):
+    return [SimpleNamespace(content=c, embedding=None) for c in contents]
+
+
+def test_retries_rate_limits_and_transient_errors():
+    backend = FlakyBackend([RateLimitedError("429", retry_after=0.0), ConnectionError("reset")])
+    written = {}
+    stats = make_engine(backend, written, max_retries=3).run([docs("alpha", "beta")])
+
+    assert backend.calls == 3
+    assert stats.retries == 2
+    assert stats.rate_limited == 1
+    assert stats.failed_batches == []
+    assert written == {0: [[5.0] * 4, [4.0] * 4]}
+
+
+def test_failed_batches_are_recorded_not_written():
+    written = {}
+    stats = make_engine(FlakyBackend(), written, max_retries=1).run(
+        [docs("one"), docs("poison pill", "two"), docs("three")])
+
+    assert stats.failed_batches == [1]
+    assert sorted(written) == [0, 2]
+    assert stats.docs == 2
+    assert stats.batches == 2
+    assert stats.retries == 2       # every failed attempt of the poisoned batch
+
+
+def test_gives_up_after_max_retries():
+    backend = FlakyBackend([RateLimitedError("429", retry_after=0.0)] * 5)
+    stats = make_engine(backend, {}, max_retries=2).run([docs("alpha")])
+
+    assert backend.calls == 3
+    assert stats.rate_limited == 3
+    assert stats.failed_batches == [0]
+
+
+@pytest.mark.parametrize("attempt", range(6))
+def test_backoff_is_capped_full_jitter(attempt):
+    engine = IngestionEngine(FlakyBackend(), lambda *_: None, base_backoff=0.5, max_backoff=4.0)
+    delays = [engine.backoff(attempt) for _ in range(200)]
+    assert 0.0 <= min(delays)
+    assert max(delays) <= min(4.0, 0.5 * 2 ** attempt)
@@ -0,0 +1,21 @@
+from types import SimpleNamespace
+
+from vector_index import TwoStageSearch
+
+
+def fake_vector_db(tables):
+    connection = object()
+
+    def get_table_names(conn):
+        assert conn is connection
+        return list(tables)
+
+    return SimpleNamespace(table_name="GS1", connection=connection, _get_table_names=get_table_names)
+
+
+def test_two_stage_exists_checks_its_own_table():
+    search = TwoStageSearch(fake_vector_db(["GS1"]), dims=256)
+    assert search.table_name == "GS1_d256"
+    assert not search.exists()
+
+    assert TwoStageSearch(fake_vector_db(["GS1", "GS1_d256"]), dims=256).exists()
@@ -0,0 +1,56 @@
+import pytest
+
+from word_budget import BudgetEnforcer, WordBudget, count_words, mark_value, strip_mark_suffix, truncate_to_words
+
+
+def test_count_words_skips_markdown():
+    text = "**Bold** text with [a link](http://x.com/y) ![img](y.png) <br> | cell | - item"
+    assert count_words(text) == 7
+    assert count_words("") == 0
+
+
+def test_truncate_to_words_prefers_a_close_sentence_end():
+    text = " ".join("abcdefghijklmnopqrst") + ". u v"
+    assert truncate_to_words(text, 21) == " ".join("abcdefghijklmnopqrst") + "."
+
+
+def test_truncate_to_words_cuts_mid_sentence_when_the_end_is_too_far_back():
+    text = "One two three four five. Six seven eight nine ten eleven twelve."
+    assert truncate_to_words(text, 6) == "One two three four five. Six"
+    assert truncate_to_words(text, 50) == text
+
+
+@pytest.mark.parametrize("question, marks", [
+    ("Discuss the Mauryan administration. (15 Marks)", 15),
+    ("Explain monsoons 10M", 10),
+    ("Explain monsoons", None),
+])
+def test_mark_value(question, marks):
+    assert mark_value(question) == marks
+
+
+def test_budget_for_question_defaults_to_the_longer_limit():
+    assert WordBudget.for_question("Explain monsoons (10 Marks, 150 words)") == WordBudget(marks=10, limit=150)
+    assert WordBudget.for_question("Explain monsoons").limit == 250
+    assert strip_mark_suffix("Explain monsoons (10 Marks, 150 words)") == "Explain monsoons"
+
+
+def test_enforcer_passes_text_within_budget():
+    enforcer = BudgetEnforcer(WordBudget(marks=10, limit=10), stats=None)
+    assert enforcer.feed("one two three. ") == "one two three. "
+    result = enforcer.finish()
+    assert (result.words, result.stopped_early) == (3, False)
+
+
+def test_enforcer_cuts_at_the_budget_and_drops_the_rest():
+    enforcer = BudgetEnforcer(WordBudget(marks=10, limit=10), stats=None)
+    for i in range(20):
+        enforcer.feed(f"w{i} ")
+    assert enforcer.exhausted
+    assert enforcer.feed("more words") == ""
+    assert count_words(enforcer.text) == 10
+
+    result = enforcer.finish()
+    assert result.stopped_early
+    assert result.words == 10
+    assert 0 < result.tokens_trimmed <= result.tokens_generated
@@ -0,0 +1,297 @@
+import os
+import json
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pyarrow as pa
+
+
+# --- Configuration ---
+# agno's LanceDb queries without a distance type, i.e. L2. OpenAI vectors are unit
+# length, so L2 ranks exactly like cosine and the index must be built with L2 too.
+INDEX_METRIC = 'l2'
+MIN_ROWS_FOR_INDEX = 2000       # below this brute force is faster than probing partitions; the
+                                # deduplicated NCERT corpus (~3.5k rows) must stay above it
+FIRST_PASS_DIMS = 256           # Matryoshka prefix of text-embedding-3 vectors
+FIRST_PASS_MULTIPLIER = 10      # first pass returns limit * 10 candidates for the exact rerank
+COPY_BATCH_ROWS = 2048
+# Metadata columns of the partition table: BITMAP for the few subjects/books, BTREE for topics
+PARTITION_COLUMNS = {'subject': 'BITMAP', 'source': 'BITMAP', 'topic': 'BTREE'}
+
+
+@dataclass
+class IndexConfig:
+    index_type: str = 'IVF_PQ'              # or IVF_HNSW_SQ / IVF_HNSW_PQ / IVF_FLAT
+    num_partitions: Optional[int] = None    # default: ~sqrt(rows)
+    num_sub_vectors: Optional[int] = None   # default: dims / 16 (PQ only)
+    nprobes: int = 20
+    refine_factor: Optional[int] = None     # re-score nprobes results with full vectors
+    m: int = 20                             # HNSW graph degree
+    ef_construction: int = 300
+
+    def label(self) -> str:
+        parts = [self.index_type, f"p={self.num_partitions or 'auto'}"]
+        if 'PQ' in self.index_type:
+            parts.append(f"sv={self.num_sub_vectors or 'auto'}")
+        parts.append(f"nprobes={self.nprobes}")
+        if self.refine_factor:
+            parts.append(f"refine={self.refine_factor}")
+        return " ".join(parts)
+
+
+def table_dir(uri: str, table_name: str) -> str:
+    return os.path.join(uri, f"{table_name}.lance")
+
+
+def index_size_bytes(uri: str, table_name: str) -> int:
+    """Bytes on disk used by the table's indices (vector + scalar)."""
+    root = os.path.join(table_dir(uri, table_name), '_indices')
+    total = 0
+    for folder, _, files in os.walk(root):
+        total += sum(os.path.getsize(os.path.join(folder, f)) for f in files)
+    return total
+
+
+def has_vector_index(table, vector_column: str = 'vector') -> bool:
+    return any(vector_column in index.columns and index.index_type != 'BTree' for index in table.list_indices())
+
+
+def build_vector_index(table, config: IndexConfig, vector_column: str = 'vector') -> float:
+    """(Re)builds the ANN index on `table`. Returns build seconds."""
+    rows = table.count_rows()
+    dims = table.schema.field(vector_column).type.list_size
+    kwargs: Dict[str, Any] = dict(
+        metric=INDEX_METRIC,
+        vector_column_name=vector_column,
+        index_type=config.index_type,
+        num_partitions=config.num_partitions or max(1, int(math.sqrt(rows))),
+        replace=True,
+    )
+    if 'PQ' in config.index_type:
+        kwargs['num_sub_vectors'] = config.num_sub_vectors or max(1, dims // 16)
+    if 'HNSW' in config.index_type:
+        kwargs.update(m=config.m, ef_construction=config.ef_construction)
+
+    start = time.perf_counter()
+    table.create_index(**kwargs)
+    return time.perf_counter() - start
+
+
+def ensure_vector_index(vector_db, config: IndexConfig, rebuild: bool = False) -> Optional[float]:
+    """Managed index step run after ingestion.
+
+    Creates the ANN index once the table is large enough, otherwise folds newly
+    appended rows into the existing index with `optimize()`. Also applies nprobes
+    to the agno LanceDb handle so knowledge searches use the tuned value.
+    """
+    table = vector_db.table
+    if table is None:
+        return None
+    rows = table.count_rows()
+    if rows < MIN_ROWS_FOR_INDEX:
+        print(f"🧭 Skipped the ANN index: {rows} rows < {MIN_ROWS_FOR_INDEX} (brute-force search)")
+        return None
+
+    vector_db.nprobes = config.nprobes
+    if rebuild or not has_vector_index(table):
+        seconds = build_vector_index(table, config)
+        print(f"🧭 Built {config.label()} index in {seconds:.1f}s")
+        return seconds
+
+    table.optimize()
+    return 0.0
+
+
+def fetch_documents(vector_db, ids: List[str]):
+    """agno Documents for row `ids` of the main table, in the order given."""
+    if not ids:
+        return []
+    id_list = ", ".join(f"'{doc_id}'" for doc_id in ids)
+    rows = (vector_db.table.search().where(f"id IN ({id_list})")
+            .select(['id', 'vector', 'payload']).limit(len(ids)).to_pandas())
+    present = set(rows['id'])
+    rows = rows.set_index('id').loc[[i for i in ids if i in present]].reset_index()
+    return vector_db._build_search_results(rows)
+
+
+def _sql_string(value: Any) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def partition_filter(filters: Optional[Dict[str, Any]]) -> Optional[str]:
+    """SQL pre-filter for metadata `filters`, or None when a key has no column in the partition table."""
+    if not filters or any(key not in PARTITION_COLUMNS for key in filters):
+        return None
+    return " AND ".join(f"{key} = {_sql_string(value)}" for key, value in sorted(filters.items()))
+
+
+def create_partition_indexes(table) -> None:
+    for column, index_type in PARTITION_COLUMNS.items():
+        table.create_scalar_index(column, index_type=index_type, replace=True)
+
+
+def _normalise(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+class TwoStageSearch:
+    """Matryoshka first pass over truncated vectors, exact rerank at full dimension.
+
+    The first pass runs on a companion table (`<table>_d256`) holding the first
+    `dims` components of every vector, re-normalised. Its top `limit * multiplier`
+    ids are then re-scored against the full 3072-d vectors. Exposes the same
+    `search(query, limit, filters)` as agno's LanceDb, so HybridRetriever can use it
+    in place of the vector db.
+    """
+
+    def __init__(self, vector_db, dims: int = FIRST_PASS_DIMS, multiplier: int = FIRST_PASS_MULTIPLIER,
+                 index_config: Optional[IndexConfig] = None):
+        self.vector_db = vector_db
+        self.dims = dims
+        self.multiplier = multiplier
+        self.index_config = index_config
+        self.table_name = f"{vector_db.table_name}_d{dims}"
+        self._low_table = None
+
+    @property
+    def low_table(self):
+        if self._low_table is None:
+            self._low_table = self.vector_db.connection.open_table(self.table_name)
+        return self._low_table
+
+    def exists(self) -> bool:
+        return self.table_name in self.vector_db._get_table_names(self.vector_db.connection)
+
+    def build(self) -> int:
+        """Re-derives the truncated table from the main table, streamed batch by batch."""
+        source = self.vector_db.table
+        schema = pa.schema([pa.field('vector', pa.list_(pa.float32(), self.dims)), pa.field('id', pa.string())])
+
+        # Streamed from the main thread: lancedb consumes data iterators on its own event
+        # loop, where the source table's sync API would deadlock.
+        self._low_table = self.vector_db.connection.create_table(self.table_name, schema=schema, mode='overwrite')
+        reader = source.search().select(['vector', 'id']).limit(source.count_rows()).to_batches(batch_size=COPY_BATCH_ROWS)
+        for batch in reader:
+            if batch.num_rows == 0:
+                continue
+            full = batch.column('vector').flatten().to_numpy(zero_copy_only=False).reshape(batch.num_rows, -1)
+            low = _normalise(full[:, : self.dims].astype(np.float32))
+            self._low_table.add(pa.record_batch([
+                pa.FixedSizeListArray.from_arrays(pa.array(low.ravel()), self.dims),
+                batch.column('id'),
+            ], schema=schema))
+
+        # Full-vector fetch by id for the rerank needs a scalar index on the main table
+        source.create_scalar_index('id', replace=True)
+        rows = self._low_table.count_rows()
+        if self.index_config is not None and rows >= MIN_ROWS_FOR_INDEX:
+            build_vector_index(self._low_table, self.index_config)
+        return rows
+
+    def search_ids(self, query_embedding: List[float], limit: int) -> List[str]:
+        full_query = np.asarray(query_embedding, dtype=np.float32)
+        low_query = _normalise(full_query[: self.dims])
+
+        first = self.low_table.search(low_query, vector_column_name='vector').limit(limit * self.multiplier)
+        if self.index_config is not None:
+            first = first.nprobes(self.index_config.nprobes)
+        candidate_ids = first.select(['id']).to_arrow()['id'].to_pylist()
+        if not candidate_ids:
+            return []
+
+        id_list = ", ".join(f"'{doc_id}'" for doc_id in candidate_ids)
+        rows = (self.vector_db.table.search().where(f"id IN ({id_list})")
+                .select(['id', 'vector']).limit(len(candidate_ids)).to_arrow())
+        vectors = rows['vector'].combine_chunks().flatten().to_numpy(zero_copy_only=False).reshape(rows.num_rows, -1)
+        distances = np.linalg.norm(vectors - full_query, axis=1)   # same L2 metric as the index
+        order = np.argsort(distances)[:limit]
+        ids = rows['id'].to_pylist()
+        return [ids[i] for i in order]
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None):
+        if self._low_table is None and not self.exists():
+            # Companion table not built yet -> plain full-dimension search
+            return self.vector_db.search(query=query, limit=limit, filters=filters)
+
+        query_embedding = self.vector_db.embedder.get_embedding(query)
+        if not query_embedding:
+            return []
+        documents = fetch_documents(self.vector_db, self.search_ids(query_embedding, limit))
+        if filters:
+            documents = [doc for doc in documents
+                         if all((doc.meta_data or {}).get(key) == value for key, value in filters.items())]
+        return documents
+
+
+class PartitionedSearch:
+    """Vector search pre-filtered by subject/book/topic on a metadata companion table.
+
+    agno's LanceDb keeps metadata inside the JSON `payload`, so it can only filter the
+    top hits after the search. The companion table (`<table>_meta`) stores each row's
+    vector with `subject`, `source` and `topic` columns under scalar indexes, and
+    searches only the rows matching the filters. Unfiltered searches, and filters on
+    other keys, go to the main table. Same `search(query, limit, filters)` as LanceDb.
+    """
+
+    def __init__(self, vector_db, index_config: Optional[IndexConfig] = None):
+        self.vector_db = vector_db
+        self.index_config = index_config
+        self.table_name = f"{vector_db.table_name}_meta"
+        self._table = None
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = self.vector_db.connection.open_table(self.table_name)
+        return self._table
+
+    def exists(self) -> bool:
+        return self.table_name in self.vector_db._get_table_names(self.vector_db.connection)
+
+    def build(self) -> int:
+        """Re-derives the companion table from the main table, streamed batch by batch."""
+        source = self.vector_db.table
+        dims = source.schema.field('vector').type.list_size
+        schema = pa.schema([pa.field('vector', pa.list_(pa.float32(), dims)), pa.field('id', pa.string())]
+                           + [pa.field(column, pa.string()) for column in PARTITION_COLUMNS])
+
+        # Streamed from the main thread, like TwoStageSearch.build
+        self._table = self.vector_db.connection.create_table(self.table_name, schema=schema, mode='overwrite')
+        reader = (source.search().select(['vector', 'id', 'payload']).limit(source.count_rows())
+                  .to_batches(batch_size=COPY_BATCH_ROWS))
+        for batch in reader:
+            if batch.num_rows == 0:
+                continue
+            metadata = [json.loads(payload).get('meta_data') or {} for payload in batch.column('payload').to_pylist()]
+            self._table.add(pa.record_batch(
+                [batch.column('vector').cast(schema.field('vector').type), batch.column('id')]
+                + [pa.array([str(meta.get(column, '')) for meta in metadata]) for column in PARTITION_COLUMNS],
+                schema=schema))
+
+        create_partition_indexes(self._table)
+        source.create_scalar_index('id', replace=True)     # payload fetch by id
+        rows = self._table.count_rows()
+        if self.index_config is not None and rows >= MIN_ROWS_FOR_INDEX:
+            build_vector_index(self._table, self.index_config)
+        return rows
+
+    def search_ids(self, query_embedding: List[float], limit: int, where: str) -> List[str]:
+        query = (self.table.search(np.asarray(query_embedding, dtype=np.float32), vector_column_name='vector')
+                 .where(where, prefilter=True).limit(limit))
+        if self.index_config is not None:
+            query = query.nprobes(self.index_config.nprobes)
+        return query.select(['id']).to_arrow()['id'].to_pylist()
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None):
+        where = partition_filter(filters)
+        if where is None or (self._table is None and not self.exists()):
+            return self.vector_db.search(query=query, limit=limit, filters=filters)
+
+        query_embedding = self.vector_db.embedder.get_embedding(query)
+        if not query_embedding:
+            return []
+        return fetch_documents(self.vector_db, self.search_ids(query_embedding, limit, where))
@@ -0,0 +1,220 @@
+import os
+import re
+import json
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+
+# --- Configuration ---
+# UPSC Mains mandate: 10-mark questions get 150 words, 15-mark questions 250
+MARK_WORD_LIMITS = {10: 150, 15: 250}
+DEFAULT_MARKS = 15              # questions without a mark suffix get the longer budget
+TOLERANCE = 0.04                # 250 -> 260 words before an answer counts as over the limit
+MIN_SENTENCE_KEEP = 0.85        # cut at a sentence end only if it keeps >= 85% of the budget
+NATURAL_LENGTHS_PATH = './lance_db/answer_lengths.json'
+
+# "15M", "(15 Marks)", "(10 Marks, 150 words)" as used in llm_as_judge_ds.csv
+_MARKS_RE = re.compile(r"\(?\b(10|15)\s*(?:m\b|marks?\b)[^)\n]*\)?", re.IGNORECASE)
+_WORDS_RE = re.compile(r"\b(150|250)\s*words?\b", re.IGNORECASE)
+
+# Markdown that is rendered but never read as words
+_IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_HTML_RE = re.compile(r"<[^>\n]+>")
+_LINK_TARGET_RE = re.compile(r"\]\([^)]*\)")
+_SYMBOL_RE = re.compile(r"[*#|_`>~\[\]]")
+_TOKEN_RE = re.compile(r"\S+")
+_WORDLIKE_RE = re.compile(r"\w")
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s|$)|\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token; the one estimate shared by packing, memory, ingestion and replay."""
+    return len(text) // 4
+
+
+def mark_value(question: str) -> Optional[int]:
+    """10 or 15 from the question's mark/word-limit suffix, None when it has neither."""
+    match = _MARKS_RE.search(question)
+    if match:
+        return int(match.group(1))
+    match = _WORDS_RE.search(question)
+    if match:
+        return 10 if match.group(1) == '150' else 15
+    return None
+
+
+def strip_mark_suffix(question: str) -> str:
+    return _WORDS_RE.sub(" ", _MARKS_RE.sub(" ", question)).strip()
+
+
+def _word_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of every counted word; markup is blanked out in place."""
+    blank = lambda m: " " * len(m.group(0))
+    masked = _IMAGE_RE.sub(blank, text)
+    masked = _HTML_RE.sub(blank, masked)
+    masked = _LINK_TARGET_RE.sub(blank, masked)    # keep the link text, drop the url
+    masked = _SYMBOL_RE.sub(" ", masked)
+    return [m.span() for m in _TOKEN_RE.finditer(masked) if _WORDLIKE_RE.search(m.group(0))]
+
+
+def count_words(text: str) -> int:
+    """Markdown-aware word count shared by the UI and the offline evaluation.
+
+    Images, HTML tags, link targets, bullets, rules and table pipes are not words;
+    link text and bold/italic words are.
+    """
+    return len(_word_spans(text))
+
+
+def truncate_to_words(text: str, limit: int) -> str:
+    """First `limit` words of `text`, ending on a sentence boundary when that loses little."""
+    spans = _word_spans(text)
+    if len(spans) <= limit:
+        return text
+    cut = spans[limit - 1][1]
+    floor = spans[max(0, int(limit * MIN_SENTENCE_KEEP) - 1)][1]
+    ends = [m.end() for m in _SENTENCE_END_RE.finditer(text, floor, cut + 1)]
+    return text[:ends[-1] if ends else cut].rstrip()
+
+
+@dataclass
+class WordBudget:
+    marks: int
+    limit: int
+
+    @classmethod
+    def for_question(cls, question: str) -> "WordBudget":
+        marks = mark_value(question) or DEFAULT_MARKS
+        return cls(marks=marks, limit=MARK_WORD_LIMITS[marks])
+
+    @property
+    def hard_limit(self) -> int:
+        return round(self.limit * (1 + TOLERANCE))
+
+    def within(self, words: int) -> bool:
+        return words <= self.hard_limit
+
+    def instruction(self) -> str:
+        """Appended to the prompt so the model plans for the budget instead of hitting the cut."""
+        return f"\n\n[Word limit: {self.marks} marks -> at most {self.limit} words. Conclude within the limit.]"
+
+
+@dataclass
+class BudgetResult:
+    marks: int
+    limit: int
+    words: int = 0
+    tokens_generated: int = 0       # estimated tokens received from the model
+    tokens_trimmed: int = 0         # received after the cut point and never shown
+    tokens_saved: int = 0           # estimated tokens not generated because the stream was closed
+    stopped_early: bool = False
+
+    def report(self) -> str:
+        return (f"{self.marks}M budget={self.limit} words={self.words} generated~{self.tokens_generated}t "
+                f"trimmed~{self.tokens_trimmed}t saved~{self.tokens_saved}t stopped_early={self.stopped_early}")
+
+
+@dataclass
+class BudgetStats:
+    """Process-wide totals plus the natural (unenforced) answer length per mark value.
+
+    The natural lengths come from evaluate.py, which runs the agent without a budget,
+    and are persisted so the online estimate of tokens saved uses the same model and
+    prompts as the last evaluation.
+    """
+    path: str = NATURAL_LENGTHS_PATH
+    requests: int = 0
+    stopped: int = 0
+    tokens_saved: int = 0
+    natural_tokens: Dict[str, List[int]] = field(default_factory=dict)    # marks -> [sum, count]
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.natural_tokens = json.load(f)
+            except (OSError, ValueError):
+                self.natural_tokens = {}
+
+    def natural_mean(self, marks: int) -> Optional[float]:
+        total, count = self.natural_tokens.get(str(marks), [0, 0])
+        return total / count if count else None
+
+    def observe_natural(self, marks: int, text: str) -> None:
+        with self._lock:
+            entry = self.natural_tokens.setdefault(str(marks), [0, 0])
+            entry[0] += estimate_tokens(text)
+            entry[1] += 1
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.natural_tokens, f)
+        os.replace(tmp_path, self.path)
+
+    def record(self, result: BudgetResult) -> None:
+        with self._lock:
+            self.requests += 1
+            self.stopped += int(result.stopped_early)
+            self.tokens_saved += result.tokens_saved
+
+    def report(self) -> str:
+        return f"requests={self.requests} stopped_early={self.stopped} tokens_saved~{self.tokens_saved}"
+
+
+budget_stats = BudgetStats()
+
+
+class BudgetEnforcer:
+    """Sits between the token stream and the renderer and closes the stream at the budget.
+
+    Once the answer passes the hard limit the visible text is cut back to the budget
+    (on a sentence end where possible), `exhausted` turns True and the caller should
+    stop iterating, which closes the model's response stream.
+    """
+
+    def __init__(self, budget: WordBudget, stats: Optional[BudgetStats] = budget_stats):
+        self.budget = budget
+        self.stats = stats
+        self.result = BudgetResult(marks=budget.marks, limit=budget.limit)
+        self._shown = ""
+        self.exhausted = False
+
+    @property
+    def text(self) -> str:
+        return self._shown
+
+    def feed(self, delta: str) -> str:
+        """Visible part of `delta`: all of it within budget, "" once the cut happened.
+
+        After the cut `text` may be shorter than what was already rendered, so the
+        caller re-renders from `text` when `exhausted` flips.
+        """
+        self.result.tokens_generated += estimate_tokens(delta)
+        if self.exhausted:
+            self.result.tokens_trimmed += estimate_tokens(delta)
+            return ""
+
+        candidate = self._shown + delta
+        if self.budget.within(count_words(candidate)):
+            self._shown = candidate
+            return delta
+
+        self._shown = truncate_to_words(candidate, self.budget.limit)
+        self.result.tokens_trimmed += estimate_tokens(candidate[len(self._shown):])
+        self.result.stopped_early = True
+        self.exhausted = True
+        return ""
+
+    def finish(self) -> BudgetResult:
+        self.result.words = count_words(self._shown)
+        if self.result.stopped_early and self.stats is not None:
+            natural = self.stats.natural_mean(self.budget.marks)
+            if natural is not None:
+                self.result.tokens_saved = max(0, round(natural) - self.result.tokens_generated)
+        if self.stats is not None:
+            self.stats.record(self.result)
+        return self.result